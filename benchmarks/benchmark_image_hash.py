@@ -0,0 +1,84 @@
+"""
+Benchmark do índice de hashes perceptuais
+
+Mede o custo do dHash por imagem (JPEG com e sem draft, que reduz a escala
+na decodificação) e o tempo de uma busca por quase-duplicata no
+PerceptualHashIndex com centenas de milhares de imagens indexadas.
+
+Execute: python benchmarks/benchmark_image_hash.py
+"""
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.image_hash import PerceptualHashIndex, dhash
+
+SIZES = (10_000, 100_000, 300_000, 500_000)
+LOOKUPS = 1_000
+
+
+def make_jpeg(size: int = 1200) -> bytes:
+    """Foto sintética de produto (formas coloridas sobre fundo branco)"""
+    rng = np.random.default_rng(0)
+    image = Image.new('RGB', (size, size), 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(20):
+        x, y = (int(v) for v in rng.integers(0, size - 300, 2))
+        draw.ellipse([x, y, x + 300, y + 200], fill=tuple(int(v) for v in rng.integers(0, 255, 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def bench_hash(data: bytes, repeat: int = 50):
+    """Tempo por imagem do dHash, com draft e com decodificação completa"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with Image.open(io.BytesIO(data)) as image:
+            dhash(image)
+    with_draft = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            dhash(image)
+    full_decode = (time.perf_counter() - start) / repeat
+    return with_draft * 1000, full_decode * 1000
+
+
+def bench_lookup(size: int):
+    """Tempo médio de find() com `size` hashes aleatórios no índice"""
+    rng = np.random.default_rng(size)
+    index = PerceptualHashIndex(index_file=None, capacity=size)
+    for i, value in enumerate(rng.integers(0, 2 ** 63, size, dtype=np.uint64).tolist()):
+        index.add(value, f"imagem_{i}.jpg")
+    queries = rng.integers(0, 2 ** 63, LOOKUPS, dtype=np.uint64).tolist()
+
+    start = time.perf_counter()
+    for query in queries:
+        index.find(query)
+    return (time.perf_counter() - start) / LOOKUPS * 1000
+
+
+def main():
+    data = make_jpeg()
+    with_draft, full_decode = bench_hash(data)
+    print("dHash de um JPEG 1200x1200")
+    print(f"  com draft:              {with_draft:.2f} ms")
+    print(f"  decodificação completa: {full_decode:.2f} ms")
+    print()
+    print(f"{'imagens no índice':>18}{'memória':>12}{'busca':>12}")
+    for size in SIZES:
+        elapsed = bench_lookup(size)
+        print(f"{size:>18}{size * 8 / 1024 / 1024:>9.1f} MB{elapsed:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark dos modos de processamento de imagens
+
+Compara a etapa antiga (sempre recodifica em JPEG com optimize=True) com os
+modos do ImageProcessor, usando imagens sintéticas de fotos de produto.
+
+Execute: python benchmarks/benchmark_image_processing.py
+"""
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.image_processing import ImageProcessor
+
+REPEAT = 20
+
+
+def make_sample(fmt: str, size: int = 1200) -> bytes:
+    """Gera uma imagem sintética parecida com uma foto de produto"""
+    image = Image.radial_gradient('L').resize((size, size)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for i in range(0, size, 40):
+        draw.ellipse((i, i // 2, i + size // 4, i // 2 + size // 4), outline=(i % 255, 80, 160), width=6)
+    image = image.filter(ImageFilter.GaussianBlur(1))
+    if fmt == 'PNG':
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def legacy_process(data: bytes, save_path: Path):
+    """Reproduz a etapa anterior: decodifica, achata PNG e salva JPEG optimize=True"""
+    image = Image.open(io.BytesIO(data))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        rgb_image.paste(image.convert('RGBA'), mask=image.convert('RGBA').split()[-1])
+        image = rgb_image
+    image.save(save_path.with_suffix('.jpg'), 'JPEG', quality=85, optimize=True)
+
+
+def measure(func, data: bytes, out_dir: Path) -> float:
+    """Tempo médio por imagem em milissegundos"""
+    start = time.perf_counter()
+    for i in range(REPEAT):
+        func(data, out_dir / f"img_{i}.jpg")
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    samples = {'JPEG 1200px': make_sample('JPEG'), 'PNG 1200px': make_sample('PNG')}
+    modes = {
+        'antigo (JPEG optimize=True)': legacy_process,
+        'jpeg (cópia se já JPEG)': ImageProcessor('jpeg').process,
+        'original (cópia de bytes)': ImageProcessor('original').process,
+        'webp method=2': ImageProcessor('webp', accepted_formats=[]).process,
+        'webp method=4': ImageProcessor('webp', accepted_formats=[], webp_method=4).process,
+        'jpeg + miniaturas 150/300/600': ImageProcessor('jpeg', thumbnail_sizes=[150, 300, 600]).process,
+        'redimensiona 600px (draft)': ImageProcessor('jpeg', accepted_formats=[], resize=True, max_dimension=600).process,
+    }
+
+    print(f"{'modo':<34}" + ''.join(f"{name:>14}" for name in samples))
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        for mode_name, func in modes.items():
+            timings = [measure(func, data, out_dir) for data in samples.values()]
+            print(f"{mode_name:<34}" + ''.join(f"{ms:>11.2f} ms" for ms in timings))
+
+
+if __name__ == "__main__":
+    main()
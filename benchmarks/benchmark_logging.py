@@ -0,0 +1,80 @@
+"""
+Benchmark do logging nos caminhos quentes
+
+Mede quanto tempo as threads de coleta passam registrando avisos por item
+("Produto ... sem URL de imagem") com os destinos de main.setup_logging
+(arquivo texto + JSON): JSON do próprio loguru (serialize, síncrono ou com
+enqueue, que serializa cada registro para a fila de multiprocessing),
+JsonLogSink (JSON montado e gravado numa thread própria) e JsonLogSink com
+amostragem (LogSampler). "na coleta" é o tempo das threads que registram;
+"total" inclui esvaziar a fila.
+
+Execute: python benchmarks/benchmark_logging.py [N]
+"""
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.log_utils import JsonLogSink, LogSampler
+
+THREADS = 8
+
+
+def configure(directory: Path, json_sink: str):
+    logger.remove()
+    enqueue = json_sink == 'enqueue'
+    logger.add(directory / "scraping.log", format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {message}",
+               level="INFO", enqueue=enqueue)
+    if json_sink == 'thread':
+        logger.add(JsonLogSink(directory / "scraping.jsonl"), format="{message}", level="INFO")
+    else:
+        logger.add(directory / "scraping.jsonl", level="INFO", serialize=True, enqueue=enqueue)
+
+
+def run(count: int, json_sink: str, sampler: LogSampler = None):
+    """Registra `count` avisos a partir de THREADS threads"""
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(Path(tmp), json_sink)
+
+        def work(i):
+            message = f"Produto Casa_e_Cozinha_produto-{i} sem URL de imagem"
+            if sampler:
+                sampler.log("Produto sem URL de imagem", 'WARNING', message, produto=i)
+            else:
+                logger.warning(message)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            list(executor.map(work, range(count)))
+        in_crawl = time.perf_counter() - start
+        if sampler:
+            sampler.flush()
+        logger.complete()
+        logger.remove()
+        total = time.perf_counter() - start
+        lines = sum(1 for _ in open(Path(tmp) / "scraping.log", encoding='utf-8'))
+    return in_crawl * 1000, total * 1000, lines
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    print(f"{count} avisos, {THREADS} threads, destinos texto + JSON")
+    print(f"{'modo':<28}{'na coleta':>12}{'total':>12}{'linhas':>10}")
+    for label, json_sink, sampler in (
+        ("loguru serialize", 'sync', None),
+        ("loguru serialize + enqueue", 'enqueue', None),
+        ("JsonLogSink", 'thread', None),
+        ("JsonLogSink + amostragem", 'thread', LogSampler()),
+    ):
+        in_crawl, total, lines = run(count, json_sink, sampler)
+        print(f"{label:<28}{in_crawl:>9.0f} ms{total:>9.0f} ms{lines:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark da normalização: funções por produto versus etapa em lote
+
+Compara o caminho antigo (extract_price e clean_text com regex a cada
+campo, que lia "R$ 1.234,56" como 1.234) com o atual por produto e com a
+etapa vetorizada de src.normalize, sobre preços e categorias sintéticos.
+
+Execute: python benchmarks/benchmark_normalization.py [N]
+"""
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import extract_price, clean_text, sanitize_category
+from src.normalize import parse_brl_prices, canonical_categories
+
+CATEGORIES = ["Casa e Cozinha", "Eletrônicos", "Saúde e Beleza", "Beleza e Perfumaria",
+              "Esporte & Lazer", "Presentes", "Brinquedos / Fidgets", "Pet Shop"]
+
+
+def legacy_extract_price(price_text: str) -> float:
+    """extract_price anterior (errado para separador de milhar)"""
+    if not price_text:
+        return 0.0
+    price_str = re.sub(r'[^\d.,]', '', price_text)
+    price_str = price_str.replace(',', '.')
+    price_match = re.search(r'\d+\.?\d*', price_str)
+    return float(price_match.group()) if price_match else 0.0
+
+
+def legacy_clean_text(text: str) -> str:
+    """clean_text anterior"""
+    if not text:
+        return ""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def make_rows(count: int):
+    """Textos de preço e categoria como chegam do HTML"""
+    rng = random.Random(42)
+    prices = []
+    for _ in range(count):
+        value = rng.choice([rng.randint(5, 300), rng.randint(1000, 20000)]) + rng.choice([0, 0.5, 0.9, 0.99])
+        text = f"{value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+        prices.append(f"\n  R$ {text}  ")
+    categories = [f"  {rng.choice(CATEGORIES)}\n" for _ in range(count)]
+    return prices, categories
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    prices, categories = make_rows(count)
+
+    legacy_ms, legacy = timed(lambda: (
+        [legacy_extract_price(legacy_clean_text(p)) for p in prices],
+        [sanitize_category(legacy_clean_text(c)) for c in categories],
+    ))
+    item_ms, item = timed(lambda: (
+        [extract_price(clean_text(p)) for p in prices],
+        [sanitize_category(clean_text(c)) for c in categories],
+    ))
+    batch_ms, batch = timed(lambda: (
+        parse_brl_prices(pd.Series(prices, dtype=object)).tolist(),
+        canonical_categories(pd.Series(categories, dtype=object)).tolist(),
+    ))
+
+    wrong = sum(1 for a, b in zip(legacy[0], batch[0]) if abs(a - b) > 1e-9)
+    mismatch = sum(1 for a, b in zip(item[0], batch[0]) if abs(a - b) > 1e-9)
+    print(f"{count} produtos")
+    print(f"{'caminho':<34}{'tempo':>10}")
+    print(f"{'antigo (regex por produto)':<34}{legacy_ms:>7.0f} ms   ({wrong} preços errados)")
+    print(f"{'atual por produto':<34}{item_ms:>7.0f} ms")
+    print(f"{'lote (pandas/NumPy)':<34}{batch_ms:>7.0f} ms   ({mismatch} divergências com o atual)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark de memória: produtos como dict versus Product (__slots__)
+
+Monta N produtos com os campos da listagem (e os de detalhe em parte deles),
+mede a memória alocada com tracemalloc em cada representação e o tempo de
+conversão para DataFrame.
+
+Execute: python benchmarks/benchmark_product_records.py [N]
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.product_record import Product, to_frame
+
+CATEGORIES = [f"Categoria_{i}" for i in range(40)]
+
+
+def raw_fields(i: int) -> dict:
+    """Campos de um produto sintético (strings novas a cada chamada, como no parse)"""
+    category = ''.join(CATEGORIES[i % len(CATEGORIES)])
+    fields = {
+        'id': f"{category}_Produto_{i}",
+        'nome': f"Produto {i}",
+        'categoria': category,
+        'preco': 10.0 + i % 1000,
+        'preco_original': f"R$ {10 + i % 1000},00",
+        'imagem_url': f"https://loja.exemplo.com/wp-content/uploads/produto-{i}.jpg",
+        'link': f"https://loja.exemplo.com/produto/produto-{i}/",
+        'data_coleta': "2024-01-01 12:00:00",
+    }
+    if i % 4 == 0:
+        fields['sku'] = f"SKU{i}"
+        fields['imagem_local'] = f"{category}/produto_{i}.jpg"
+    return fields
+
+
+def measure(factory, count: int):
+    """Memória alocada (MB) para manter count produtos vivos e os próprios produtos"""
+    tracemalloc.start()
+    products = [factory(raw_fields(i)) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / 1024 / 1024, products
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"{count} produtos")
+    print(f"{'representação':<24}{'memória':>12}{'DataFrame':>14}")
+    for name, factory in (('dict', dict), ('Product (__slots__)', Product)):
+        memory, products = measure(factory, count)
+        start = time.perf_counter()
+        to_frame(products)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24}{memory:>9.1f} MB{elapsed * 1000:>11.0f} ms")
+        del products
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 """
 Script auxiliar para inspecionar o site e identificar seletores CSS
 Execute este script para ver a estrutura HTML da página e ajudar a identificar os seletores corretos
+
+Uso:
+    python inspect_selectors.py                          # inspeciona o site ao vivo
+    python inspect_selectors.py --discover               # avalia seletores nas páginas arquivadas
+    python inspect_selectors.py --discover pagina.html   # ... ou em arquivos HTML salvos
 """
 import sys
+import argparse
 from pathlib import Path
 from bs4 import BeautifulSoup
 from loguru import logger
@@ -10,7 +16,7 @@ from colorama import init, Fore, Style
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import BASE_URL, USE_SELENIUM
+from config import BASE_URL, USE_SELENIUM, SELECTORS
 from src.scraper import WebScraper
 
 init(autoreset=True)  # Inicializa colorama
@@ -127,8 +133,82 @@ def inspect_page(url: str, scraper: WebScraper = None):
     print(f"{Fore.YELLOW}Abra este arquivo no navegador para inspecionar manualmente{Style.RESET_ALL}\n")
 
 
+def parse_args():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Inspetor de seletores CSS")
+    parser.add_argument('--discover', action='store_true',
+                        help="Descobre os seletores avaliando candidatos em páginas salvas, sem navegador")
+    parser.add_argument('files', nargs='*', metavar='ARQUIVO',
+                        help="Páginas HTML salvas (padrão: arquivo de páginas e page_inspection.html)")
+    parser.add_argument('--since', help="Data inicial das páginas arquivadas (AAAA-MM-DD)")
+    parser.add_argument('--until', help="Data final das páginas arquivadas (AAAA-MM-DD)")
+    parser.add_argument('--limit', type=int, help="Usa só as N páginas arquivadas mais recentes")
+    parser.add_argument('--workers', type=int, help="Processos em paralelo (padrão: número de CPUs)")
+    return parser.parse_args()
+
+
+def print_ranking(title: str, ranking: list, limit: int = 5):
+    """Mostra os melhores candidatos de um seletor"""
+    print(f"{Fore.YELLOW}{title}{Style.RESET_ALL}")
+    if not ranking:
+        print(f"  {Fore.RED}✗{Style.RESET_ALL} nenhum candidato")
+    for item in ranking[:limit]:
+        details = f"nota {item['score']:.2f}"
+        if 'coverage' in item:
+            details += f" | cobertura {item['coverage']:.0%} | consistência {item['consistency']:.0%}"
+        if 'per_page' in item:
+            details += f" | {item['per_page']:.1f} por página"
+        print(f"  {Fore.CYAN}{item['selector']:<50}{Style.RESET_ALL} {details}")
+    print()
+
+
+def discover(args):
+    """Avalia seletores candidatos em muitas páginas salvas e sugere o bloco SELECTORS"""
+    from src.selector_discovery import discover_selectors, time_selectors, archive_sources, format_selectors
+    
+    sources = [str(path) for path in args.files]
+    if not sources:
+        sources = archive_sources(args.since, args.until, args.limit)
+        if Path("page_inspection.html").exists():
+            sources.append("page_inspection.html")
+    if not sources:
+        logger.error("Nenhuma página salva encontrada (ative ARCHIVE_PAGES ou informe arquivos HTML)")
+        return
+    
+    result = discover_selectors(sources, args.workers)
+    print_section(f"Seletores candidatos ({result['pages']} páginas, {result['errors']} com erro)")
+    print_ranking("product_container", result['containers'])
+    for field, ranking in result['fields'].items():
+        print_ranking(field, ranking)
+    print_ranking("next_page", [
+        {'selector': item['selector'], 'score': item['pages'] / max(1, result['pages'])}
+        for item in result['next_page']
+    ])
+    
+    if not result['selectors'].get('product_container'):
+        print(f"{Fore.RED}✗{Style.RESET_ALL} Nenhum container de produto encontrado nas páginas")
+        return
+    
+    # Velocidade de extração: seletores sugeridos x seletores atuais do config.py
+    timing = time_selectors(sources, result['selectors'], args.workers)
+    current = time_selectors(sources, SELECTORS, args.workers)
+    print_section("SELECTORS sugerido (cole em config.py ou no perfil do site)")
+    print(format_selectors(result['selectors'], timing, result['fields'], result['containers']))
+    print()
+    for label, measured in (("sugerido", timing), ("config.py atual", current)):
+        total = sum(measured['per_page_us'].values())
+        print(f"{label:<16} {measured['products_per_page']:.1f} produtos/página, "
+              f"{total / 1000:.2f} ms/página de seleção")
+    print()
+
+
 def main():
     """Função principal"""
+    args = parse_args()
+    if args.discover or args.files:
+        discover(args)
+        return
+    
     print(f"{Fore.GREEN}{'='*60}")
     print(f"{Fore.GREEN}Inspetor de Seletores CSS - Utimix")
     print(f"{Fore.GREEN}{'='*60}{Style.RESET_ALL}\n")
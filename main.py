@@ -2,6 +2,9 @@
 Script principal para executar o web scraping
 """
 import sys
+import signal
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from loguru import logger
 from datetime import datetime
@@ -9,14 +12,53 @@ from datetime import datetime
 # Adiciona diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import BASE_URL, LOG_LEVEL, LOG_FILE
+from config import LOG_LEVEL, LOG_FILE, LOG_JSON_FILE, USE_PRODUCT_STORE, SITES_DIR, MAX_CONCURRENT_SITES
 from src.scraper import WebScraper
 from src.image_downloader import ImageDownloader
 from src.data_exporter import DataExporter
+from src.product_store import ProductStore
+from src.pipeline import run_crawl
+from src.run_budget import RunBudget, get_run_budget, set_run_budget
+from src.site_profile import SiteProfile, load_site_profiles
+from src.log_utils import JsonLogSink
+
+# ============================================
+# CONFIGURAR AQUI: URLs das categorias para fazer scraping
+# ============================================
+# INSTRUÇÕES:
+# 1. Acesse https://www.utimix.com/ no navegador
+# 2. Navegue até uma categoria com produtos
+# 3. Copie a URL da barra de endereço
+# 4. Cole abaixo (removendo o # e substituindo pela URL real)
+
+CATEGORY_URLS = [
+    # URLs das categorias para fazer scraping
+    "https://www.utimix.com/produtos/",
+    "https://www.utimix.com/categoria/casa-e-cozinha/",
+    "https://www.utimix.com/categoria/eletronicos/",
+    "https://www.utimix.com/categoria/saude-e-beleza/",
+    "https://www.utimix.com/categoria/beleza-e-perfumaria/",
+    "https://www.utimix.com/categoria/esporte-lazer/",
+    "https://www.utimix.com/categoria/presentes/",
+    "https://www.utimix.com/categoria/brinquedos-fidgets/",
+    "https://www.utimix.com/categoria/pet-shop/",
+    "https://www.utimix.com/categoria/sazonal/natal/",
+    "https://www.utimix.com/novidades/",
+]
+
+# ============================================
+# CONFIGURAR: Número máximo de páginas por categoria
+# ============================================
+MAX_PAGES_PER_CATEGORY = 1
 
 
 def setup_logging():
-    """Configura sistema de logging"""
+    """
+    Configura sistema de logging
+    
+    O arquivo LOG_JSON_FILE recebe cada registro em JSON (com run_id, site,
+    url e tipo do evento), montado e gravado numa thread separada.
+    """
     logger.remove()  # Remove handler padrão
     logger.add(
         sys.stderr,
@@ -31,107 +73,256 @@ def setup_logging():
         rotation="10 MB",
         retention="7 days"
     )
+    if LOG_JSON_FILE:
+        logger.add(JsonLogSink(LOG_JSON_FILE), format="{message}", level=LOG_LEVEL)
+
+
+def parse_args():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Web Scraping de produtos")
+    parser.add_argument('--reextract', action='store_true',
+                        help="Reprocessa as páginas arquivadas com os seletores atuais, sem acessar a rede")
+    parser.add_argument('--since', help="Data inicial das páginas arquivadas (AAAA-MM-DD)")
+    parser.add_argument('--until', help="Data final das páginas arquivadas (AAAA-MM-DD)")
+    parser.add_argument('--time-budget', type=parse_duration, metavar='DURAÇÃO',
+                        help="Tempo máximo da coleta (ex.: 90, 45m, 2h); ao esgotar, exporta o que já foi coletado")
+    parser.add_argument('--max-requests', type=int, metavar='N',
+                        help="Número máximo de requisições de rede; ao atingir, exporta o que já foi coletado")
+    parser.add_argument('--serve', action='store_true',
+                        help="Modo serviço: mantém navegador e conexões abertos, recoleta as categorias "
+                             "periodicamente e aceita coletas pela API local (SERVICE_PORT)")
+    parser.add_argument('--port', type=int, help="Porta da API do modo serviço (padrão: SERVICE_PORT)")
+    parser.add_argument('--sites', nargs='*', metavar='NOME',
+                        help="Coleta os sites com perfil em SITES_DIR (todos, se nenhum nome for dado), "
+                             "em paralelo, em vez das constantes de config.py")
+    return parser.parse_args()
+
+
+def parse_duration(value: str) -> float:
+    """Converte '90', '90s', '45m' ou '2h' em segundos"""
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    value = value.strip().lower()
+    try:
+        if value and value[-1] in units:
+            return float(value[:-1]) * units[value[-1]]
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Duração inválida: {value}")
+
+
+def install_interrupt_handler():
+    """Primeiro Ctrl+C encerra a coleta e exporta o parcial; o segundo interrompe de imediato"""
+    def handler(signum, frame):
+        budget = get_run_budget()
+        if budget.reason:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            raise KeyboardInterrupt
+        budget.cancel()
+        logger.warning("Pressione Ctrl+C novamente para interromper sem exportar")
+    signal.signal(signal.SIGINT, handler)
+
+
+def log_completeness(summary: dict):
+    """Mostra a cobertura da coleta (útil quando o orçamento encerra a execução antes do fim)"""
+    completeness = summary.get('cobertura', {})
+    budget = get_run_budget().stats()
+    products = summary['produtos']
+    logger.info(
+        f"Categorias completas: {completeness.get('categorias_completas', 0)}/{completeness.get('categorias', 0)}"
+        f" | Páginas: {completeness.get('paginas', 0)} | Produtos: {products}"
+    )
+    details = summary.get('detalhes')
+    if details:
+        logger.info(f"Páginas de detalhe: {details['buscados'] + details['cache']}"
+                    f"/{products} (sem detalhes: {details['pulados']})")
+    images = summary.get('imagens', {})
+    logger.info(f"Imagens: {images.get('downloaded', 0)}/{products} (não baixadas: {images.get('skipped', 0)})")
+    logger.info(f"Requisições: {budget['requisicoes']} em {budget['segundos']}s")
+    if budget['motivo']:
+        logger.warning(f"Execução parcial: {budget['motivo']}")
+
+
+def run_reextract(args):
+    """Reextrai produtos das páginas arquivadas e exporta para planilhas"""
+    from src.reextract import reextract_archive
+    
+    try:
+        sites = load_sites(args)
+    except ValueError as e:
+        logger.error(str(e))
+        return
+    products = reextract_archive(args.since, args.until, sites=sites)
+    if not products:
+        logger.warning("Nenhum produto foi encontrado nas páginas arquivadas!")
+        return
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    data_exporter = DataExporter(ProductStore() if USE_PRODUCT_STORE else None)
+    data_exporter.save_to_store(products, f"reextracao_{timestamp}")
+    files = data_exporter.export_both(products, f"reextracao_{timestamp}")
+    logger.info(f"Produtos reextraídos: {len(products)}")
+    logger.info(f"Planilha Excel: {files['excel']}")
+    logger.info(f"Planilha CSV: {files['csv']}")
+
+
+def run_service(site, image_downloader, data_exporter, args):
+    """Mantém o processo ativo atendendo coletas agendadas e pedidas pela API"""
+    from src.crawl_service import CrawlService
+    
+    service_args = {'port': args.port} if args.port else {}
+    scraper = WebScraper(site=site)
+    service = CrawlService(scraper, image_downloader, data_exporter, site.categories,
+                           site.max_pages, **service_args)
+    # Ctrl+C encerra o servidor; a coleta em andamento exporta o parcial
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        logger.warning("Encerrando o modo serviço...")
+    finally:
+        scraper.close()
+
+
+def load_sites(args) -> list:
+    """Perfis a coletar: os de SITES_DIR (--sites) ou o equivalente ao config.py"""
+    if args.sites is None:
+        # Filtra apenas URLs válidas (não comentadas)
+        category_urls = [url.strip() for url in CATEGORY_URLS if url.strip() and not url.strip().startswith('#')]
+        return [SiteProfile.from_config(category_urls, MAX_PAGES_PER_CATEGORY)]
+    sites = load_site_profiles(SITES_DIR, args.sites or None)
+    if not sites:
+        logger.warning(f"Nenhum perfil de site encontrado em {SITES_DIR}")
+    return sites
+
+
+def crawl_site(site, image_downloader, data_exporter, timestamp: str) -> dict:
+    """Coleta um site com seu próprio WebScraper (navegador e sessões HTTP da thread)"""
+    scraper = WebScraper(site=site)
+    try:
+        # Aquece o navegador (cookies e cache no perfil persistente) antes da coleta
+        if scraper.driver:
+            scraper.warm_up()
+        run_id = timestamp if site.name == 'padrao' else f"{site.name}_{timestamp}"
+        return run_crawl(scraper, image_downloader, data_exporter,
+                         site.categories, site.max_pages, run_id)
+    finally:
+        scraper.close()
+
+
+def log_summary(summary: dict):
+    """Mostra as estatísticas finais de uma coleta"""
+    logger.info(f"Produtos coletados: {summary['produtos']}")
+    
+    images = summary['imagens']
+    logger.info(f"Imagens baixadas: {images['downloaded']}")
+    logger.info(f"Imagens com falha: {images['failed']}")
+    if images.get('near_duplicates'):
+        logger.info(f"Imagens quase duplicadas reaproveitadas: {images['near_duplicates']}")
+    log_completeness(summary)
+    
+    logger.info(f"Planilha Excel: {summary['arquivos']['excel']}")
+    logger.info(f"Planilha CSV: {summary['arquivos']['csv']}")
 
 
 def main():
     """Função principal"""
+    args = parse_args()
     setup_logging()
+    set_run_budget(RunBudget(args.time_budget, args.max_requests))
+    install_interrupt_handler()
+    
+    if args.reextract:
+        run_reextract(args)
+        return
     
     logger.info("=" * 60)
     logger.info("Iniciando Web Scraping de Produtos")
     logger.info("=" * 60)
     
-    # Verifica se BASE_URL está configurado
-    if not BASE_URL:
-        logger.error("BASE_URL não configurado em config.py!")
-        logger.info("Por favor, configure a URL base do site em config.py")
+    try:
+        sites = load_sites(args)
+    except ValueError as e:
+        logger.error(str(e))
         return
     
-    # Verifica se seletores estão configurados
-    from config import SELECTORS
-    if not SELECTORS.get('product_container'):
-        logger.warning("Seletores CSS não configurados em config.py!")
-        logger.info("Por favor, configure os seletores CSS apropriados antes de continuar")
+    for site in list(sites):
+        # Verifica se a URL base e os seletores estão configurados
+        if not site.base_url:
+            logger.error("BASE_URL não configurado em config.py!")
+            logger.info("Por favor, configure a URL base do site em config.py")
+            sites.remove(site)
+            continue
+        if not site.selectors.get('product_container'):
+            logger.warning(f"[{site.name}] Seletores CSS não configurados!")
+            logger.info("Por favor, configure os seletores CSS apropriados antes de continuar")
+        if not site.categories:
+            logger.warning(f"[{site.name}] Nenhuma categoria configurada!")
+            logger.info("Por favor, adicione URLs de categorias na lista CATEGORY_URLS em main.py "
+                        "(ou em 'categories' no perfil do site)")
+            sites.remove(site)
+    if not sites:
+        return
     
+    image_downloader = None
     try:
-        # Inicializa componentes
-        scraper = WebScraper(BASE_URL)
-        image_downloader = ImageDownloader(BASE_URL)
-        data_exporter = DataExporter()
-        
-        # ============================================
-        # CONFIGURAR AQUI: URLs das categorias para fazer scraping
-        # ============================================
-        # INSTRUÇÕES:
-        # 1. Acesse https://www.utimix.com/ no navegador
-        # 2. Navegue até uma categoria com produtos
-        # 3. Copie a URL da barra de endereço
-        # 4. Cole abaixo (removendo o # e substituindo pela URL real)
+        # Componentes compartilhados entre os sites: downloads de imagem (limite de
+        # taxa por host), exportação e banco local
+        image_downloader = ImageDownloader(sites[0].base_url)
+        data_exporter = DataExporter(ProductStore() if USE_PRODUCT_STORE else None)
         
-        category_urls = [
-            # URLs das categorias para fazer scraping
-            "https://www.utimix.com/produtos/",
-            "https://www.utimix.com/categoria/casa-e-cozinha/",
-            "https://www.utimix.com/categoria/eletronicos/",
-            "https://www.utimix.com/categoria/saude-e-beleza/",
-            "https://www.utimix.com/categoria/beleza-e-perfumaria/",
-            "https://www.utimix.com/categoria/esporte-lazer/",
-            "https://www.utimix.com/categoria/presentes/",
-            "https://www.utimix.com/categoria/brinquedos-fidgets/",
-            "https://www.utimix.com/categoria/pet-shop/",
-            "https://www.utimix.com/categoria/sazonal/natal/",
-            "https://www.utimix.com/novidades/",
-        ]
-        
-        # Filtra apenas URLs válidas (não comentadas)
-        category_urls = [url.strip() for url in category_urls if url.strip() and not url.strip().startswith('#')]
-        
-        if not category_urls:
-            logger.warning("Nenhuma categoria configurada!")
-            logger.info("Por favor, adicione URLs de categorias na lista 'category_urls' em main.py")
+        if args.serve:
+            if len(sites) > 1:
+                logger.warning(f"O modo serviço atende um site; usando '{sites[0].name}'")
+            run_service(sites[0], image_downloader, data_exporter, args)
             return
         
-        # ============================================
-        # CONFIGURAR: Número máximo de páginas por categoria
-        # ============================================
-        max_pages_per_category = 1
+        budget = get_run_budget()
+        if budget.limited:
+            logger.info(f"Orçamento da execução: {budget.time_budget or '∞'}s, "
+                        f"{budget.max_requests or '∞'} requisições")
         
-        # Faz scraping dos produtos
-        logger.info(f"Iniciando scraping de {len(category_urls)} categoria(s)...")
-        products = scraper.scrape_categories(category_urls, max_pages_per_category)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if len(sites) == 1:
+            summaries = {sites[0].name: crawl_site(sites[0], image_downloader, data_exporter, timestamp)}
+        else:
+            # Cada site em uma thread, com seu próprio ritmo; o limite por host vale entre todos
+            logger.info(f"Coletando {len(sites)} sites: {', '.join(site.name for site in sites)}")
+            summaries = {}
+            with ThreadPoolExecutor(max_workers=max(1, MAX_CONCURRENT_SITES), thread_name_prefix="site") as executor:
+                futures = {
+                    site.name: executor.submit(crawl_site, site, image_downloader, data_exporter, timestamp)
+                    for site in sites
+                }
+                for name, future in futures.items():
+                    try:
+                        summaries[name] = future.result()
+                    except Exception as e:
+                        logger.exception(f"[{name}] Erro durante a coleta: {e}")
         
-        if not products:
-            logger.warning("Nenhum produto foi encontrado!")
+        summaries = {name: summary for name, summary in summaries.items() if summary['arquivos']}
+        if not summaries:
             return
         
-        logger.info(f"Total de produtos coletados: {len(products)}")
-        
-        # Faz download das imagens
-        logger.info("Iniciando download de imagens...")
-        image_paths = image_downloader.download_product_images(products, BASE_URL)
-        
-        # Adiciona caminhos das imagens aos produtos
-        products = data_exporter.add_image_paths(products, image_paths)
-        
-        # Exporta para planilhas
-        logger.info("Exportando dados para planilhas...")
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        files = data_exporter.export_both(products, f"produtos_{timestamp}")
-        
         # Mostra estatísticas finais
         logger.info("=" * 60)
         logger.info("RESUMO FINAL")
         logger.info("=" * 60)
-        logger.info(f"Produtos coletados: {len(products)}")
-        
-        stats = image_downloader.get_stats()
-        logger.info(f"Imagens baixadas: {stats['downloaded']}")
-        logger.info(f"Imagens com falha: {stats['failed']}")
-        
-        logger.info(f"Planilha Excel: {files['excel']}")
-        logger.info(f"Planilha CSV: {files['csv']}")
+        for name, summary in summaries.items():
+            if len(sites) > 1:
+                logger.info(f"--- {name} ---")
+            log_summary(summary)
+        # Avisos amostrados (contadores de cada site, somados)
+        occurrences = {}
+        for summary in summaries.values():
+            for key, count in summary.get('ocorrencias', {}).items():
+                occurrences[key] = occurrences.get(key, 0) + count
+        for key, count in occurrences.items():
+            logger.info(f"Ocorrências de '{key}': {count}")
         logger.info("=" * 60)
-        logger.info("Processo concluído com sucesso!")
+        if any(summary['parcial'] for summary in summaries.values()):
+            logger.warning("Processo encerrado antes do fim; planilhas contêm a coleta parcial")
+        else:
+            logger.info("Processo concluído com sucesso!")
         
     except KeyboardInterrupt:
         logger.warning("Processo interrompido pelo usuário")
@@ -139,6 +330,9 @@ def main():
     except Exception as e:
         logger.exception(f"Erro durante execução: {e}")
         sys.exit(1)
+    finally:
+        if image_downloader:
+            image_downloader.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""
+Consulta o banco local de produtos (data/produtos.db)
+
+Exemplos:
+    python query_products.py historico Casa_e_Cozinha_Caneca_Azul
+    python query_products.py preco-em Casa_e_Cozinha_Caneca_Azul 2024-05-10
+    python query_products.py listar --categoria Casa_e_Cozinha --desde 2024-05-01 --ultimos
+    python query_products.py exportar --categoria Eletronicos --arquivo eletronicos
+"""
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import PRODUCT_DB_FILE
+from src.product_store import ProductStore
+from src.data_exporter import DataExporter
+
+
+def print_rows(rows: list, columns: tuple):
+    """Imprime linhas em formato de tabela simples"""
+    if not rows:
+        print("Nenhum resultado.")
+        return
+    print(' | '.join(columns))
+    for row in rows:
+        print(' | '.join(str(row.get(col, '')) for col in columns))
+    print(f"\n{len(rows)} linha(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o banco local de produtos")
+    parser.add_argument('--db', default=str(PRODUCT_DB_FILE), help="Arquivo do banco SQLite")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    historico = sub.add_parser('historico', help="Histórico de preços de um produto")
+    historico.add_argument('produto_id')
+
+    preco_em = sub.add_parser('preco-em', help="Preço de um produto em uma data")
+    preco_em.add_argument('produto_id')
+    preco_em.add_argument('data', help="AAAA-MM-DD")
+
+    for name, help_text in (('listar', "Lista produtos coletados"), ('exportar', "Exporta uma consulta para Excel/CSV")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument('--categoria')
+        cmd.add_argument('--desde', help="AAAA-MM-DD")
+        cmd.add_argument('--ate', help="AAAA-MM-DD")
+        cmd.add_argument('--busca', help="Trecho do nome")
+        cmd.add_argument('--execucao', help="run_id de uma execução")
+        cmd.add_argument('--ultimos', action='store_true', help="Só a coleta mais recente de cada produto")
+        if name == 'listar':
+            cmd.add_argument('--limite', type=int, default=50)
+        else:
+            cmd.add_argument('--arquivo', help="Nome base do arquivo (sem extensão)")
+
+    args = parser.parse_args()
+    store = ProductStore(Path(args.db))
+
+    try:
+        if args.comando == 'historico':
+            print_rows(store.price_history(args.produto_id), ('data_coleta', 'preco', 'preco_original', 'categoria'))
+        elif args.comando == 'preco-em':
+            row = store.price_at(args.produto_id, args.data)
+            print_rows([row] if row else [], ('id', 'nome', 'preco', 'preco_original', 'data_coleta'))
+        else:
+            filters = dict(categoria=args.categoria, since=args.desde, until=args.ate,
+                           search=args.busca, run_id=args.execucao, latest_only=args.ultimos)
+            if args.comando == 'listar':
+                print_rows(store.query(limit=args.limite, **filters),
+                           ('id', 'nome', 'categoria', 'preco', 'data_coleta'))
+            else:
+                files = DataExporter(store).export_view(args.arquivo, **filters)
+                print(f"Planilha Excel: {files['excel']}")
+                print(f"Planilha CSV: {files['csv']}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Detecção de bloqueios (WAF/anti-bot) e circuit breaker por host
+"""
+import re
+import threading
+import time
+from typing import Dict, Optional, Union
+from urllib.parse import urlparse
+from loguru import logger
+
+from config import (
+    BLOCK_SCAN_BYTES, BLOCK_BREAKER_THRESHOLD, BLOCK_BREAKER_RESET_SECONDS, BLOCK_BREAKER_MAX_RESET_SECONDS
+)
+
+# Assinaturas de páginas de bloqueio/desafio (nome, padrão)
+# 'utimix_403' corresponde à página salva em page_inspection.html
+BLOCK_SIGNATURES = (
+    ('utimix_403', re.compile(r'error--bg__cover|Access to this page is forbidden', re.I)),
+    ('cloudflare', re.compile(
+        r'cf-browser-verification|cf_chl_opt|'
+        r'<title>\s*(?:Just a moment\.\.\.|Attention Required! \| Cloudflare)', re.I)),
+    ('sucuri', re.compile(r'Sucuri WebSite Firewall|sucuri\.net/privacy-policy', re.I)),
+    ('imperva', re.compile(r'_Incapsula_Resource|Incapsula incident ID', re.I)),
+    ('akamai', re.compile(r'<title>\s*Access Denied\s*</title>.*?Reference\s*#[\d.a-f]+', re.I | re.S)),
+    ('wordfence', re.compile(r'Generated by Wordfence|Your access to this site has been limited', re.I)),
+    ('datadome', re.compile(r'geo\.captcha-delivery\.com', re.I)),
+    ('http_error_title', re.compile(r'<title>\s*(?:403|429|503)\b[^<]*</title>|<title>\s*Forbidden\s*</title>', re.I)),
+)
+
+# Status HTTP que indicam bloqueio (não são falhas transitórias)
+BLOCK_STATUS_CODES = (403, 429)
+
+
+def looks_undecoded(head: bytes) -> bool:
+    """
+    Indica se o corpo parece binário/compactado em vez de HTML
+
+    Acontece quando o servidor responde com uma codificação (ex.: br) que o
+    cliente não decodificou, como em utimix_response_403.html.
+    """
+    sample = head[:512]
+    if not sample or sample.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<'):
+        return False
+    binary = sum(1 for byte in sample if byte < 9 or 13 < byte < 32 or byte >= 0x80)
+    return binary / len(sample) > 0.3
+
+
+def detect_block(content: Union[str, bytes, None], status_code: Optional[int] = None) -> Optional[str]:
+    """
+    Verifica se uma resposta é uma página de bloqueio
+
+    Só o início do documento é analisado (BLOCK_SCAN_BYTES): páginas de bloqueio
+    são pequenas e as assinaturas ficam no título/cabeçalho.
+
+    Args:
+        content: HTML da resposta
+        status_code: Status HTTP, se conhecido
+
+    Returns:
+        Nome da assinatura encontrada ou None se a página parece normal
+    """
+    if status_code in BLOCK_STATUS_CODES:
+        return f"http_{status_code}"
+    if not content:
+        return None
+    if isinstance(content, bytes):
+        head_bytes = content[:BLOCK_SCAN_BYTES]
+        if looks_undecoded(head_bytes):
+            return 'undecoded_body'
+        head = head_bytes.decode('utf-8', errors='ignore')
+    else:
+        head = content[:BLOCK_SCAN_BYTES]
+    for name, pattern in BLOCK_SIGNATURES:
+        if pattern.search(head):
+            return name
+    return None
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de um host
+
+    closed: requisições liberadas; após `threshold` bloqueios seguidos abre.
+    open: requisições recusadas até passar o tempo de espera.
+    half_open: uma única requisição de teste; sucesso fecha, bloqueio reabre
+    com tempo de espera dobrado (até max_reset_timeout).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, threshold: int = BLOCK_BREAKER_THRESHOLD,
+                 reset_timeout: float = BLOCK_BREAKER_RESET_SECONDS,
+                 max_reset_timeout: float = BLOCK_BREAKER_MAX_RESET_SECONDS):
+        self.threshold = max(1, threshold)
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_blocks = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Indica se uma requisição pode ser feita agora"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Registra uma resposta normal"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_blocks = 0
+            self.reset_timeout = self.base_reset_timeout
+            self.probe_in_flight = False
+
+    def record_block(self) -> bool:
+        """
+        Registra um bloqueio
+
+        Returns:
+            True se o circuito abriu com este bloqueio
+        """
+        with self._lock:
+            self.consecutive_blocks += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            elif self.consecutive_blocks < self.threshold:
+                return False
+            opened = self.state != self.OPEN
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+            return opened
+
+    def release_probe(self):
+        """Libera a vaga de teste quando a requisição falhou sem indicar bloqueio"""
+        with self._lock:
+            self.probe_in_flight = False
+
+
+class HostCircuitBreakers:
+    """
+    Registro de circuit breakers por host, compartilhado entre threads
+
+    Com proxies, cada par (host, proxy) tem seu próprio circuito: o bloqueio de
+    um ponto de saída não interrompe os demais.
+    """
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url: str, scope: Optional[str] = None) -> str:
+        host = urlparse(url).netloc
+        return f"{host} via {scope}" if scope else host
+
+    def get(self, url: str, scope: Optional[str] = None) -> CircuitBreaker:
+        key = self._key(url, scope)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker()
+            return breaker
+
+    def allow(self, url: str, scope: Optional[str] = None) -> bool:
+        return self.get(url, scope).allow_request()
+
+    def record_success(self, url: str, scope: Optional[str] = None):
+        self.get(url, scope).record_success()
+
+    def record_block(self, url: str, reason: str = "", scope: Optional[str] = None):
+        breaker = self.get(url, scope)
+        if breaker.record_block():
+            logger.warning(
+                f"Circuito aberto para {self._key(url, scope)} após bloqueio ({reason}). "
+                f"Novas URLs deste host falham imediatamente por {breaker.reset_timeout:.0f}s"
+            )
+
+    def stats(self) -> Dict[str, Dict]:
+        """Estado e contadores de cada host"""
+        with self._lock:
+            return {
+                host: {'estado': b.state, 'bloqueios_seguidos': b.consecutive_blocks, 'recusadas': b.rejected}
+                for host, b in self._breakers.items()
+            }
+
+
+# Registro global usado pelo cliente HTTP e pelo Selenium
+circuit_breakers = HostCircuitBreakers()
@@ -0,0 +1,213 @@
+"""
+Perfis persistentes do navegador (user-data-dir) reaproveitados entre execuções
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+
+from config import (
+    BROWSER_PROFILE_DIR, BROWSER_PROFILE_SLOTS, BROWSER_PROFILE_MAX_MB, BROWSER_PROFILE_MAX_AGE_DAYS
+)
+
+LOCK_FILE = "slot.lock"
+META_FILE = "slot.json"
+# Travas mais antigas que isto são consideradas abandonadas quando não dá para verificar o PID
+STALE_LOCK_SECONDS = 12 * 3600
+
+# Pastas descartáveis do perfil (cache); cookies, localStorage e service workers são mantidos
+CACHE_SUBDIRS = (
+    'Cache', 'Code Cache', 'GPUCache', 'GrShaderCache', 'ShaderCache', 'DawnCache',
+    'Service Worker/CacheStorage', 'Service Worker/ScriptCache',
+)
+
+
+def directory_size(path: Path) -> int:
+    """Tamanho total dos arquivos da pasta em bytes"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _pid_alive(pid: int) -> Optional[bool]:
+    """Indica se o processo existe (None se não for possível verificar)"""
+    if os.name != 'posix':
+        return None  # os.kill(pid, 0) encerra o processo no Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ProfileSlot:
+    """Um perfil do navegador travado por este processo"""
+
+    def __init__(self, manager: 'ProfileManager', index: int, path: Path):
+        self.manager = manager
+        self.index = index
+        self.path = path
+
+    @property
+    def meta(self) -> dict:
+        try:
+            return json.loads((self.path / META_FILE).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def update_meta(self, **values):
+        meta = self.meta
+        meta.update(values)
+        (self.path / META_FILE).write_text(json.dumps(meta), encoding='utf-8')
+
+    def _warmed(self) -> dict:
+        warmed = self.meta.get('warmed_at')
+        return warmed if isinstance(warmed, dict) else {}
+
+    def is_warm(self, site: str, max_age_seconds: float) -> bool:
+        """
+        Indica se o perfil foi aquecido para o site há menos de max_age_seconds
+
+        Args:
+            site: Identificação do site (ex.: a URL base); o mesmo perfil pode
+                ter sido aquecido para outro site em execuções anteriores
+            max_age_seconds: Idade máxima do aquecimento
+        """
+        return time.time() - self._warmed().get(site, 0) < max_age_seconds
+
+    def mark_warm(self, site: str):
+        warmed = self._warmed()
+        warmed[site] = time.time()
+        self.update_meta(warmed_at=warmed)
+
+    def release(self):
+        self.manager.release(self)
+
+
+class ProfileManager:
+    """
+    Gerencia um conjunto fixo de perfis (um por vaga do navegador)
+
+    Cada vaga é uma pasta user-data-dir travada por um arquivo de lock com o
+    PID do dono, para que dois navegadores nunca abram o mesmo perfil. Ao
+    travar e ao liberar, o perfil é limpo: acima de BROWSER_PROFILE_MAX_MB o
+    cache é apagado (cookies e storage ficam); se ainda exceder, ou se o
+    perfil for mais velho que BROWSER_PROFILE_MAX_AGE_DAYS, ele é recriado.
+    """
+
+    def __init__(self, root: Path = BROWSER_PROFILE_DIR, slots: int = BROWSER_PROFILE_SLOTS,
+                 max_mb: float = BROWSER_PROFILE_MAX_MB, max_age_days: float = BROWSER_PROFILE_MAX_AGE_DAYS):
+        """
+        Args:
+            root: Pasta que contém os perfis
+            slots: Número de perfis (navegadores simultâneos)
+            max_mb: Tamanho máximo de cada perfil em MB
+            max_age_days: Idade máxima do perfil antes de recriá-lo (0 = sem limite)
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.slots = max(1, slots)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 86400
+
+    def acquire(self) -> Optional[ProfileSlot]:
+        """
+        Trava o primeiro perfil livre
+
+        Returns:
+            Perfil travado ou None se todas as vagas estiverem em uso
+        """
+        for index in range(self.slots):
+            path = self.root / f"slot-{index}"
+            path.mkdir(parents=True, exist_ok=True)
+            if self._lock(path):
+                slot = ProfileSlot(self, index, path)
+                self.cleanup(slot)
+                if not slot.meta.get('created_at'):
+                    slot.update_meta(created_at=time.time())
+                logger.info(f"Usando perfil persistente do navegador: {path}")
+                return slot
+        logger.warning(f"Todos os {self.slots} perfis do navegador estão em uso. Usando perfil temporário.")
+        return None
+
+    def release(self, slot: ProfileSlot):
+        """Limpa e destrava o perfil (chamar depois de fechar o navegador)"""
+        try:
+            self.cleanup(slot)
+        finally:
+            try:
+                (slot.path / LOCK_FILE).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _lock(self, path: Path) -> bool:
+        """Cria o arquivo de lock de forma atômica, removendo locks abandonados"""
+        lock_path = path / LOCK_FILE
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._is_stale(lock_path):
+                    return False
+                logger.info(f"Removendo trava abandonada do perfil {path}")
+                try:
+                    lock_path.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def _is_stale(self, lock_path: Path) -> bool:
+        try:
+            pid = int(lock_path.read_text().strip() or 0)
+            age = time.time() - lock_path.stat().st_mtime
+        except (OSError, ValueError):
+            return True
+        alive = _pid_alive(pid) if pid else False
+        if alive is None:
+            return age > STALE_LOCK_SECONDS
+        return not alive
+
+    def cleanup(self, slot: ProfileSlot):
+        """Aplica a política de idade e tamanho ao perfil"""
+        created_at = slot.meta.get('created_at')
+        if self.max_age_seconds and created_at and time.time() - created_at > self.max_age_seconds:
+            logger.info(f"Perfil {slot.path.name} expirou, recriando")
+            self._reset(slot)
+            return
+
+        if not self.max_bytes or directory_size(slot.path) <= self.max_bytes:
+            return
+        for profile_dir in [slot.path] + [p for p in slot.path.iterdir() if p.is_dir()]:
+            for subdir in CACHE_SUBDIRS:
+                shutil.rmtree(profile_dir / subdir, ignore_errors=True)
+        size = directory_size(slot.path)
+        if size > self.max_bytes:
+            logger.info(f"Perfil {slot.path.name} ainda com {size / 1024 / 1024:.0f} MB sem o cache, recriando")
+            self._reset(slot)
+        else:
+            logger.info(f"Cache do perfil {slot.path.name} limpo ({size / 1024 / 1024:.0f} MB)")
+
+    def _reset(self, slot: ProfileSlot):
+        """Apaga o conteúdo do perfil mantendo a trava"""
+        for child in slot.path.iterdir():
+            if child.name == LOCK_FILE:
+                continue
+            if child.is_dir():
+                shutil.rmtree(child, ignore_errors=True)
+            else:
+                child.unlink(missing_ok=True)
+        slot.update_meta(created_at=time.time())
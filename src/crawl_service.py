@@ -0,0 +1,326 @@
+"""
+Modo serviço: processo contínuo com recursos aquecidos, recoletas agendadas
+e uma API HTTP local para enfileirar coletas
+"""
+import json
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from loguru import logger
+
+from config import (
+    SERVICE_HOST, SERVICE_PORT, SERVICE_RECRAWL_MINUTES, SERVICE_CATEGORY_INTERVALS, SERVICE_JOB_HISTORY
+)
+from src.pipeline import run_crawl
+from src.run_budget import RunBudget, get_run_budget, set_run_budget
+
+# Situações de uma coleta
+PENDING = 'pendente'
+RUNNING = 'executando'
+DONE = 'concluido'
+FAILED = 'falhou'
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _number(data: Dict, key: str, cast):
+    """
+    Lê um número opcional do corpo do POST
+
+    Raises:
+        ValueError: Se o valor não for numérico, for infinito ou negativo
+    """
+    value = data.get(key)
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        value = cast(value)
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError(f"'{key}' deve ser numérico") from None
+    if not math.isfinite(value):
+        raise ValueError(f"'{key}' deve ser numérico")
+    if value < 0:
+        raise ValueError(f"'{key}' não pode ser negativo")
+    return value
+
+
+def _categories(data: Dict) -> Optional[List[str]]:
+    """
+    Lê a lista opcional de categorias do corpo do POST
+
+    Raises:
+        ValueError: Se não for uma lista não vazia de textos não vazios
+    """
+    categories = data.get('categorias')
+    if categories is None:
+        return None
+    if (not isinstance(categories, list) or not categories
+            or not all(isinstance(url, str) and url.strip() for url in categories)):
+        raise ValueError("'categorias' deve ser uma lista de URLs")
+    return [url.strip() for url in categories]
+
+
+class CrawlJob:
+    """Uma coleta enfileirada (agendada ou pedida pela API)"""
+
+    def __init__(self, categories: List[str], max_pages: int, origin: str,
+                 time_budget: Optional[float] = None, max_requests: Optional[int] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.categories = categories
+        self.max_pages = max_pages
+        self.origin = origin
+        self.time_budget = time_budget
+        self.max_requests = max_requests
+        self.status = PENDING
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.summary = None
+        self.error = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id, 'status': self.status, 'origem': self.origin,
+            'categorias': self.categories, 'max_paginas': self.max_pages,
+            'time_budget': self.time_budget, 'max_requests': self.max_requests,
+            'criado_em': self.created_at, 'iniciado_em': self.started_at, 'concluido_em': self.finished_at,
+            'resumo': self.summary, 'erro': self.error,
+        }
+
+
+class CrawlService:
+    """
+    Executa coletas em sequência reaproveitando os mesmos componentes
+
+    O WebScraper (navegador, perfil, sessões HTTP da thread de coleta), o
+    ImageDownloader e o DataExporter são criados uma vez e usados por todas
+    as coletas, que rodam uma de cada vez numa única thread. Um agendador
+    enfileira a recoleta de cada categoria no seu intervalo; a API local
+    aceita coletas avulsas e informa a situação da fila:
+
+        GET  /status          situação do serviço, fila e agenda
+        GET  /jobs            coletas recentes
+        GET  /jobs/<id>       uma coleta
+        POST /jobs            {"categorias": [...], "max_pages": 1, "time_budget": 600, "max_requests": 500}
+    """
+
+    def __init__(self, scraper, image_downloader, data_exporter, categories: List[str], max_pages: int = 1,
+                 recrawl_minutes: float = SERVICE_RECRAWL_MINUTES, intervals: Dict[str, float] = None,
+                 host: str = SERVICE_HOST, port: int = SERVICE_PORT, history: int = SERVICE_JOB_HISTORY):
+        """
+        Args:
+            scraper: WebScraper já inicializado
+            image_downloader: ImageDownloader
+            data_exporter: DataExporter
+            categories: Categorias recoletadas periodicamente (e padrão de POST /jobs)
+            max_pages: Páginas por categoria
+            recrawl_minutes: Intervalo padrão de recoleta (0 = sem agenda)
+            intervals: Intervalo em minutos por URL de categoria (sobrepõe o padrão)
+            host: Endereço da API (use 127.0.0.1 para aceitar só conexões locais)
+            port: Porta da API
+            history: Número de coletas concluídas mantidas em /jobs
+        """
+        self.scraper = scraper
+        self.image_downloader = image_downloader
+        self.data_exporter = data_exporter
+        self.categories = categories
+        self.max_pages = max_pages
+        self.host = host
+        self.port = port
+        self.history = history
+        intervals = SERVICE_CATEGORY_INTERVALS if intervals is None else intervals
+        self.intervals = {
+            url: intervals.get(url, recrawl_minutes) * 60 for url in categories if intervals.get(url, recrawl_minutes)
+        }
+        # Primeira recoleta agendada logo ao iniciar
+        self.next_run = {url: time.monotonic() for url in self.intervals}
+        self.started_at = _now()
+        self.jobs: 'OrderedDict[str, CrawlJob]' = OrderedDict()
+        self.current: Optional[CrawlJob] = None
+        self._queue: 'queue.Queue[CrawlJob]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._worker_thread = None
+
+    def submit(self, categories: List[str] = None, max_pages: int = None, origin: str = 'api',
+               time_budget: Optional[float] = None, max_requests: Optional[int] = None) -> Optional[CrawlJob]:
+        """
+        Enfileira uma coleta
+
+        Categorias que já estão pendentes em outra coleta da fila são
+        ignoradas (não há por que coletá-las duas vezes seguidas).
+
+        Returns:
+            A coleta criada, ou None se todas as categorias já estavam na fila
+        """
+        categories = list(categories or self.categories)
+        with self._lock:
+            queued = {url for job in self.jobs.values() if job.status == PENDING for url in job.categories}
+            categories = [url for url in categories if url not in queued]
+            if not categories:
+                return None
+            job = CrawlJob(categories, max_pages or self.max_pages, origin, time_budget, max_requests)
+            self.jobs[job.id] = job
+            self._trim_history()
+        self._queue.put(job)
+        logger.info(f"Coleta {job.id} enfileirada ({origin}): {len(categories)} categoria(s)")
+        return job
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def _worker(self):
+        """Executa as coletas da fila, uma de cada vez"""
+        while not self._stop.is_set():
+            try:
+                job = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._run(job)
+
+    def _run(self, job: CrawlJob):
+        with self._lock:
+            job.status = RUNNING
+            job.started_at = _now()
+            self.current = job
+        # Cada coleta tem seu próprio orçamento (a thread de coleta é única)
+        set_run_budget(RunBudget(job.time_budget, job.max_requests))
+        run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job.id}"
+        logger.info(f"Iniciando coleta {job.id}")
+        try:
+            summary = run_crawl(self.scraper, self.image_downloader, self.data_exporter,
+                                job.categories, job.max_pages, run_id)
+            with self._lock:
+                job.summary = summary
+                job.status = DONE
+            logger.info(f"Coleta {job.id} concluída: {summary['produtos']} produtos")
+        except Exception as e:
+            logger.exception(f"Erro na coleta {job.id}: {e}")
+            with self._lock:
+                job.error = str(e)
+                job.status = FAILED
+        finally:
+            with self._lock:
+                job.finished_at = _now()
+                self.current = None
+
+    def _scheduler(self):
+        """Enfileira as categorias cujo intervalo de recoleta venceu"""
+        while not self._stop.wait(5):
+            now = time.monotonic()
+            due = [url for url, next_run in self.next_run.items() if next_run <= now]
+            if not due:
+                continue
+            for url in due:
+                self.next_run[url] = now + self.intervals[url]
+            self.submit(due, origin='agenda')
+
+    def status(self) -> Dict:
+        """Situação do serviço: fila, coleta atual, agenda e contagem por situação"""
+        now = time.monotonic()
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                'iniciado_em': self.started_at,
+                'fila': self._queue.qsize(),
+                'executando': self.current.id if self.current else None,
+                'coletas': counts,
+                'agenda': [
+                    {'categoria': url, 'intervalo_min': self.intervals[url] / 60,
+                     'proxima_em_s': max(0, round(self.next_run[url] - now))}
+                    for url in self.intervals
+                ],
+            }
+
+    def serve_forever(self):
+        """Inicia agendador, coletor e API; bloqueia até stop() (ou Ctrl+C)"""
+        if self.scraper.driver:
+            self.scraper.warm_up()
+        self._worker_thread = threading.Thread(target=self._worker, name="coleta", daemon=True)
+        self._worker_thread.start()
+        if self.intervals:
+            threading.Thread(target=self._scheduler, name="agenda", daemon=True).start()
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        logger.info(f"Serviço de coleta em http://{self.host}:{self.port} "
+                    f"({len(self.intervals)} categoria(s) com recoleta agendada)")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._stop.set()
+            get_run_budget().cancel("serviço encerrado")
+            # A coleta em andamento para de agendar trabalho e exporta o parcial
+            self._worker_thread.join(timeout=120)
+
+    def stop(self):
+        """Encerra serve_forever (a partir de outra thread)"""
+        if self._server:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+
+def _make_handler(service: CrawlService):
+    """Handler HTTP ligado ao serviço"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.rstrip('/')
+            if path == '/status':
+                return self._send(200, service.status())
+            if path == '/jobs':
+                with service._lock:
+                    jobs = [job.to_dict() for job in reversed(service.jobs.values())]
+                return self._send(200, jobs)
+            if path.startswith('/jobs/'):
+                with service._lock:
+                    job = service.jobs.get(path[len('/jobs/'):])
+                    payload = job.to_dict() if job else None
+                if payload is None:
+                    return self._send(404, {'erro': 'coleta não encontrada'})
+                return self._send(200, payload)
+            self._send(404, {'erro': 'rota não encontrada'})
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/jobs':
+                return self._send(404, {'erro': 'rota não encontrada'})
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                data = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(data, dict):
+                    raise ValueError("o corpo deve ser um objeto JSON")
+                job = service.submit(
+                    _categories(data), _number(data, 'max_pages', int), 'api',
+                    _number(data, 'time_budget', float), _number(data, 'max_requests', int)
+                )
+            except (ValueError, TypeError) as e:
+                return self._send(400, {'erro': str(e)})
+            if job is None:
+                return self._send(409, {'erro': 'categorias já estão na fila'})
+            self._send(202, job.to_dict())
+
+        def log_message(self, format, *args):
+            logger.debug(f"API {self.address_string()}: {format % args}")
+
+    return Handler
@@ -1,20 +1,33 @@
 """
 Módulo para exportar dados dos produtos para planilhas
 """
+import csv
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional
 from loguru import logger
 
 from config import PLANILHAS_DIR, EXCEL_FILENAME, CSV_FILENAME, SHEET_NAME
+from src.product_record import to_frame
+from src.normalize import normalize_frame
+
+# Ordem preferida das colunas nas planilhas
+PREFERRED_COLUMNS = ['id', 'nome', 'categoria', 'categoria_canonica', 'preco', 'preco_original',
+                     'descricao', 'sku', 'estoque', 'imagem_url', 'imagens_galeria',
+                     'variacoes', 'link', 'data_coleta']
 
 
 class DataExporter:
     """Classe para exportar dados para planilhas"""
     
-    def __init__(self):
+    def __init__(self, store=None):
+        """
+        Args:
+            store: ProductStore opcional; quando presente, as planilhas são geradas a partir dele
+        """
         self.planilhas_dir = PLANILHAS_DIR
+        self.store = store
         
     def export_to_excel(self, products: List[Dict], filename: str = None) -> Path:
         """
@@ -38,15 +51,11 @@ class DataExporter:
         
         try:
             # Cria DataFrame
-            df = pd.DataFrame(products)
-            
-            # Reordena colunas (se existirem)
-            preferred_order = ['id', 'nome', 'categoria', 'preco', 'preco_original', 
-                             'descricao', 'imagem_url', 'link', 'data_coleta']
+            df = normalize_frame(to_frame(products))
             
             # Reordena colunas mantendo as que existem
-            existing_cols = [col for col in preferred_order if col in df.columns]
-            other_cols = [col for col in df.columns if col not in preferred_order]
+            existing_cols = [col for col in PREFERRED_COLUMNS if col in df.columns]
+            other_cols = [col for col in df.columns if col not in PREFERRED_COLUMNS]
             df = df[existing_cols + other_cols]
             
             # Salva Excel
@@ -96,7 +105,7 @@ class DataExporter:
         
         try:
             # Cria DataFrame
-            df = pd.DataFrame(products)
+            df = normalize_frame(to_frame(products))
             
             # Salva CSV
             df.to_csv(file_path, index=False, encoding=encoding, sep=';')
@@ -110,6 +119,63 @@ class DataExporter:
             logger.error(f"Erro ao exportar para CSV: {e}")
             raise
     
+    def stream_csv(self, products: Iterable[Dict], filename: str = None,
+                   chunk_size: int = 200, encoding: str = 'utf-8-sig') -> Iterator[Dict]:
+        """
+        Grava produtos em CSV à medida que chegam, repassando-os adiante
+        
+        Os produtos são gravados em blocos de chunk_size linhas, sem esperar
+        o fim da coleta. O arquivo fica completo quando o iterador é esgotado.
+        
+        Args:
+            products: Iterável de produtos (ex.: saída da etapa de detalhes)
+            filename: Nome do arquivo (opcional)
+            chunk_size: Número de linhas por escrita
+            encoding: Codificação do arquivo (utf-8-sig para Excel)
+            
+        Yields:
+            Os mesmos produtos recebidos, após serem enfileirados para escrita
+        """
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"produtos_{timestamp}.csv"
+        
+        if not filename.endswith('.csv'):
+            filename += '.csv'
+        
+        file_path = self.planilhas_dir / filename
+        writer = None
+        chunk = []
+        count = 0
+        
+        with open(file_path, 'w', newline='', encoding=encoding) as f:
+            for product in products:
+                chunk.append(product)
+                if len(chunk) >= chunk_size:
+                    writer = self._write_csv_chunk(f, writer, chunk)
+                    count += len(chunk)
+                    chunk = []
+                yield product
+            
+            if chunk:
+                writer = self._write_csv_chunk(f, writer, chunk)
+                count += len(chunk)
+        
+        logger.info(f"Planilha CSV (streaming) salva: {file_path}")
+        logger.info(f"Total de produtos exportados: {count}")
+    
+    def _write_csv_chunk(self, f, writer, chunk: List[Dict]):
+        """Escreve um bloco de linhas no CSV, criando o writer no primeiro bloco"""
+        if writer is None:
+            # Usa todas as colunas preferidas: blocos seguintes podem trazer campos ausentes no primeiro
+            keys = {key for product in chunk for key in product}
+            fieldnames = PREFERRED_COLUMNS + sorted(keys - set(PREFERRED_COLUMNS))
+            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', extrasaction='ignore')
+            writer.writeheader()
+        writer.writerows(chunk)
+        f.flush()
+        return writer
+    
     def export_both(self, products: List[Dict], base_filename: str = None) -> Dict[str, Path]:
         """
         Exporta para Excel e CSV
@@ -153,4 +219,34 @@ class DataExporter:
                 product['imagem_local'] = image_paths[product_id]
         
         return products
-
+    
+    def save_to_store(self, products: List[Dict], run_id: Optional[str] = None) -> int:
+        """
+        Grava os produtos no banco local (se configurado)
+        
+        Args:
+            products: Lista de produtos
+            run_id: Identificador da execução
+            
+        Returns:
+            Número de produtos gravados
+        """
+        if not self.store:
+            return 0
+        return self.store.upsert_products(products, run_id)
+    
+    def export_view(self, base_filename: str = None, **filters) -> Dict[str, Path]:
+        """
+        Gera Excel e CSV a partir de uma consulta ao banco local
+        
+        Args:
+            base_filename: Nome base do arquivo (sem extensão)
+            **filters: Filtros de ProductStore.query (categoria, since, until, search, run_id, latest_only)
+            
+        Returns:
+            Dicionário com caminhos dos arquivos salvos
+        """
+        if not self.store:
+            raise ValueError("Banco de produtos não configurado no DataExporter")
+        products = self.store.query(**filters)
+        return self.export_both(products, base_filename)
@@ -0,0 +1,216 @@
+"""
+Deduplicação com memória limitada para catálogos grandes
+"""
+import hashlib
+import math
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from config import CACHE_DIR, DEDUP_MODE, DEDUP_BLOOM_CAPACITY, DEDUP_BLOOM_ERROR_RATE
+
+# Parâmetros de rastreamento ignorados na URL canônica
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid')
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normaliza uma URL para comparação
+
+    Remove fragmento e parâmetros de rastreamento, ordena a query string e
+    padroniza esquema, host e barra final.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def hash_key(key: str, kind: str = "") -> bytes:
+    """Calcula um hash de 16 bytes para a chave, separado por tipo ('id', 'url', 'image')"""
+    return hashlib.blake2b(f"{kind}\x1f{key}".encode('utf-8'), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Filtro de Bloom: teste de pertinência aproximado com memória fixa"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Args:
+            capacity: Número de itens esperado
+            error_rate: Taxa de falsos positivos desejada na capacidade
+        """
+        capacity = max(1, capacity)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        """Posições dos bits via hashing duplo (Kirsch-Mitzenmacher)"""
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, digest: bytes) -> bool:
+        """Adiciona um hash de 16 bytes; retorna True se ainda não estava presente"""
+        added = False
+        for pos in self._positions(digest):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class DiskHashSet:
+    """Conjunto exato de hashes armazenado em SQLite (com valor opcional por chave)"""
+
+    def __init__(self, path: Path, cache_kb: int = 8192, commit_every: int = 10000):
+        """
+        Args:
+            path: Arquivo do banco
+            cache_kb: Cache de páginas do SQLite em KB (limita a memória usada)
+            commit_every: Número de inserções por transação
+        """
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(f"PRAGMA cache_size=-{int(cache_kb)}")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (h BLOB PRIMARY KEY, value TEXT) WITHOUT ROWID")
+        self.commit_every = commit_every
+        self._pending = 0
+
+    def add(self, digest: bytes, value: str = "") -> Tuple[bool, Optional[str]]:
+        """
+        Adiciona um hash
+
+        Returns:
+            Tupla (é novo, valor já armazenado se não for novo)
+        """
+        cursor = self.conn.execute("INSERT OR IGNORE INTO seen (h, value) VALUES (?, ?)", (digest, value))
+        if cursor.rowcount:
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self.conn.commit()
+                self._pending = 0
+            return True, None
+        row = self.conn.execute("SELECT value FROM seen WHERE h = ?", (digest,)).fetchone()
+        return False, row[0] if row else None
+
+    def get(self, digest: bytes) -> Optional[str]:
+        """Valor associado a um hash, ou None se ele não estiver presente"""
+        row = self.conn.execute("SELECT value FROM seen WHERE h = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, digest: bytes) -> bool:
+        return self.conn.execute("SELECT 1 FROM seen WHERE h = ?", (digest,)).fetchone() is not None
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class Deduplicator:
+    """
+    Deduplicação em fluxo para IDs de produto, URLs canônicas e URLs de imagem
+
+    Modo 'exact' guarda hashes de 16 bytes em SQLite (memória limitada ao cache
+    de páginas), com um valor opcional por chave (ex.: a chave da imagem
+    gravada); modo 'bloom' usa um filtro de Bloom em memória fixa, com uma
+    pequena taxa de falsos positivos (itens novos tratados como repetidos).
+    """
+
+    def __init__(self, mode: str = DEDUP_MODE, path: Optional[Path] = None,
+                 capacity: int = DEDUP_BLOOM_CAPACITY, error_rate: float = DEDUP_BLOOM_ERROR_RATE):
+        """
+        Args:
+            mode: 'exact' ou 'bloom'
+            path: Arquivo do conjunto exato (padrão: arquivo temporário removido em close)
+            capacity: Capacidade esperada do filtro de Bloom
+            error_rate: Taxa de falsos positivos do filtro de Bloom
+        """
+        if mode not in ('exact', 'bloom'):
+            raise ValueError(f"Modo de deduplicação inválido: {mode}. Use 'exact' ou 'bloom'")
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._temp_path = None
+        self.duplicates = 0
+        if mode == 'bloom':
+            self.store = BloomFilter(capacity, error_rate)
+        else:
+            if path is None:
+                handle = tempfile.NamedTemporaryFile(prefix="dedup_", suffix=".db", dir=CACHE_DIR, delete=False)
+                handle.close()
+                path = self._temp_path = Path(handle.name)
+            self.store = DiskHashSet(path)
+
+    def _key(self, key: str, kind: str) -> bytes:
+        if kind in ('url', 'image'):
+            key = canonical_url(key)
+        return hash_key(key, kind)
+
+    def check(self, key: str, kind: str = 'id', value: str = "") -> Tuple[bool, Optional[str]]:
+        """
+        Registra uma chave e informa se ela é nova
+
+        Args:
+            key: ID do produto ou URL
+            kind: 'id', 'url' ou 'image' (URLs são canonicalizadas)
+            value: Valor associado à chave (só guardado no modo exato)
+
+        Returns:
+            Tupla (é nova, valor associado na primeira ocorrência; None no modo bloom)
+        """
+        digest = self._key(key, kind)
+        with self._lock:
+            if self.mode == 'bloom':
+                is_new, stored = self.store.add(digest), None
+            else:
+                is_new, stored = self.store.add(digest, value)
+            if not is_new:
+                self.duplicates += 1
+        return is_new, stored
+
+    def get(self, key: str, kind: str = 'id') -> Optional[str]:
+        """Valor associado a uma chave já registrada, sem registrá-la (None no modo bloom)"""
+        if self.mode == 'bloom':
+            return None
+        digest = self._key(key, kind)
+        with self._lock:
+            return self.store.get(digest)
+
+    def is_new(self, key: str, kind: str = 'id') -> bool:
+        """Registra uma chave e retorna True se ela ainda não tinha sido vista"""
+        return self.check(key, kind)[0]
+
+    def close(self):
+        """Libera recursos e remove o arquivo temporário, se houver"""
+        if isinstance(self.store, DiskHashSet):
+            self.store.close()
+        if self._temp_path:
+            self._temp_path.unlink(missing_ok=True)
+            self._temp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
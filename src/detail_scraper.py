@@ -0,0 +1,320 @@
+"""
+Módulo para scraping das páginas de detalhe dos produtos
+"""
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from bs4 import BeautifulSoup
+from loguru import logger
+from tqdm import tqdm
+
+from config import (
+    BASE_URL, DETAIL_MAX_WORKERS, DETAIL_BATCH_SIZE, DETAIL_REQUESTS_PER_SECOND,
+    DETAIL_CACHE_FILE, DETAIL_SELECTORS
+)
+from src.utils import fetch, build_absolute_url, clean_text, HostRateLimiter
+from src.parse_pool import get_parse_pool
+from src.log_utils import log_sampled, with_log_context
+from src.run_budget import get_run_budget
+
+# Campos da listagem que compõem a impressão digital do produto
+FINGERPRINT_FIELDS = ('nome', 'preco_original', 'imagem_url', 'link')
+
+# Campos preenchidos pela página de detalhe
+DETAIL_FIELDS = ('descricao', 'sku', 'estoque', 'imagens_galeria', 'variacoes')
+
+
+def listing_fingerprint(product: Dict) -> str:
+    """Calcula a impressão digital dos dados de listagem de um produto"""
+    raw = '\x1f'.join(str(product.get(field, '')) for field in FINGERPRINT_FIELDS)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def extract_details_from_soup(soup: BeautifulSoup, base_url: str, selectors: Dict = None) -> Dict:
+    """
+    Extrai informações da página de detalhe de um produto
+
+    Args:
+        soup: Página de detalhe já parseada
+        base_url: URL base para construir URLs absolutas
+        selectors: Seletores CSS (padrão: DETAIL_SELECTORS do config.py)
+
+    Returns:
+        Dicionário com descricao, sku, estoque, imagens_galeria e variacoes
+    """
+    selectors = selectors or DETAIL_SELECTORS
+
+    description_elem = soup.select_one(selectors['description']) if selectors.get('description') else None
+    sku_elem = soup.select_one(selectors['sku']) if selectors.get('sku') else None
+    stock_elem = soup.select_one(selectors['stock']) if selectors.get('stock') else None
+
+    # Galeria: WooCommerce guarda a imagem grande no link ou em data-large_image
+    gallery = []
+    for item in soup.select(selectors['gallery_image']) if selectors.get('gallery_image') else []:
+        link_elem = item.find('a')
+        img_elem = item.find('img')
+        image_url = (link_elem.get('href') if link_elem else None) or \
+            (img_elem.get('data-large_image') or img_elem.get('src') if img_elem else None)
+        if image_url:
+            image_url = build_absolute_url(base_url, image_url)
+            if image_url not in gallery:
+                gallery.append(image_url)
+
+    # Variações: formulário de produto variável traz o JSON em data-product_variations
+    variations = []
+    form_elem = soup.select_one(selectors['variations_form']) if selectors.get('variations_form') else None
+    if form_elem and form_elem.get('data-product_variations'):
+        try:
+            for variation in json.loads(form_elem['data-product_variations']) or []:
+                variations.append({
+                    'atributos': variation.get('attributes', {}),
+                    'sku': variation.get('sku', ''),
+                    'preco': variation.get('display_price'),
+                    'em_estoque': variation.get('is_in_stock'),
+                })
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.debug(f"Variações inválidas: {e}")
+
+    return {
+        'descricao': clean_text(description_elem.get_text(' ')) if description_elem else "",
+        'sku': clean_text(sku_elem.get_text()) if sku_elem else "",
+        'estoque': clean_text(stock_elem.get_text()) if stock_elem else "",
+        'imagens_galeria': ' | '.join(gallery),
+        'variacoes': json.dumps(variations, ensure_ascii=False) if variations else "",
+    }
+
+
+def extract_details_from_html(html_content, base_url: str, selectors: Dict = None) -> Dict:
+    """
+    Faz parse do HTML e extrai os detalhes do produto
+
+    Args:
+        html_content: HTML da página (str ou bytes)
+        base_url: URL base para construir URLs absolutas
+        selectors: Seletores CSS (padrão: DETAIL_SELECTORS do config.py)
+
+    Returns:
+        Dicionário com descricao, sku, estoque, imagens_galeria e variacoes
+    """
+    soup = BeautifulSoup(html_content, 'lxml')
+    return extract_details_from_soup(soup, base_url, selectors)
+
+
+class ProductDetailScraper:
+    """Classe para enriquecer produtos com dados da página de detalhe"""
+
+    def __init__(self, base_url: str = None, max_workers: int = DETAIL_MAX_WORKERS,
+                 batch_size: int = DETAIL_BATCH_SIZE, cache_file: Path = DETAIL_CACHE_FILE,
+                 fetch_html: Optional[Callable[[str], Optional[bytes]]] = None,
+                 rate_limiter: Optional[HostRateLimiter] = None, selectors: Dict = None):
+        """
+        Args:
+            base_url: URL base para construir URLs absolutas
+            max_workers: Número de requisições simultâneas
+            batch_size: Número de produtos por lote
+            cache_file: Arquivo JSON com o cache de detalhes (None desabilita o cache)
+            fetch_html: Função que retorna o HTML de uma URL (padrão: requisição HTTP)
+            rate_limiter: Limitador de taxa por host compartilhado
+            selectors: Seletores CSS da página de detalhe (padrão: DETAIL_SELECTORS do config.py)
+        """
+        self.base_url = base_url or BASE_URL
+        self.selectors = selectors or DETAIL_SELECTORS
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.fetch_html = fetch_html or self._fetch_html_http
+        self.rate_limiter = rate_limiter or HostRateLimiter(DETAIL_REQUESTS_PER_SECOND)
+        self.cache: Dict[str, Dict] = self._load_cache()
+        self._cache_lock = threading.Lock()
+        self.fetched_count = 0
+        self.cached_count = 0
+        self.failed_count = 0
+        self.skipped_count = 0
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        """Carrega o cache de detalhes do disco"""
+        if not self.cache_file or not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache de detalhes inválido, ignorando: {e}")
+            return {}
+
+    def save_cache(self):
+        """Grava o cache de detalhes no disco (escrita atômica)"""
+        if not self.cache_file:
+            return
+        with self._cache_lock:
+            data = json.dumps(self.cache, ensure_ascii=False)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        tmp_path.replace(self.cache_file)
+
+    def _fetch_html_http(self, url: str) -> Optional[bytes]:
+        """Obtém HTML da página de detalhe via HTTP"""
+        self.rate_limiter.wait(url)
+        response = fetch(url)
+        if not response:
+            return None
+        return response.content
+
+    def extract_details(self, soup: BeautifulSoup, base_url: str = "") -> Dict:
+        """
+        Extrai informações da página de detalhe de um produto
+
+        Args:
+            soup: Página de detalhe já parseada
+            base_url: URL base para construir URLs absolutas
+
+        Returns:
+            Dicionário com descricao, sku, estoque, imagens_galeria e variacoes
+        """
+        return extract_details_from_soup(soup, base_url or self.base_url, self.selectors)
+
+    def fetch_details(self, url: str) -> Optional[Dict]:
+        """
+        Baixa e extrai a página de detalhe de um produto
+
+        Args:
+            url: URL da página do produto
+
+        Returns:
+            Dicionário com os detalhes ou None em caso de falha
+        """
+        html_content = self.fetch_html(url)
+        if not html_content:
+            return None
+        try:
+            # Parse em outro processo: a thread libera o GIL para os demais downloads
+            parse_pool = get_parse_pool()
+            if parse_pool:
+                return parse_pool.parse('detail', html_content, self.base_url, self.selectors)
+            soup = BeautifulSoup(html_content, 'lxml')
+            return self.extract_details(soup, self.base_url)
+        except Exception as e:
+            log_sampled("Erro ao extrair detalhes", 'ERROR', f"Erro ao extrair detalhes de {url}: {e}", url=url)
+            return None
+
+    def _cached_details(self, product: Dict) -> Optional[Dict]:
+        """Retorna detalhes do cache se a listagem do produto não mudou"""
+        entry = self.cache.get(product.get('link', ''))
+        if entry and entry.get('fingerprint') == listing_fingerprint(product):
+            return entry.get('detalhes')
+        return None
+
+    def _process(self, product: Dict) -> Dict:
+        """Busca detalhes de um produto e atualiza o cache"""
+        link = product['link']
+        details = self.fetch_details(link)
+        with self._cache_lock:
+            if details is None:
+                self.failed_count += 1
+                return product
+            self.cache[link] = {'fingerprint': listing_fingerprint(product), 'detalhes': details}
+            self.fetched_count += 1
+        product.update(details)
+        return product
+
+    def iter_enriched(self, products: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Enriquece produtos com dados da página de detalhe, em lotes
+
+        Produtos cuja listagem não mudou desde a última coleta usam o cache
+        e são devolvidos imediatamente. Os demais são buscados em paralelo,
+        com no máximo max_workers requisições em voo, e devolvidos conforme
+        terminam (a ordem de saída não é a de entrada). Com o orçamento da
+        execução esgotado, os produtos restantes são devolvidos sem detalhes
+        (exceto os que estão no cache).
+
+        Args:
+            products: Produtos da listagem (os dicionários são atualizados)
+
+        Yields:
+            Produtos enriquecidos com descricao, sku, estoque, imagens_galeria e variacoes
+        """
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="detalhe") as executor:
+            for product in products:
+                if not product.get('link'):
+                    yield product
+                    continue
+
+                details = self._cached_details(product)
+                if details is not None:
+                    self.cached_count += 1
+                    product.update(details)
+                    yield product
+                    continue
+
+                if get_run_budget().exhausted:
+                    self.skipped_count += 1
+                    yield product
+                    continue
+
+                batch.append(product)
+                if len(batch) >= self.batch_size:
+                    yield from self._run_batch(executor, batch)
+                    batch = []
+
+            if batch:
+                yield from self._run_batch(executor, batch)
+
+        logger.info(
+            f"Páginas de detalhe: {self.fetched_count} buscadas, "
+            f"{self.cached_count} do cache, {self.failed_count} falhas"
+        )
+        if self.skipped_count:
+            logger.warning(f"{self.skipped_count} produtos sem página de detalhe (orçamento da execução esgotado)")
+
+    def _run_batch(self, executor: ThreadPoolExecutor, batch: List[Dict]) -> Iterator[Dict]:
+        """Executa um lote mantendo no máximo max_workers tarefas em voo"""
+        budget = get_run_budget()
+        process = with_log_context(self._process)
+        pending = {}
+        queue = iter(batch)
+        for product in queue:
+            pending[executor.submit(process, product)] = product
+            if len(pending) >= self.max_workers:
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                product = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    log_sampled("Erro ao processar página de detalhe", 'ERROR',
+                                f"Erro ao processar página de detalhe de {product.get('link')}: {e}",
+                                url=product.get('link'))
+                    self.failed_count += 1
+                    yield product
+                next_product = next(queue, None)
+                if next_product is not None and budget.exhausted:
+                    # Orçamento esgotado: o restante do lote sai sem detalhes
+                    for skipped in [next_product, *queue]:
+                        self.skipped_count += 1
+                        yield skipped
+                elif next_product is not None:
+                    pending[executor.submit(process, next_product)] = next_product
+
+        self.save_cache()
+
+    def enrich_products(self, products: List[Dict]) -> List[Dict]:
+        """
+        Enriquece uma lista de produtos com dados da página de detalhe
+
+        Args:
+            products: Lista de produtos da listagem
+
+        Returns:
+            Lista de produtos enriquecidos
+        """
+        return list(tqdm(self.iter_enriched(products), total=len(products), desc="Páginas de detalhe"))
@@ -0,0 +1,178 @@
+"""
+Cliente HTTP/2 (httpx) para download de imagens com multiplexação de streams
+"""
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from loguru import logger
+
+from config import HEADERS, MAX_RETRIES, IMAGE_HTTP2_MAX_CONNECTIONS
+from src.block_detection import circuit_breakers, BLOCK_STATUS_CODES
+from src.utils import get_timeouts, get_random_user_agent
+from src.run_budget import get_run_budget
+from src.log_utils import log_sampled
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (necessário para http2=True no httpx)
+except ImportError:
+    h2 = None
+
+
+def http2_available() -> bool:
+    """Indica se httpx e h2 estão instalados"""
+    return httpx is not None and h2 is not None
+
+
+class Http2ImageClient:
+    """
+    Cliente compartilhado entre threads que negocia HTTP/2 por ALPN
+
+    Vários downloads simultâneos ao mesmo host viram streams de poucas
+    conexões; servidores sem HTTP/2 recebem HTTP/1.1 automaticamente. As
+    métricas contam, por conexão, quantos streams foram abertos e o máximo em
+    paralelo.
+    """
+
+    def __init__(self, max_connections: int = IMAGE_HTTP2_MAX_CONNECTIONS):
+        """
+        Args:
+            max_connections: Conexões simultâneas no total
+        """
+        if httpx is None:
+            raise ImportError("httpx não instalado. Execute: pip install \"httpx[http2]\"")
+        self.client = httpx.Client(
+            http2=h2 is not None,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._lock = threading.Lock()
+        self._connections: Dict[int, Dict] = {}
+        self._versions: Dict[str, int] = {}
+
+    def get(self, url: str, headers: Optional[dict] = None, retries: int = MAX_RETRIES,
+            record_success: bool = True):
+        """
+        Abre a resposta em modo stream, com os mesmos prazos, retries e circuit
+        breaker de safe_request
+
+        Args:
+            url: URL da imagem
+            headers: Headers customizados
+            retries: Número de tentativas
+            record_success: Registra o sucesso no circuit breaker ao receber 2xx (False quando
+                o chamador verifica o conteúdo antes e registra o resultado)
+
+        Returns:
+            httpx.Response aberta (feche com .close()) ou None em caso de falha
+        """
+        if headers is None:
+            headers = HEADERS.copy()
+            headers['User-Agent'] = get_random_user_agent()
+        budget = get_run_budget()
+        connect_timeout, read_timeout, total_timeout = get_timeouts(url)
+        if budget.remaining_time() is not None:
+            total_timeout = min(total_timeout, budget.remaining_time())
+        deadline = time.monotonic() + total_timeout
+
+        for attempt in range(retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(f"Prazo total de {total_timeout}s esgotado para {url}")
+                return None
+            if not budget.try_request():
+                logger.debug(f"Orçamento da execução esgotado, pulando {url}")
+                return None
+            if not circuit_breakers.allow(url):
+                logger.debug(f"Circuito aberto, pulando {url}")
+                return None
+            response = None
+            try:
+                timeout = httpx.Timeout(min(read_timeout, remaining), connect=min(connect_timeout, remaining))
+                request = self.client.build_request('GET', url, headers=headers, timeout=timeout)
+                response = self.client.send(request, stream=True)
+                response.deadline = deadline
+                self._track(response)
+                if response.status_code in BLOCK_STATUS_CODES:
+                    circuit_breakers.record_block(url, f"HTTP {response.status_code}")
+                    log_sampled("Acesso bloqueado", 'WARNING',
+                                f"Acesso bloqueado (HTTP {response.status_code}) para {url}",
+                                url=url, status=response.status_code)
+                    response.close()
+                    return None
+                if not response.is_success:
+                    # Libera a conexão do pool antes de sinalizar o erro
+                    response.close()
+                    response.raise_for_status()
+                if record_success:
+                    circuit_breakers.record_success(url)
+                return response
+            except httpx.HTTPError as e:
+                if response is not None:
+                    response.close()
+                circuit_breakers.get(url).release_probe()
+                status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                if status is not None and status < 500:
+                    # Erro do cliente (ex.: 404): outra tentativa teria o mesmo resultado
+                    log_sampled("Falha ao acessar", 'ERROR', f"Falha ao acessar {url}: HTTP {status}",
+                                url=url, status=status)
+                    return None
+                log_sampled("Tentativa falhou", 'WARNING',
+                            f"Tentativa {attempt + 1}/{retries} falhou para {url}: {e}",
+                            url=url, tentativa=attempt + 1)
+                backoff = 2 ** attempt
+                if attempt < retries - 1 and deadline - time.monotonic() > backoff:
+                    time.sleep(backoff)
+                else:
+                    log_sampled("Falha ao acessar", 'ERROR',
+                                f"Falha ao acessar {url} após {attempt + 1} tentativa(s)",
+                                url=url)
+                    return None
+        return None
+
+    def _track(self, response):
+        """Conta o stream na conexão que o transportou e o libera ao fechar a resposta"""
+        stream = response.extensions.get('network_stream')
+        key = id(stream) if stream is not None else 0
+        host = urlparse(str(response.url)).netloc
+        with self._lock:
+            self._versions[response.http_version] = self._versions.get(response.http_version, 0) + 1
+            connection = self._connections.get(key)
+            if connection is None:
+                # Guarda o objeto da conexão para que seu id não seja reaproveitado
+                connection = self._connections[key] = {
+                    'host': host, 'versao': response.http_version, 'streams': 0, 'ativos': 0,
+                    'max_simultaneos': 0, '_stream': stream
+                }
+            connection['streams'] += 1
+            connection['ativos'] += 1
+            connection['max_simultaneos'] = max(connection['max_simultaneos'], connection['ativos'])
+
+        close = response.close
+        released = []
+
+        def close_and_release():
+            if not released:
+                released.append(True)
+                with self._lock:
+                    connection['ativos'] -= 1
+            close()
+
+        response.close = close_and_release
+
+    def stats(self) -> Dict:
+        """Versões negociadas e streams por conexão"""
+        with self._lock:
+            connections = [
+                {k: v for k, v in c.items() if k not in ('ativos', '_stream')} for c in self._connections.values()
+            ]
+            return {'versoes': dict(self._versions), 'conexoes': connections}
+
+    def close(self):
+        """Fecha as conexões abertas pelo cliente"""
+        self.client.close()
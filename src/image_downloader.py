@@ -1,115 +1,270 @@
 """
 Módulo para download e organização de imagens dos produtos
 """
+import os
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict
 from PIL import Image
-import io
 from loguru import logger
 from tqdm import tqdm
 
-from config import IMAGES_DIR, IMAGE_FORMATS, MAX_IMAGE_SIZE, RESIZE_IMAGES, MAX_IMAGE_DIMENSION, DELAY_BETWEEN_REQUESTS
+from config import (
+    IMAGE_FORMATS, MAX_IMAGE_SIZE, MAX_IMAGE_PIXELS, IMAGE_CHUNK_SIZE,
+    IMAGE_MAX_WORKERS, IMAGE_REQUESTS_PER_SECOND, IMAGE_HTTP2, IMAGE_NEAR_DUPLICATES
+)
 from src.utils import (
     safe_request, 
     build_absolute_url, 
     get_file_extension, 
     clean_filename,
-    create_category_folder,
-    sanitize_category
+    sniff_image_format,
+    report_block,
+    report_success,
+    release_probe,
+    HostRateLimiter
 )
+from src.dedup import Deduplicator, canonical_url
+from src.single_flight import SingleFlight
+from src.log_utils import log_sampled, with_log_context
+from src.block_detection import detect_block
+from src.proxy_pool import get_proxy_pool
+from src.run_budget import get_run_budget
+from src.image_processing import ImageProcessor
+from src.image_hash import PerceptualHashIndex, dhash
+from src.image_storage import ImageStorage, create_image_storage
 
 
 class ImageDownloader:
     """Classe para gerenciar download de imagens"""
     
-    def __init__(self, base_url: str = ""):
+    def __init__(self, base_url: str = "", processor: Optional[ImageProcessor] = None,
+                 max_workers: int = IMAGE_MAX_WORKERS, rate_limiter: Optional[HostRateLimiter] = None,
+                 hash_index: Optional[PerceptualHashIndex] = None, storage: Optional[ImageStorage] = None):
+        """
+        Args:
+            base_url: URL base para construir URLs absolutas
+            processor: Etapa de processamento das imagens
+            max_workers: Downloads simultâneos
+            rate_limiter: Limitador de taxa por host compartilhado
+            hash_index: Índice de hashes perceptuais (padrão: o de IMAGE_HASH_INDEX_FILE,
+                se IMAGE_NEAR_DUPLICATES estiver ativo)
+            storage: Destino das imagens (padrão: o de IMAGE_STORAGE)
+        """
         self.base_url = base_url
+        self.processor = processor or ImageProcessor()
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = rate_limiter or HostRateLimiter(IMAGE_REQUESTS_PER_SECOND)
         self.downloaded_count = 0
         self.failed_count = 0
+        self.skipped_count = 0
+        self.near_duplicate_count = 0
+        self.reused_count = 0
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self.storage = storage or create_image_storage()
+        self.http2_client = self._create_http2_client() if IMAGE_HTTP2 else None
+        if hash_index is None and IMAGE_NEAR_DUPLICATES:
+            hash_index = PerceptualHashIndex()
+        self.hash_index = hash_index
+    
+    def _create_http2_client(self):
+        """Cria o cliente HTTP/2 se o httpx com suporte a h2 estiver instalado"""
+        from src.http2_client import Http2ImageClient, http2_available
+        if get_proxy_pool():
+            logger.info("Pool de proxies ativo: imagens usam o cliente HTTP/1.1 com os proxies")
+            return None
+        if not http2_available():
+            logger.info("httpx[http2] não instalado. Imagens usam o cliente HTTP/1.1 padrão.")
+            return None
+        return Http2ImageClient()
         
-    def download_image(self, image_url: str, save_path: Path) -> bool:
+    def download_image(self, image_url: str, key: str) -> Optional[str]:
         """
         Faz download de uma imagem
         
+        O conteúdo é lido em blocos direto para um arquivo temporário, com limite
+        rígido de tamanho. Respostas que não são imagem (ex.: página HTML de erro)
+        são rejeitadas pelo primeiro bloco, e as dimensões são validadas pelo
+        cabeçalho antes de qualquer decodificação. Com o índice de hashes
+        perceptuais ativo, uma imagem quase idêntica a outra já salva não é
+        gravada de novo: a chave retornada é a da existente.
+        
         Args:
             image_url: URL da imagem
-            save_path: Caminho onde salvar a imagem
+            key: Chave reservada no destino (a extensão segue o formato final)
             
         Returns:
-            True se download foi bem-sucedido, False caso contrário
+            Chave da imagem gravada se download foi bem-sucedido, None caso contrário
         """
+        tmp_path = None
+        save_path = self.storage.staging_path(key)
         try:
             # Faz requisição para a imagem
-            response = safe_request(image_url)
+            self.rate_limiter.wait(image_url)
+            # O sucesso só é registrado depois de confirmar que o conteúdo é uma imagem
+            if self.http2_client:
+                response = self.http2_client.get(image_url, record_success=False)
+            else:
+                response = safe_request(image_url, record_success=False)
             if not response:
-                return False
+                return None
+            
+            try:
+                # Verifica tamanho do arquivo
+                content_length = response.headers.get('Content-Length')
+                if content_length and int(content_length) > MAX_IMAGE_SIZE:
+                    log_sampled("Imagem muito grande", 'WARNING',
+                                f"Imagem muito grande: {image_url}", url=image_url)
+                    return None
+                
+                tmp_path = self._stream_to_temp(response, image_url, save_path.parent)
+            finally:
+                response.close()
+                if tmp_path:
+                    report_success(response, image_url)
+                else:
+                    release_probe(response, image_url)
             
-            # Verifica tamanho do arquivo
-            content_length = response.headers.get('Content-Length')
-            if content_length and int(content_length) > MAX_IMAGE_SIZE:
-                logger.warning(f"Imagem muito grande: {image_url}")
-                return False
+            if not tmp_path:
+                return None
             
-            # Lê conteúdo da imagem
-            image_data = response.content
-            if len(image_data) > MAX_IMAGE_SIZE:
-                logger.warning(f"Imagem muito grande: {image_url}")
-                return False
+            # Valida dimensões só pelo cabeçalho (Image.open não decodifica os pixels)
+            image_hash = None
+            with Image.open(tmp_path) as image:
+                width, height = image.size
+                if width * height > MAX_IMAGE_PIXELS:
+                    log_sampled("Imagem com dimensões excessivas", 'WARNING',
+                                f"Imagem com dimensões excessivas ({width}x{height}): {image_url}", url=image_url)
+                    return None
+                if self.hash_index is not None:
+                    image_hash = self._perceptual_hash(image, image_url)
             
-            # Verifica se é uma imagem válida
+            if image_hash is not None:
+                existing_key = self._near_duplicate(image_hash, image_url)
+                if existing_key:
+                    return existing_key
+            
+            # Valida e grava conforme o modo de saída configurado
             try:
-                image = Image.open(io.BytesIO(image_data))
-                image_format = image.format.lower() if image.format else 'jpeg'
-                
-                # Redimensiona se necessário
-                if RESIZE_IMAGES:
-                    image = self._resize_image_if_needed(image)
-                
-                # Garante que a pasta existe
-                save_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                # Salva imagem
-                # Converte para RGB se necessário (PNG com transparência)
-                if image_format == 'png' and image.mode in ('RGBA', 'LA', 'P'):
-                    rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-                    if image.mode == 'P':
-                        image = image.convert('RGBA')
-                    rgb_image.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                    image = rgb_image
-                
-                # Salva como JPEG
-                save_path = save_path.with_suffix('.jpg')
-                image.save(save_path, 'JPEG', quality=85, optimize=True)
-                
-                self.downloaded_count += 1
-                logger.debug(f"Imagem salva: {save_path}")
-                return True
-                
+                final_path = self.processor.process(tmp_path, save_path, consume_source=True)
             except Exception as e:
-                logger.error(f"Erro ao processar imagem {image_url}: {e}")
-                return False
-                
+                log_sampled("Erro ao processar imagem", 'ERROR',
+                            f"Erro ao processar imagem {image_url}: {e}", url=image_url)
+                return None
+            
+            # Publica a imagem e as miniaturas no destino (no disco já estão no lugar)
+            try:
+                stored_key = self.storage.store(self.processor.output_paths(final_path))
+            except Exception as e:
+                log_sampled("Erro ao enviar imagem", 'ERROR',
+                            f"Erro ao enviar imagem {image_url}: {e}", url=image_url)
+                with self._lock:
+                    self.failed_count += 1
+                return None
+            if image_hash is not None:
+                self.hash_index.add(image_hash, stored_key)
+            
+            with self._lock:
+                self.downloaded_count += 1
+            logger.debug(f"Imagem salva: {stored_key}")
+            return stored_key
+            
         except Exception as e:
-            logger.error(f"Erro ao baixar imagem {image_url}: {e}")
-            self.failed_count += 1
-            return False
+            log_sampled("Erro ao baixar imagem", 'ERROR', f"Erro ao baixar imagem {image_url}: {e}", url=image_url)
+            with self._lock:
+                self.failed_count += 1
+            return None
+        finally:
+            if tmp_path:
+                tmp_path.unlink(missing_ok=True)
     
-    def _resize_image_if_needed(self, image: Image.Image) -> Image.Image:
-        """Redimensiona imagem se exceder dimensões máximas"""
-        width, height = image.size
-        if width <= MAX_IMAGE_DIMENSION and height <= MAX_IMAGE_DIMENSION:
-            return image
-        
-        # Calcula novo tamanho mantendo proporção
-        if width > height:
-            new_width = MAX_IMAGE_DIMENSION
-            new_height = int(height * (MAX_IMAGE_DIMENSION / width))
-        else:
-            new_height = MAX_IMAGE_DIMENSION
-            new_width = int(width * (MAX_IMAGE_DIMENSION / height))
-        
-        return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    def _perceptual_hash(self, image: Image.Image, image_url: str) -> Optional[int]:
+        """dHash da imagem recém-baixada (None se não decodificar; o processamento relata o erro)"""
+        try:
+            return dhash(image)
+        except Exception as e:
+            logger.debug(f"Hash perceptual não calculado para {image_url}: {e}")
+            return None
+    
+    def _near_duplicate(self, image_hash: int, image_url: str) -> Optional[str]:
+        """
+        Procura uma imagem já salva quase idêntica
+        
+        Returns:
+            Chave da imagem existente, ou None se a imagem é nova
+        """
+        match = self.hash_index.find(image_hash)
+        if not match:
+            return None
+        existing_key, distance = match
+        if not self.storage.exists([existing_key]):
+            # Arquivo apagado desde a indexação: a imagem nova toma o lugar
+            self.hash_index.remove(existing_key)
+            return None
+        with self._lock:
+            self.near_duplicate_count += 1
+        logger.debug(f"Imagem quase idêntica a {existing_key} (distância {distance}): {image_url}")
+        return existing_key
+    
+    def _stream_to_temp(self, response, image_url: str, folder: Path) -> Optional[Path]:
+        """
+        Grava a resposta em um arquivo temporário, bloco a bloco
+        
+        Args:
+            response: Resposta HTTP aberta em modo stream
+            image_url: URL da imagem (para logs)
+            folder: Pasta do arquivo final (o temporário fica no mesmo disco para o rename atômico)
+            
+        Returns:
+            Caminho do arquivo temporário ou None se a resposta for rejeitada
+        """
+        fd, name = tempfile.mkstemp(prefix='.download_', suffix='.part', dir=folder)
+        tmp_path = Path(name)
+        total = 0
+        accepted = False
+        deadline = getattr(response, 'deadline', None)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # requests usa iter_content; httpx usa iter_bytes
+                iter_chunks = getattr(response, 'iter_content', None) or response.iter_bytes
+                for chunk in iter_chunks(chunk_size=IMAGE_CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    if deadline and time.monotonic() > deadline:
+                        log_sampled("Prazo esgotado no download", 'WARNING',
+                                    f"Prazo total esgotado durante o download: {image_url}", url=image_url)
+                        return None
+                    if total == 0 and not sniff_image_format(chunk[:16]):
+                        # Página de desafio servida no lugar da imagem (ex.: Cloudflare com status 200)
+                        block_reason = detect_block(chunk)
+                        if block_reason:
+                            report_block(response, image_url, block_reason)
+                            log_sampled("Acesso bloqueado", 'WARNING',
+                                        f"Acesso bloqueado ({block_reason}) para {image_url}",
+                                        url=image_url, motivo=block_reason)
+                            return None
+                        content_type = response.headers.get('Content-Type', '?')
+                        log_sampled("Conteúdo não é uma imagem", 'WARNING',
+                                    f"Conteúdo não é uma imagem ({content_type}): {image_url}", url=image_url)
+                        return None
+                    total += len(chunk)
+                    if total > MAX_IMAGE_SIZE:
+                        log_sampled("Imagem muito grande", 'WARNING',
+                                    f"Imagem muito grande: {image_url}", url=image_url)
+                        return None
+                    f.write(chunk)
+            if total == 0:
+                log_sampled("Imagem vazia", 'WARNING', f"Imagem vazia: {image_url}", url=image_url)
+                return None
+            accepted = True
+            return tmp_path
+        finally:
+            if not accepted:
+                tmp_path.unlink(missing_ok=True)
     
     def download_product_images(self, products: list, base_url: str = "") -> Dict[str, str]:
         """
@@ -117,75 +272,164 @@ class ImageDownloader:
         
         Args:
             products: Lista de dicionários com informações dos produtos
-            base_url: URL base para construir URLs absolutas
+            base_url: URL base para construir URLs absolutas (padrão: a do downloader)
             
         Returns:
             Dicionário mapeando product_id -> caminho da imagem salva
         """
-        self.base_url = base_url or self.base_url
+        # Não altera self.base_url: vários sites podem usar o mesmo downloader ao mesmo tempo
+        base_url = base_url or self.base_url
         downloaded_images = {}
+        reused = self.reused_count
+        near_duplicates = self.near_duplicate_count
         
-        logger.info(f"Iniciando download de {len(products)} imagens...")
+        logger.info(f"Iniciando download de {len(products)} imagens para {self.storage.describe()}...")
         
-        for product in tqdm(products, desc="Baixando imagens"):
-            try:
-                product_id = product.get('id', '')
-                category = product.get('categoria', 'Sem_Categoria')
-                image_url = product.get('imagem_url', '')
-                
-                if not image_url:
-                    logger.warning(f"Produto {product_id} sem URL de imagem")
-                    continue
-                
-                # Constrói URL absoluta se necessário
-                image_url = build_absolute_url(self.base_url, image_url)
-                
-                # Cria pasta da categoria
-                category_folder = create_category_folder(IMAGES_DIR, sanitize_category(category))
-                
-                # Gera nome do arquivo
-                product_name = clean_filename(product.get('nome', product_id))
-                if not product_name:
-                    product_name = f"produto_{product_id}"
-                
-                # Adiciona extensão se necessário
-                ext = get_file_extension(image_url)
-                if not ext or ext not in IMAGE_FORMATS:
-                    ext = '.jpg'
-                
-                filename = f"{product_name}{ext}"
-                save_path = category_folder / filename
-                
-                # Se já existe, adiciona sufixo
-                counter = 1
-                original_save_path = save_path
-                while save_path.exists():
-                    stem = original_save_path.stem
-                    save_path = category_folder / f"{stem}_{counter}{ext}"
-                    counter += 1
-                
-                # Faz download
-                if self.download_image(image_url, save_path):
-                    # Salva caminho relativo
-                    relative_path = save_path.relative_to(IMAGES_DIR)
-                    downloaded_images[product_id] = str(relative_path).replace('\\', '/')
-                
-                # Delay entre downloads
-                if DELAY_BETWEEN_REQUESTS > 0:
-                    time.sleep(DELAY_BETWEEN_REQUESTS)
-                    
-            except Exception as e:
-                logger.error(f"Erro ao processar produto {product.get('id', 'unknown')}: {e}")
-                continue
+        # Organização 'hash': imagens gravadas em coletas anteriores são verificadas
+        # de uma vez e não são baixadas de novo
+        image_urls = [build_absolute_url(base_url, product['imagem_url'])
+                      for product in products if product.get('imagem_url')]
+        existing = self.storage.stored_keys(image_urls)
+        if existing:
+            logger.info(f"{len(existing)} imagens já estão no destino")
+        
+        # URL canônica -> chave gravada nesta coleta (só downloads bem-sucedidos). Sempre
+        # no modo exato, em disco: o valor (a chave) precisa ser guardado
+        stored_images = Deduplicator(mode='exact')
+        try:
+            for url_key, key in existing.items():
+                stored_images.check(url_key, 'image', value=key)
+            self._download_all(products, downloaded_images, stored_images, base_url)
+        finally:
+            stored_images.close()
+            if self.hash_index is not None:
+                self.hash_index.save()
         
+        reused = self.reused_count - reused
+        if reused:
+            logger.info(f"{reused} imagens repetidas reaproveitadas sem novo download")
+        near_duplicates = self.near_duplicate_count - near_duplicates
+        if near_duplicates:
+            logger.info(f"{near_duplicates} imagens quase idênticas a outras já salvas não foram gravadas de novo")
+        if self.http2_client:
+            transport = self.http2_client.stats()
+            logger.info(f"Protocolos das imagens: {transport['versoes']}")
+            for connection in transport['conexoes']:
+                logger.debug(f"Conexão {connection['versao']} com {connection['host']}: "
+                             f"{connection['streams']} streams, até {connection['max_simultaneos']} simultâneos")
         logger.info(f"Download concluído: {self.downloaded_count} sucessos, {self.failed_count} falhas")
+        if self.skipped_count:
+            logger.warning(f"{self.skipped_count} imagens não baixadas (orçamento da execução esgotado)")
         return downloaded_images
     
+    def _download_all(self, products: list, downloaded_images: Dict[str, str], stored_images: Deduplicator,
+                      base_url: str):
+        """Baixa as imagens dos produtos em paralelo, pulando URLs de imagem já baixadas"""
+        budget = get_run_budget()
+        
+        def worker(product):
+            # Orçamento esgotado: os downloads ainda na fila são descartados
+            if budget.exhausted:
+                with self._lock:
+                    self.skipped_count += 1
+                return
+            try:
+                relative_path = self._product_image(product, stored_images, base_url)
+                if relative_path:
+                    downloaded_images[product.get('id', '')] = relative_path
+            except Exception as e:
+                log_sampled("Erro ao processar produto", 'ERROR',
+                            f"Erro ao processar produto {product.get('id', 'unknown')}: {e}", produto=product.get('id'))
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="images") as executor:
+            for _ in tqdm(executor.map(with_log_context(worker), products), total=len(products), desc="Baixando imagens"):
+                pass
+        
+        stats = self._flights.stats()
+        if stats['coalescidas']:
+            logger.info(f"{stats['coalescidas']} downloads de imagem compartilhados com outro em andamento")
+    
+    def _product_image(self, product: Dict, stored_images: Deduplicator, base_url: str = "") -> Optional[str]:
+        """
+        Obtém a imagem de um produto
+        
+        Produtos que pedem a mesma imagem ao mesmo tempo esperam um único
+        download; pedidos posteriores reaproveitam a chave gravada em
+        stored_images. Um download que falhou não é registrado, e o próximo
+        produto com a mesma URL tenta de novo.
+        
+        Returns:
+            Chave da imagem no destino (caminho relativo em IMAGES_DIR, no disco) ou None
+        """
+        product_id = product.get('id', '')
+        image_url = product.get('imagem_url', '')
+        
+        if not image_url:
+            log_sampled("Produto sem URL de imagem", 'WARNING',
+                        f"Produto {product_id} sem URL de imagem", produto=product_id)
+            return None
+        
+        # Constrói URL absoluta se necessário
+        image_url = build_absolute_url(base_url or self.base_url, image_url)
+        
+        relative_path, _ = self._flights.do(
+            canonical_url(image_url), lambda: self._fetch_product_image(product, image_url, stored_images)
+        )
+        return relative_path
+    
+    def _fetch_product_image(self, product: Dict, image_url: str, stored_images: Deduplicator) -> Optional[str]:
+        """Baixa a imagem para o destino configurado, se ainda não foi baixada"""
+        product_id = product.get('id', '')
+        category = product.get('categoria', 'Sem_Categoria')
+        
+        # Imagem já processada para outro produto: reaproveita o arquivo
+        url_key = canonical_url(image_url)
+        existing_key = stored_images.get(url_key, 'image')
+        if existing_key:
+            with self._lock:
+                self.reused_count += 1
+            return existing_key
+        
+        # Gera nome do arquivo
+        product_name = clean_filename(product.get('nome', product_id))
+        if not product_name:
+            product_name = f"produto_{product_id}"
+        
+        # Adiciona extensão se necessário
+        ext = get_file_extension(image_url)
+        if not ext or ext not in IMAGE_FORMATS:
+            ext = '.jpg'
+        
+        key = self.storage.reserve(image_url, category, product_name, ext)
+        try:
+            # Faz download
+            relative_path = self.download_image(image_url, key)
+        finally:
+            self.storage.release(key)
+        if not relative_path:
+            return None
+        
+        # Salva caminho relativo
+        stored_images.check(url_key, 'image', value=relative_path)
+        return relative_path
+    
     def get_stats(self) -> Dict[str, int]:
         """Retorna estatísticas de download"""
         return {
             'downloaded': self.downloaded_count,
             'failed': self.failed_count,
+            'skipped': self.skipped_count,
+            'near_duplicates': self.near_duplicate_count,
             'total': self.downloaded_count + self.failed_count
         }
+    
+    def get_transport_stats(self) -> Optional[Dict]:
+        """Versões HTTP negociadas e streams por conexão (None sem o cliente HTTP/2)"""
+        return self.http2_client.stats() if self.http2_client else None
+    
+    def close(self):
+        """Fecha as conexões do cliente HTTP/2 (se houver)"""
+        if self.http2_client:
+            self.http2_client.close()
+            self.http2_client = None
 
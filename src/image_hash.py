@@ -0,0 +1,160 @@
+"""
+Hash perceptual de imagens e índice para detectar quase-duplicatas
+
+A mesma foto de produto costuma aparecer em URLs diferentes (CDN, tamanho,
+recompressão), o que o Deduplicator, que compara URLs, não percebe. O dHash
+resume a imagem em 64 bits que mudam pouco com essas variações; duas imagens
+são quase-duplicatas quando a distância de Hamming entre os hashes é pequena.
+"""
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from loguru import logger
+
+from config import IMAGE_HASH_MAX_DISTANCE, IMAGE_HASH_INDEX_FILE
+
+HASH_SIZE = 8  # Grade 8x8 = hash de 64 bits
+
+# Bits ligados por byte, para NumPy sem np.bitwise_count (< 2.0)
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    Calcula o dHash (hash de diferença) de 64 bits
+
+    A imagem é reduzida a 9x8 em tons de cinza e cada bit indica se o pixel é
+    mais claro que o vizinho da direita. Em JPEG, draft() faz o decodificador
+    reduzir a escala durante a decodificação, sem gerar a imagem inteira.
+
+    Args:
+        image: Imagem aberta e ainda não carregada (draft só vale antes de load)
+
+    Returns:
+        Hash como inteiro sem sinal de 64 bits
+    """
+    image.draft('L', (HASH_SIZE * 4, HASH_SIZE * 4))
+    small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distances(hashes: np.ndarray, image_hash: int) -> np.ndarray:
+    """Distância de Hamming entre `image_hash` e cada hash do array (uint64)"""
+    diff = np.bitwise_xor(hashes, np.uint64(image_hash))
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(diff)
+    return _POPCOUNT_TABLE[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class PerceptualHashIndex:
+    """
+    Índice de hashes perceptuais com busca vetorizada
+
+    Os hashes ficam num array uint64 contíguo (8 bytes por imagem) e a busca
+    compara o hash com todos de uma vez (XOR + contagem de bits), o que leva
+    menos de 1 ms com centenas de milhares de imagens. O índice é gravado em
+    IMAGE_HASH_INDEX_FILE e reaproveitado entre execuções.
+    """
+
+    def __init__(self, max_distance: int = IMAGE_HASH_MAX_DISTANCE, index_file: Optional[Path] = IMAGE_HASH_INDEX_FILE,
+                 capacity: int = 1024):
+        """
+        Args:
+            max_distance: Bits diferentes aceitos para considerar duas imagens iguais
+            index_file: Arquivo .npz do índice (None = só em memória)
+            capacity: Capacidade inicial do array (dobra quando enche)
+        """
+        self.max_distance = max_distance
+        self.index_file = Path(index_file) if index_file else None
+        self._hashes = np.zeros(max(1, capacity), dtype=np.uint64)
+        self._paths = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def _load(self):
+        """Carrega o índice gravado por execuções anteriores"""
+        if not self.index_file or not self.index_file.exists():
+            return
+        try:
+            with np.load(self.index_file, allow_pickle=False) as data:
+                hashes, paths = data['hashes'], data['paths'].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Índice de hashes de imagem inválido, ignorando: {e}")
+            return
+        self._hashes = np.zeros(max(len(hashes) * 2, len(self._hashes)), dtype=np.uint64)
+        self._hashes[:len(hashes)] = hashes
+        self._paths = paths
+        logger.debug(f"Índice de hashes de imagem carregado: {len(paths)} imagens")
+
+    def save(self):
+        """Grava o índice no disco (escrita atômica); nada a fazer se não mudou"""
+        if not self.index_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            hashes = self._hashes[:len(self._paths)].copy()
+            paths = np.array(self._paths, dtype=str)
+            self._dirty = False
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_suffix('.tmp.npz')
+        np.savez(tmp_path, hashes=hashes, paths=paths)
+        tmp_path.replace(self.index_file)
+
+    def find(self, image_hash: int, max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """
+        Procura a imagem indexada mais parecida
+
+        Args:
+            image_hash: Hash da imagem nova
+            max_distance: Limite de bits diferentes (padrão: o do índice)
+
+        Returns:
+            (caminho, distância) da mais próxima dentro do limite, ou None
+        """
+        limit = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            count = len(self._paths)
+            if not count:
+                return None
+            distances = hamming_distances(self._hashes[:count], image_hash)
+            position = int(distances.argmin())
+            distance = int(distances[position])
+            if distance > limit:
+                return None
+            return self._paths[position], distance
+
+    def add(self, image_hash: int, path: str):
+        """Indexa uma imagem (chave no destino das imagens)"""
+        with self._lock:
+            count = len(self._paths)
+            if count == len(self._hashes):
+                grown = np.zeros(count * 2, dtype=np.uint64)
+                grown[:count] = self._hashes
+                self._hashes = grown
+            self._hashes[count] = np.uint64(image_hash)
+            self._paths.append(path)
+            self._dirty = True
+
+    def remove(self, path: str):
+        """Retira uma imagem do índice (ex.: arquivo apagado da pasta de imagens)"""
+        with self._lock:
+            try:
+                position = self._paths.index(path)
+            except ValueError:
+                return
+            last = len(self._paths) - 1
+            # O último ocupa a posição removida (ordem não importa)
+            self._hashes[position] = self._hashes[last]
+            self._paths[position] = self._paths[last]
+            self._paths.pop()
+            self._dirty = True
@@ -0,0 +1,203 @@
+"""
+Etapa de processamento de imagens: cópia direta, conversão de formato e miniaturas
+"""
+import io
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+from PIL import Image, features
+from loguru import logger
+
+from config import (
+    IMAGE_OUTPUT_MODE, IMAGE_ACCEPTED_FORMATS, IMAGE_QUALITY, IMAGE_JPEG_OPTIMIZE, IMAGE_WEBP_METHOD,
+    RESIZE_IMAGES, MAX_IMAGE_DIMENSION, THUMBNAIL_SIZES
+)
+
+# Formato do Pillow e extensão de arquivo de cada modo de saída
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+    'avif': ('AVIF', '.avif'),
+}
+
+# Extensão usada ao copiar o arquivo original sem reprocessar
+SOURCE_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'png': '.png',
+    'webp': '.webp',
+    'gif': '.gif',
+    'avif': '.avif',
+}
+
+ImageSource = Union[bytes, str, Path]
+
+
+class ImageProcessor:
+    """Classe para gravar imagens baixadas no formato configurado"""
+
+    def __init__(self, output_mode: str = IMAGE_OUTPUT_MODE,
+                 accepted_formats: Sequence[str] = IMAGE_ACCEPTED_FORMATS,
+                 quality: int = IMAGE_QUALITY, jpeg_optimize: bool = IMAGE_JPEG_OPTIMIZE,
+                 webp_method: int = IMAGE_WEBP_METHOD,
+                 resize: bool = RESIZE_IMAGES, max_dimension: int = MAX_IMAGE_DIMENSION,
+                 thumbnail_sizes: Sequence[int] = THUMBNAIL_SIZES):
+        """
+        Args:
+            output_mode: 'original' (copia os bytes), 'jpeg', 'webp' ou 'avif'
+            accepted_formats: Formatos de origem gravados sem reprocessar (ex.: ['jpeg', 'webp'])
+            quality: Qualidade de compressão para JPEG/WebP/AVIF
+            jpeg_optimize: Usa optimize=True no JPEG (arquivos ~5% menores, codificação bem mais lenta)
+            webp_method: Esforço do codificador WebP (0 = mais rápido, 6 = menor arquivo)
+            resize: Redimensiona imagens maiores que max_dimension
+            max_dimension: Dimensão máxima (largura ou altura)
+            thumbnail_sizes: Lados máximos das miniaturas geradas (ex.: [150, 300])
+        """
+        output_mode = output_mode.lower()
+        if output_mode == 'avif' and not features.check('avif'):
+            logger.warning("Pillow sem suporte a AVIF. Usando WebP como formato de saída.")
+            output_mode = 'webp'
+        if output_mode != 'original' and output_mode not in OUTPUT_FORMATS:
+            raise ValueError(f"Modo de saída inválido: {output_mode}. Use 'original', 'jpeg', 'webp' ou 'avif'")
+        self.output_mode = output_mode
+        self.accepted_formats = {fmt.lower() for fmt in accepted_formats}
+        self.quality = quality
+        self.jpeg_optimize = jpeg_optimize
+        self.webp_method = webp_method
+        self.resize = resize
+        self.max_dimension = max_dimension
+        self.thumbnail_sizes = sorted({int(size) for size in thumbnail_sizes}, reverse=True)
+
+    def _open(self, source: ImageSource) -> Image.Image:
+        """Abre a imagem de forma preguiçosa (só o cabeçalho é lido)"""
+        if isinstance(source, bytes):
+            return Image.open(io.BytesIO(source))
+        return Image.open(source)
+
+    def _needs_resize(self, image: Image.Image) -> bool:
+        return self.resize and max(image.size) > self.max_dimension
+
+    def _can_copy(self, image_format: str, image: Image.Image) -> bool:
+        """Indica se os bytes originais podem ser gravados sem decodificar"""
+        if self._needs_resize(image):
+            return False
+        if self.output_mode == 'original':
+            return True
+        target_format = OUTPUT_FORMATS[self.output_mode][0].lower()
+        return image_format == target_format or image_format in self.accepted_formats
+
+    def process(self, source: ImageSource, save_path: Path, consume_source: bool = False) -> Optional[Path]:
+        """
+        Grava uma imagem no formato configurado, com miniaturas opcionais
+
+        A imagem é decodificada no máximo uma vez. Quando o formato de origem é
+        aceito e não há redimensionamento, os bytes originais são copiados.
+        Todos os arquivos são gravados de forma atômica (temporário + rename).
+
+        Args:
+            source: Bytes da imagem ou caminho de um arquivo temporário
+            save_path: Caminho desejado (a extensão é ajustada ao formato final)
+            consume_source: Se source for um arquivo, pode movê-lo em vez de copiar
+
+        Returns:
+            Caminho final do arquivo salvo ou None em caso de falha
+        """
+        image = self._open(source)
+        image_format = (image.format or 'jpeg').lower()
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if self._can_copy(image_format, image):
+            final_path = save_path.with_suffix(SOURCE_EXTENSIONS.get(image_format, save_path.suffix))
+            if self.thumbnail_sizes:
+                self._save_thumbnails(image, final_path, largest=self.thumbnail_sizes[0])
+            image.close()
+            self._copy_source(source, final_path, consume_source)
+            return final_path
+
+        # Reduz a decodificação JPEG (escala DCT) ao maior tamanho realmente necessário
+        target = self.max_dimension if self._needs_resize(image) else max(image.size)
+        image.draft('RGB', (target, target))
+        image.load()
+        if max(image.size) > target:
+            image.thumbnail((target, target), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        pil_format, ext = OUTPUT_FORMATS[self.output_mode if self.output_mode != 'original' else 'jpeg']
+        final_path = save_path.with_suffix(ext)
+        self._encode(image, final_path, pil_format)
+        if self.thumbnail_sizes:
+            self._save_thumbnails(image, final_path)
+        return final_path
+
+    def _copy_source(self, source: ImageSource, final_path: Path, consume_source: bool = False):
+        """Grava os bytes originais sem reprocessar"""
+        if consume_source and not isinstance(source, bytes):
+            os.replace(source, final_path)
+            return
+        part_path = final_path.with_name(final_path.name + '.part')
+        if isinstance(source, bytes):
+            with open(part_path, 'wb') as f:
+                f.write(source)
+        else:
+            shutil.copyfile(source, part_path)
+        os.replace(part_path, final_path)
+
+    def _prepare_mode(self, image: Image.Image, pil_format: str) -> Image.Image:
+        """Converte o modo de cor para o formato de saída (JPEG não tem transparência)"""
+        if pil_format == 'JPEG':
+            if image.mode in ('RGBA', 'LA', 'P'):
+                if image.mode != 'RGBA':
+                    image = image.convert('RGBA')
+                rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+                rgb_image.paste(image, mask=image.split()[-1])
+                return rgb_image
+            if image.mode != 'RGB':
+                return image.convert('RGB')
+            return image
+        if image.mode not in ('RGB', 'RGBA'):
+            return image.convert('RGBA' if 'A' in image.mode or image.mode == 'P' else 'RGB')
+        return image
+
+    def _encode(self, image: Image.Image, path: Path, pil_format: str):
+        """Codifica a imagem no formato de saída"""
+        image = self._prepare_mode(image, pil_format)
+        options = {'quality': self.quality}
+        if pil_format == 'JPEG':
+            options['optimize'] = self.jpeg_optimize
+        elif pil_format == 'WEBP':
+            options['method'] = self.webp_method
+        part_path = path.with_name(path.name + '.part')
+        image.save(part_path, pil_format, **options)
+        os.replace(part_path, path)
+
+    def thumbnail_path(self, final_path: Path, size: int) -> Path:
+        """Caminho da miniatura de um tamanho, ao lado da imagem"""
+        ext = OUTPUT_FORMATS['jpeg' if self.output_mode == 'original' else self.output_mode][1]
+        return final_path.with_name(f"{final_path.stem}_{size}{ext}")
+
+    def output_paths(self, final_path: Path) -> List[Path]:
+        """Todos os arquivos gravados por process(): a imagem e suas miniaturas"""
+        return [final_path] + [self.thumbnail_path(final_path, size) for size in self.thumbnail_sizes]
+
+    def _save_thumbnails(self, image: Image.Image, final_path: Path, largest: Optional[int] = None) -> List[Path]:
+        """
+        Gera todas as miniaturas a partir de uma única decodificação
+
+        Cada miniatura é reduzida a partir da anterior (maior), evitando
+        reamostrar a imagem inteira para cada tamanho.
+        """
+        if largest:
+            image.draft('RGB', (largest, largest))
+        image.load()
+
+        pil_format = OUTPUT_FORMATS['jpeg' if self.output_mode == 'original' else self.output_mode][0]
+        paths = []
+        current = image
+        for size in self.thumbnail_sizes:
+            if max(current.size) > size:
+                current = current.copy()
+                current.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            thumb_path = self.thumbnail_path(final_path, size)
+            self._encode(current, thumb_path, pil_format)
+            paths.append(thumb_path)
+        return paths
+
@@ -0,0 +1,355 @@
+"""
+Destinos das imagens: disco local ou bucket compatível com S3
+
+As imagens são identificadas por uma chave relativa ("Categoria/nome.jpg" ou
+"ab/cd/<hash>.jpg"), a mesma gravada na planilha. O processamento sempre
+grava num arquivo local (staging_path); store() publica os arquivos no destino.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+from loguru import logger
+
+from config import (
+    IMAGES_DIR, IMAGE_STORAGE, IMAGE_STORAGE_LAYOUT, IMAGE_STORAGE_LIST_WORKERS, IMAGE_S3_BUCKET, IMAGE_S3_PREFIX,
+    IMAGE_S3_ENDPOINT_URL, IMAGE_S3_REGION, IMAGE_S3_MULTIPART_MB, IMAGE_S3_MAX_CONCURRENCY
+)
+from src.dedup import canonical_url, hash_key
+from src.utils import sanitize_category
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+except ImportError:  # S3 é opcional; sem boto3 as imagens ficam em disco
+    boto3 = None
+
+LAYOUTS = ('categoria', 'hash')
+
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.avif': 'image/avif',
+}
+
+
+def s3_available() -> bool:
+    """Indica se o boto3 está instalado"""
+    return boto3 is not None
+
+
+class ImageStorage(ABC):
+    """
+    Base dos destinos: geração de chaves, reserva de nomes e existência
+
+    O conteúdo de cada pasta é listado uma única vez e mantido em memória;
+    reservas de nome e verificações de existência não tocam o destino depois
+    disso (nem o disco nem o S3). Na organização 'hash', uma listagem do
+    prefixo ab/ preenche de uma vez as 256 pastas ab/cd: no máximo 256
+    listagens por execução, qualquer que seja o número de imagens.
+    Compartilhado entre threads.
+    """
+
+    def __init__(self, staging_root: Path, layout: str = IMAGE_STORAGE_LAYOUT):
+        """
+        Args:
+            staging_root: Pasta local onde o processamento grava os arquivos
+            layout: 'categoria' (<categoria>/<nome>) ou 'hash' (ab/cd/<hash da URL>)
+        """
+        layout = layout.lower()
+        if layout not in LAYOUTS:
+            raise ValueError(f"Organização de imagens inválida: {layout}. Use 'categoria' ou 'hash'")
+        self.layout = layout
+        self.staging_root = Path(staging_root)
+        self._lock = threading.Lock()
+        self._folders: Dict[str, Set[str]] = {}
+        self._reserved: Set[str] = set()
+        self._dirs: Set[Path] = set()
+
+    @abstractmethod
+    def _list_folder(self, folder: str) -> Set[str]:
+        """Nomes de arquivo já existentes numa pasta do destino"""
+
+    @abstractmethod
+    def _list_tree(self, folder: str) -> Dict[str, Set[str]]:
+        """Nomes de arquivo de todas as subpastas de uma pasta do destino (pasta -> nomes)"""
+
+    def _group(self, folder: str) -> str:
+        """Unidade de listagem da pasta: ela mesma ou, na organização 'hash', o prefixo ab"""
+        return folder.partition('/')[0] if self.layout == 'hash' else folder
+
+    def _list_group(self, group: str) -> Dict[str, Set[str]]:
+        """Lista uma unidade de listagem (pasta -> nomes, inclusive as pastas vazias)"""
+        if self.layout != 'hash':
+            return {group: self._list_folder(group)}
+        listed = {f"{group}/{index:02x}": set() for index in range(256)}
+        listed.update(self._list_tree(group))
+        return listed
+
+    @abstractmethod
+    def _put(self, path: Path, key: str):
+        """Publica um arquivo local sob a chave"""
+
+    def _names(self, folder: str) -> Set[str]:
+        """Nomes da pasta, listados na primeira consulta (chamar com o lock)"""
+        names = self._folders.get(folder)
+        if names is None:
+            for listed_folder, listed_names in self._list_group(self._group(folder)).items():
+                self._folders.setdefault(listed_folder, listed_names)
+            names = self._folders.setdefault(folder, set())
+        return names
+
+    def reserve(self, image_url: str, category: str, name: str, ext: str) -> str:
+        """
+        Escolhe a chave de uma imagem nova, sem colidir com arquivos existentes
+        nem com downloads em andamento
+
+        Args:
+            image_url: URL da imagem (base do nome na organização 'hash')
+            category: Categoria do produto
+            name: Nome de arquivo desejado, sem extensão
+            ext: Extensão (pode mudar conforme o formato final)
+
+        Returns:
+            Chave reservada; libere com release() ao terminar
+        """
+        if self.layout == 'hash':
+            return self._hash_stem(image_url) + ext
+
+        folder = sanitize_category(category)
+        with self._lock:
+            names = self._names(folder)
+            key = f"{folder}/{name}{ext}"
+            counter = 1
+            # Se já existe, adiciona sufixo
+            while key.rpartition('/')[2] in names or key in self._reserved:
+                key = f"{folder}/{name}_{counter}{ext}"
+                counter += 1
+            self._reserved.add(key)
+            return key
+
+    @staticmethod
+    def _hash_stem(image_url: str) -> str:
+        """Chave sem extensão na organização 'hash' (ab/cd/<hash da URL>)"""
+        digest = hash_key(canonical_url(image_url), 'image').hex()[:20]
+        return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def release(self, key: str):
+        """Libera a reserva de uma chave (o arquivo gravado continua registrado)"""
+        with self._lock:
+            self._reserved.discard(key)
+
+    def staging_path(self, key: str) -> Path:
+        """Arquivo local onde a imagem da chave deve ser gravada (pasta já criada)"""
+        path = self.staging_root / key
+        folder = path.parent
+        if folder not in self._dirs:
+            folder.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._dirs.add(folder)
+        return path
+
+    def key_of(self, path: Path) -> str:
+        """Chave de um arquivo em staging_root"""
+        return path.relative_to(self.staging_root).as_posix()
+
+    def store(self, paths: List[Path]) -> str:
+        """
+        Publica os arquivos processados (imagem e miniaturas)
+
+        Args:
+            paths: Arquivos em staging_root; o primeiro é a imagem principal
+
+        Returns:
+            Chave da imagem principal
+        """
+        keys = [self.key_of(path) for path in paths]
+        for path, key in zip(paths, keys):
+            self._put(path, key)
+        with self._lock:
+            for key in keys:
+                folder, _, filename = key.rpartition('/')
+                self._names(folder).add(filename)
+        return self.key_of(paths[0])
+
+    def exists(self, keys: Iterable[str]) -> Set[str]:
+        """
+        Verifica a existência de várias chaves de uma vez
+
+        Cada pasta é listada no máximo uma vez (uma listagem em vez de uma
+        consulta por arquivo; na organização 'hash', uma por prefixo ab); as
+        pastas ainda não listadas são listadas em paralelo, fora do lock.
+
+        Returns:
+            As chaves que existem no destino
+        """
+        keys = list(keys)
+        with self._lock:
+            missing = {key.rpartition('/')[0] for key in keys} - self._folders.keys()
+            groups = {self._group(folder) for folder in missing}
+        if len(groups) > 1:
+            with ThreadPoolExecutor(max_workers=max(1, IMAGE_STORAGE_LIST_WORKERS)) as executor:
+                listings = list(executor.map(self._list_group, groups))
+            with self._lock:
+                for listed in listings:
+                    for folder, names in listed.items():
+                        # Uma gravação feita durante a listagem já registrou a pasta
+                        self._folders.setdefault(folder, names)
+        found = set()
+        with self._lock:
+            for key in keys:
+                folder, _, filename = key.rpartition('/')
+                if filename in self._names(folder):
+                    found.add(key)
+        return found
+
+    def stored_keys(self, image_urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Chaves já gravadas no destino para as URLs de imagem, numa única
+        verificação em lote
+
+        Só na organização 'hash', em que a chave depende apenas da URL; como a
+        extensão segue o formato final, todas as extensões são verificadas.
+
+        Returns:
+            URL canônica -> chave existente
+        """
+        if self.layout != 'hash':
+            return {}
+        candidates = {}
+        for image_url in image_urls:
+            stem = self._hash_stem(image_url)
+            for ext in CONTENT_TYPES:
+                candidates[stem + ext] = canonical_url(image_url)
+        return {candidates[key]: key for key in self.exists(candidates)}
+
+    @abstractmethod
+    def describe(self) -> str:
+        """Descrição do destino para os logs"""
+
+
+class LocalImageStorage(ImageStorage):
+    """Imagens em disco, em IMAGES_DIR; os arquivos são gravados direto no lugar final"""
+
+    def __init__(self, root: Path = IMAGES_DIR, layout: str = IMAGE_STORAGE_LAYOUT):
+        super().__init__(root, layout)
+
+    def _list_folder(self, folder: str) -> Set[str]:
+        try:
+            with os.scandir(self.staging_root / folder) as entries:
+                return {entry.name for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            return set()
+
+    def _list_tree(self, folder: str) -> Dict[str, Set[str]]:
+        listed = {}
+        for root, _, files in os.walk(self.staging_root / folder):
+            if files:
+                listed[Path(root).relative_to(self.staging_root).as_posix()] = set(files)
+        return listed
+
+    def _put(self, path: Path, key: str):
+        # O processamento já gravou no lugar final (temporário + rename atômico)
+        pass
+
+    def describe(self) -> str:
+        return f"disco ({self.staging_root}, organização '{self.layout}')"
+
+
+class S3ImageStorage(ImageStorage):
+    """
+    Imagens num bucket compatível com S3 (AWS, MinIO, moto_server)
+
+    O processamento grava numa pasta temporária local; store() envia os
+    arquivos e os apaga. Arquivos acima de IMAGE_S3_MULTIPART_MB vão em partes
+    enviadas em paralelo (TransferConfig do boto3); arquivos diferentes são
+    enviados ao mesmo tempo pelas threads de download. A existência é
+    verificada com uma listagem (ListObjectsV2) por pasta ou, na organização
+    'hash', por prefixo ab/.
+    """
+
+    def __init__(self, bucket: str = IMAGE_S3_BUCKET, prefix: str = IMAGE_S3_PREFIX,
+                 endpoint_url: str = IMAGE_S3_ENDPOINT_URL, region: str = IMAGE_S3_REGION,
+                 layout: str = IMAGE_STORAGE_LAYOUT, multipart_mb: int = IMAGE_S3_MULTIPART_MB,
+                 max_concurrency: int = IMAGE_S3_MAX_CONCURRENCY):
+        """
+        Args:
+            bucket: Nome do bucket (já existente)
+            prefix: Prefixo das chaves no bucket
+            endpoint_url: Endpoint alternativo (MinIO, servidor local de testes)
+            region: Região do bucket
+            layout: 'categoria' ou 'hash'
+            multipart_mb: Tamanho a partir do qual o envio é feito em partes (e tamanho das partes)
+            max_concurrency: Partes enviadas ao mesmo tempo por arquivo
+
+        Raises:
+            ValueError: Se o bucket não for informado
+        """
+        if not bucket:
+            raise ValueError("IMAGE_S3_BUCKET não configurado")
+        staging = Path(tempfile.mkdtemp(prefix='imagens_s3_'))
+        super().__init__(staging, layout)
+        weakref.finalize(self, shutil.rmtree, staging, ignore_errors=True)
+        self.bucket = bucket
+        self.prefix = prefix
+        # Clientes do boto3 podem ser usados por várias threads
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        part_size = max(5, multipart_mb) * 1024 * 1024  # S3 exige partes de pelo menos 5 MB
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size, multipart_chunksize=part_size, max_concurrency=max(1, max_concurrency)
+        )
+
+    def _list_folder(self, folder: str) -> Set[str]:
+        folder_prefix = f"{self.prefix}{folder}/"
+        names = set()
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=folder_prefix, Delimiter='/'):
+            for item in page.get('Contents', []):
+                names.add(item['Key'][len(folder_prefix):])
+        return names
+
+    def _list_tree(self, folder: str) -> Dict[str, Set[str]]:
+        listed = {}
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}{folder}/"):
+            for item in page.get('Contents', []):
+                subfolder, _, name = item['Key'][len(self.prefix):].rpartition('/')
+                listed.setdefault(subfolder, set()).add(name)
+        return listed
+
+    def _put(self, path: Path, key: str):
+        content_type = CONTENT_TYPES.get(path.suffix.lower(), 'application/octet-stream')
+        try:
+            self.client.upload_file(str(path), self.bucket, self.prefix + key,
+                                    ExtraArgs={'ContentType': content_type}, Config=self.transfer_config)
+        finally:
+            path.unlink(missing_ok=True)
+
+    def describe(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix} (organização '{self.layout}')"
+
+
+def create_image_storage(backend: str = IMAGE_STORAGE, layout: str = IMAGE_STORAGE_LAYOUT) -> ImageStorage:
+    """
+    Cria o destino configurado em IMAGE_STORAGE
+
+    Raises:
+        ValueError: Se o destino for desconhecido
+    """
+    backend = backend.lower()
+    if backend == 's3':
+        if not s3_available():
+            logger.warning("boto3 não instalado. Imagens gravadas em disco (IMAGES_DIR).")
+            return LocalImageStorage(layout=layout)
+        return S3ImageStorage(layout=layout)
+    if backend != 'local':
+        raise ValueError(f"Destino de imagens inválido: {backend}. Use 'local' ou 's3'")
+    return LocalImageStorage(layout=layout)
@@ -0,0 +1,218 @@
+"""
+Logging fora do caminho quente: registros JSON gravados numa thread própria,
+amostragem de mensagens repetitivas (por produto, imagem ou tentativa) e
+contexto de log (run_id, site) nas threads de trabalho
+"""
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+from loguru import logger
+
+from config import LOG_SAMPLE_FIRST, LOG_SAMPLE_INTERVAL, LOG_JSON_MAX_MB
+
+# Coleta (run_id) da thread atual: separa os contadores de amostragem de sites
+# coletados ao mesmo tempo
+_run_scope: contextvars.ContextVar = contextvars.ContextVar('log_run_scope', default='')
+
+
+class JsonLogSink:
+    """
+    Destino do loguru que grava um registro JSON por linha numa thread própria
+
+    A thread que registra só enfileira o registro; a montagem do JSON e a
+    escrita no disco ficam com a thread do destino, que grava em blocos. O
+    arquivo é renomeado para <nome>.1 ao passar de max_mb.
+
+    Uso: logger.add(JsonLogSink("scraping.jsonl"), format="{message}")
+    """
+
+    def __init__(self, path, max_mb: float = LOG_JSON_MAX_MB):
+        """
+        Args:
+            path: Arquivo de destino (JSON Lines)
+            max_mb: Tamanho máximo antes da rotação (0 = sem rotação)
+        """
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._pid = os.getpid()
+        self._queue: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._writer, name="log-json", daemon=True)
+        self._thread.start()
+
+    def write(self, message):
+        record = message.record
+        item = (
+            record['time'], record['level'].name, record['message'], record['name'], record['function'],
+            record['line'], record['thread'].name, record['extra'], record['exception'],
+        )
+        if os.getpid() != self._pid:
+            # Processo filho (pool de parse): a thread de escrita ficou no processo principal
+            self._write_lines([self._to_json(item)])
+            return
+        self._queue.put(item)
+
+    def stop(self):
+        """Grava o que falta na fila (chamado pelo loguru em logger.remove)"""
+        if os.getpid() == self._pid and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    @staticmethod
+    def _to_json(item) -> str:
+        timestamp, level, text, name, function, line, thread, extra, exception = item
+        entry = {
+            'time': timestamp.isoformat(), 'level': level, 'message': text,
+            'module': name, 'function': function, 'line': line, 'thread': thread,
+        }
+        entry.update(extra)
+        if exception:
+            entry['exception'] = f"{exception.type.__name__}: {exception.value}"
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+    def _writer(self):
+        while True:
+            items = [self._queue.get()]
+            # Esvazia a fila e grava tudo de uma vez
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = items[-1] is None
+            lines = [self._to_json(item) for item in items if item is not None]
+            if lines:
+                try:
+                    self._write_lines(lines)
+                except OSError as e:
+                    print(f"Erro ao gravar log JSON em {self.path}: {e}", file=sys.stderr)
+            if stop:
+                return
+
+    def _write_lines(self, lines):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+            size = f.tell()
+        if self.max_bytes and size > self.max_bytes and os.getpid() == self._pid:
+            os.replace(self.path, self.path.with_name(self.path.name + '.1'))
+
+
+class LogSampler:
+    """
+    Registra só as primeiras ocorrências de cada tipo de mensagem
+
+    Em tempestades de bloqueio ou catálogos grandes, a mesma mensagem se
+    repete milhares de vezes. Depois das primeiras `first` ocorrências de
+    um tipo, as demais são apenas contadas; o total omitido é registrado a
+    cada `interval` segundos e em flush() (fim de cada etapa). Os contadores
+    são separados por coleta (run_id de log_context), para que sites
+    coletados em paralelo não zerem os contadores uns dos outros.
+    """
+
+    def __init__(self, first: int = LOG_SAMPLE_FIRST, interval: float = LOG_SAMPLE_INTERVAL):
+        """
+        Args:
+            first: Ocorrências de cada tipo registradas por completo
+            interval: Segundos entre os registros do contador de omitidas
+        """
+        self.first = first
+        self.interval = interval
+        self._counts: Dict[Tuple[str, str], list] = {}  # (coleta, tipo) -> [total, omitidas, último registro]
+        self._lock = threading.Lock()
+
+    def log(self, key: str, level: str, message: str, _depth: int = 1, **context) -> bool:
+        """
+        Registra uma ocorrência do tipo `key`
+
+        Args:
+            key: Tipo da mensagem (ex.: "Produto sem URL de imagem")
+            level: Nível do loguru ('WARNING', 'ERROR', ...)
+            message: Texto completo desta ocorrência
+            **context: Campos estruturados (url, produto, ...) gravados no registro JSON
+
+        Returns:
+            True se a mensagem foi registrada (False se só foi contada)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counts.setdefault((_run_scope.get(), key), [0, 0, now])
+            entry[0] += 1
+            total = entry[0]
+            if total <= self.first:
+                entry[2] = now
+                emit, omitted = True, 0
+            else:
+                entry[1] += 1
+                emit, omitted = False, 0
+                if now - entry[2] >= self.interval:
+                    omitted, entry[1], entry[2] = entry[1], 0, now
+        if not emit and not omitted:
+            return False
+        # depth: o registro aponta para quem chamou, não para este módulo
+        bound = logger.opt(depth=_depth).bind(evento=key, **context)
+        if emit:
+            bound.log(level, message)
+        else:
+            bound.log(level, f"{key}: mais {omitted} ocorrência(s) nos últimos {self.interval:.0f}s "
+                             f"(total {total})")
+        return emit
+
+    def flush(self) -> Dict[str, int]:
+        """
+        Registra as ocorrências ainda não informadas e zera os contadores da
+        coleta atual (as demais coletas em andamento não são afetadas)
+
+        Returns:
+            Total de ocorrências de cada tipo desde o último flush
+        """
+        scope = _run_scope.get()
+        with self._lock:
+            counts = {key: self._counts.pop((run, key)) for run, key in list(self._counts) if run == scope}
+        for key, (total, omitted, _) in counts.items():
+            if omitted:
+                logger.bind(evento=key).warning(f"{key}: mais {omitted} ocorrência(s) omitida(s) (total {total})")
+        return {key: total for key, (total, _, _) in counts.items()}
+
+
+_sampler = LogSampler()
+
+
+def log_sampled(key: str, level: str, message: str, **context) -> bool:
+    """Registra uma mensagem repetitiva pelo amostrador global (ver LogSampler.log)"""
+    return _sampler.log(key, level, message, _depth=2, **context)
+
+
+def flush_sampled() -> Dict[str, int]:
+    """Emite os contadores da coleta atual no amostrador global e retorna os totais por tipo"""
+    return _sampler.flush()
+
+
+@contextmanager
+def log_context(run_id: str, site: str):
+    """
+    Contexto de log de uma coleta: os registros levam run_id e site, e as
+    mensagens amostradas são contadas à parte das outras coletas
+    """
+    token = _run_scope.set(run_id)
+    try:
+        with logger.contextualize(run_id=run_id, site=site):
+            yield
+    finally:
+        _run_scope.reset(token)
+
+
+def with_log_context(function: Callable) -> Callable:
+    """
+    Envolve a função para rodar com o contexto de log de quem a criou
+
+    Threads de pools não herdam o log_context() da thread da coleta; com isso
+    os registros dos workers também levam run_id e site.
+    """
+    context = contextvars.copy_context()
+    return lambda *args: context.copy().run(function, *args)
@@ -0,0 +1,249 @@
+"""
+Captura das respostas JSON (XHR/fetch) da própria página via CDP e reuso
+direto desses endpoints pelo cliente HTTP
+"""
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+from loguru import logger
+
+from config import HEADERS, CAPTURE_URL_PATTERNS, CAPTURE_PAGE_PARAMS, CAPTURE_REQUESTS_PER_SECOND, SELECTORS
+
+# Fração mínima dos produtos do endpoint que precisam estar na grade da página
+# (descarta XHRs de "relacionados"/"novidades" que também trazem produtos)
+MIN_GRID_OVERLAP = 0.5
+from src.dedup import canonical_url
+from src.utils import fetch, HostRateLimiter
+from src.scraper import extract_products_from_html
+
+
+def find_product_items(data) -> Optional[List[Dict]]:
+    """
+    Procura uma lista de produtos no formato da Store API dentro do JSON
+
+    Returns:
+        Lista de itens com nome e preço/link, ou None se não houver
+    """
+    if isinstance(data, list):
+        if data and all(isinstance(item, dict) for item in data) \
+                and 'name' in data[0] and ('prices' in data[0] or 'permalink' in data[0]):
+            return data
+        return None
+    if isinstance(data, dict):
+        for value in data.values():
+            items = find_product_items(value)
+            if items is not None:
+                return items
+    return None
+
+
+def find_html_fragments(data) -> List[str]:
+    """Fragmentos HTML dentro do JSON (ex.: admin-ajax que devolve a grade já renderizada)"""
+    if isinstance(data, str):
+        return [data] if '<' in data and '>' in data else []
+    if isinstance(data, list):
+        values = data
+    elif isinstance(data, dict):
+        values = data.values()
+    else:
+        return []
+    fragments = []
+    for value in values:
+        fragments.extend(find_html_fragments(value))
+    return fragments
+
+
+class NetworkCapture:
+    """
+    Registra as respostas JSON carregadas pela página (somente Chrome)
+
+    Durante driver.get o Chrome registra os eventos de rede no log
+    'performance'; as respostas JSON cujas URLs casam com CAPTURE_URL_PATTERNS
+    são guardadas. Se uma delas contém produtos, as páginas seguintes da
+    categoria são pedidas direto ao endpoint pelo cliente HTTP, alterando o
+    parâmetro de paginação, sem renderizar nada.
+    """
+
+    def __init__(self, base_url: str, url_patterns: List[str] = None, page_params: List[str] = None,
+                 rate_limiter: Optional[HostRateLimiter] = None, woocommerce_source=None,
+                 selectors: Dict = None):
+        """
+        Args:
+            base_url: URL base do site
+            url_patterns: Regex das URLs de interesse (padrão: CAPTURE_URL_PATTERNS)
+            page_params: Nomes de parâmetros de paginação (padrão: CAPTURE_PAGE_PARAMS)
+            rate_limiter: Limitador de taxa por host compartilhado
+            woocommerce_source: Fonte usada para converter itens no formato da Store API
+            selectors: Seletores CSS dos fragmentos HTML (padrão: SELECTORS do config.py)
+        """
+        self.base_url = base_url
+        self.selectors = selectors or SELECTORS
+        self.url_patterns = [re.compile(p) for p in (url_patterns or CAPTURE_URL_PATTERNS)]
+        self.page_params = page_params or CAPTURE_PAGE_PARAMS
+        self.rate_limiter = rate_limiter or HostRateLimiter(CAPTURE_REQUESTS_PER_SECOND)
+        if woocommerce_source is None:
+            from src.woocommerce_api import WooCommerceSource
+            woocommerce_source = WooCommerceSource(base_url)
+        self.woocommerce_source = woocommerce_source
+
+    def flush(self, driver):
+        """Descarta eventos de rede anteriores (chamar antes de abrir a página)"""
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.get_log('performance')
+        except Exception as e:
+            logger.debug(f"Log de rede indisponível: {e}")
+
+    def collect(self, driver) -> List[Dict]:
+        """
+        Lê as respostas JSON registradas desde o último flush
+
+        Só requisições GET são guardadas: são as únicas que podem ser repetidas
+        alterando apenas a URL.
+
+        Returns:
+            Lista de {'url', 'data'} na ordem em que chegaram
+        """
+        try:
+            entries = driver.get_log('performance')
+        except Exception as e:
+            logger.debug(f"Log de rede indisponível: {e}")
+            return []
+
+        captured = []
+        seen = set()
+        methods = {}
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            params = message.get('params', {})
+            if message.get('method') == 'Network.requestWillBeSent':
+                methods[params.get('requestId')] = params.get('request', {}).get('method')
+                continue
+            if message.get('method') != 'Network.responseReceived':
+                continue
+            response = params.get('response', {})
+            url = response.get('url', '')
+            if params.get('type') not in ('XHR', 'Fetch') or url in seen:
+                continue
+            if methods.get(params.get('requestId')) != 'GET':
+                continue
+            if 'json' not in response.get('mimeType', '') or not any(p.search(url) for p in self.url_patterns):
+                continue
+            seen.add(url)
+            try:
+                body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+                captured.append({'url': url, 'data': json.loads(body.get('body', ''))})
+            except Exception as e:
+                logger.debug(f"Corpo da resposta indisponível para {url}: {e}")
+        if captured:
+            logger.info(f"{len(captured)} resposta(s) JSON capturada(s): {', '.join(c['url'] for c in captured)}")
+        return captured
+
+    def extract_products(self, data) -> List[Dict]:
+        """Converte uma resposta JSON capturada nos dicionários de produto"""
+        items = find_product_items(data)
+        if items is not None:
+            products = [self.woocommerce_source.map_product(item) for item in items]
+            return [p for p in products if p.get('nome')]
+        products = []
+        if not self.selectors.get('product_container', ''):
+            return products
+        for fragment in find_html_fragments(data):
+            products.extend(extract_products_from_html(fragment, self.base_url, self.selectors)[0])
+        return products
+
+    def _page_url(self, url: str) -> Optional[Tuple[str, int]]:
+        """Identifica o parâmetro de paginação da URL: (nome, página atual)"""
+        query = dict(parse_qsl(urlparse(url).query))
+        for name in self.page_params:
+            if name in query and query[name].isdigit():
+                return name, int(query[name])
+        return None
+
+    def replay_category(self, driver, captured: List[Dict], max_pages: int,
+                        page_products: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Busca as próximas páginas direto no endpoint capturado que contém produtos
+
+        Só é usado um endpoint cujos produtos estão na grade da primeira página
+        (pelos links). Usa os cookies e o User-Agent do navegador, para que as
+        requisições diretas tenham a mesma sessão da página renderizada.
+
+        Args:
+            driver: Navegador que abriu a primeira página
+            captured: Respostas de collect()
+            max_pages: Número máximo de páginas adicionais
+            page_products: Produtos extraídos da primeira página
+
+        Returns:
+            Produtos das páginas seguintes, ou None se nenhum endpoint paginável foi
+            encontrado ou se a primeira página pedida a ele falhou
+        """
+        grid_links = {canonical_url(p['link']) for p in page_products if p.get('link')}
+        for entry in captured:
+            products = self.extract_products(entry['data'])
+            if not products:
+                continue
+            links = [canonical_url(p['link']) for p in products if p.get('link')]
+            if not links or sum(link in grid_links for link in links) < MIN_GRID_OVERLAP * len(links):
+                logger.debug(f"Endpoint com produtos fora da grade da página, ignorado: {entry['url']}")
+                continue
+            paging = self._page_url(entry['url'])
+            if paging is None:
+                continue
+            param, current_page = paging
+            logger.info(f"Endpoint de produtos encontrado: {entry['url']} (paginação por '{param}')")
+            return self._fetch_pages(entry['url'], param, current_page, max_pages, self._browser_headers(driver))
+        return None
+
+    def _browser_headers(self, driver) -> dict:
+        """Headers de XHR com os cookies e o User-Agent do navegador"""
+        headers = HEADERS.copy()
+        headers['Accept'] = 'application/json, text/javascript, */*; q=0.01'
+        headers['X-Requested-With'] = 'XMLHttpRequest'
+        try:
+            headers['User-Agent'] = driver.execute_script('return navigator.userAgent')
+            cookies = driver.get_cookies()
+            if cookies:
+                headers['Cookie'] = '; '.join(f"{c['name']}={c['value']}" for c in cookies)
+        except Exception as e:
+            logger.debug(f"Não foi possível copiar a sessão do navegador: {e}")
+        return headers
+
+    def _fetch_pages(self, url: str, param: str, current_page: int, max_pages: int,
+                     headers: dict) -> Optional[List[Dict]]:
+        """
+        Pede as páginas seguintes até acabar os produtos ou atingir max_pages
+
+        Returns:
+            Produtos das páginas obtidas, ou None se a primeira delas falhou
+            (sem resposta, bloqueio ou conteúdo não-JSON)
+        """
+        parsed = urlparse(url)
+        query = parse_qsl(parsed.query, keep_blank_values=True)
+        products = []
+        for page in range(current_page + 1, current_page + 1 + max_pages):
+            page_query = [(key, str(page) if key == param else value) for key, value in query]
+            page_url = urlunparse(parsed._replace(query=urlencode(page_query)))
+            self.rate_limiter.wait(page_url)
+            response = fetch(page_url, headers=headers, retries=2)
+            if not response:
+                if page == current_page + 1:
+                    return None
+                break
+            try:
+                page_products = self.extract_products(response.json())
+            except ValueError:
+                logger.warning(f"Endpoint retornou conteúdo não-JSON: {page_url}")
+                if page == current_page + 1:
+                    return None
+                break
+            if not page_products:
+                break
+            products.extend(page_products)
+        logger.info(f"Endpoint direto: {len(products)} produtos em páginas seguintes")
+        return products
@@ -0,0 +1,150 @@
+"""
+Normalização em lote (pandas/NumPy) de preços, textos e categorias
+"""
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Último valor precedido do símbolo da moeda (ex.: "De R$ 20,00 por R$ 15,00" -> "15,00");
+# sem símbolo, o primeiro número do texto. Mesmas regras de src.utils.extract_price
+CURRENCY_PRICE_PATTERN = r'(?s).*R\$\s*(\d[\d.,]*)'
+PRICE_TOKEN_PATTERN = r'(\d[\d.,]*)'
+
+
+def _unique_codes(values: Sequence) -> tuple:
+    """Códigos e valores únicos: o trabalho por texto é feito uma vez por valor distinto"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    return codes, pd.Series(uniques, dtype=object)
+
+
+def normalize_whitespace(values: pd.Series) -> pd.Series:
+    """Colapsa espaços e quebras de linha e remove as bordas"""
+    return values.fillna('').astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def parse_brl_prices(values: pd.Series) -> pd.Series:
+    """
+    Converte textos de preço no padrão brasileiro em float, de forma vetorizada
+
+    O separador decimal é o último entre vírgula e ponto quando ambos aparecem;
+    só vírgula é decimal (exceto se repetida); só ponto é milhar quando repetido
+    ou seguido de exatamente três dígitos ("R$ 1.234" = 1234). Com o símbolo
+    da moeda, vale o último valor precedido dele ("2x de R$ 50,00" = 50.0,
+    "De R$ 20,00 por R$ 15,00" = 15.0); sem ele, o primeiro número. Textos
+    sem número resultam em 0.0.
+
+    Args:
+        values: Textos de preço (ex.: "R$ 1.234,56", "De R$ 20,00 por R$ 15,00")
+
+    Returns:
+        Série de floats com o mesmo índice
+    """
+    codes, uniques = _unique_codes(values)
+    texts = uniques.astype(str)
+    tokens = texts.str.extract(CURRENCY_PRICE_PATTERN, expand=False)
+    tokens = tokens.fillna(texts.str.extract(PRICE_TOKEN_PATTERN, expand=False)).str.rstrip('.,')
+    tokens = tokens.fillna('')
+
+    commas = tokens.str.count(',').to_numpy()
+    dots = tokens.str.count(r'\.').to_numpy()
+    last_comma = tokens.str.rfind(',').to_numpy()
+    last_dot = tokens.str.rfind('.').to_numpy()
+    digits_after_dot = tokens.str.len().to_numpy() - last_dot - 1
+
+    comma_decimal = ((commas > 0) & (dots > 0) & (last_comma > last_dot)) | ((commas == 1) & (dots == 0))
+    dot_decimal = ((commas > 0) & (dots > 0) & (last_dot > last_comma)) | \
+                  ((commas == 0) & (dots == 1) & (digits_after_dot != 3))
+
+    cleaned = tokens.copy()
+    cleaned[comma_decimal] = tokens[comma_decimal].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    cleaned[dot_decimal] = tokens[dot_decimal].str.replace(',', '', regex=False)
+    thousands_only = ~(comma_decimal | dot_decimal)
+    cleaned[thousands_only] = tokens[thousands_only].str.replace(r'[.,]', '', regex=True)
+
+    parsed = pd.to_numeric(cleaned, errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    # Textos ausentes (código -1) valem 0.0
+    result = np.where(codes >= 0, parsed[np.maximum(codes, 0)] if len(parsed) else 0.0, 0.0)
+    return pd.Series(result, index=values.index if isinstance(values, pd.Series) else None)
+
+
+def canonical_categories(values: pd.Series) -> pd.Series:
+    """
+    Forma canônica da categoria, para agrupar variações de grafia
+
+    "Casa e Cozinha", "casa_e_cozinha" e "Casa  e Cozinha " viram
+    "casa-e-cozinha" (sem acentos, minúsculas, separador hífen).
+
+    Args:
+        values: Nomes de categoria
+
+    Returns:
+        Série com as categorias canônicas (mesmo índice)
+    """
+    codes, uniques = _unique_codes(values)
+    canonical = (
+        uniques.astype(str)
+        .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+        .str.lower()
+        .str.replace(r'[^a-z0-9]+', '-', regex=True)
+        .str.strip('-')
+        .replace('', 'sem-categoria')
+        .to_numpy(dtype=object)
+    )
+    result = np.where(codes >= 0, canonical[np.maximum(codes, 0)] if len(canonical) else '', 'sem-categoria')
+    return pd.Series(result, index=values.index if isinstance(values, pd.Series) else None, dtype=object)
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza uma tabela de produtos, mantendo as colunas brutas
+
+    - preco: calculado de preco_original onde estiver vazio
+    - nome e descricao: espaços normalizados
+    - categoria_canonica: forma canônica de categoria (categoria fica como está)
+
+    Args:
+        df: Tabela de produtos (ex.: to_frame(products))
+
+    Returns:
+        A mesma tabela, com as colunas normalizadas
+    """
+    if df.empty:
+        return df
+    if 'preco_original' in df.columns:
+        parsed = parse_brl_prices(df['preco_original'])
+        df['preco'] = df['preco'].fillna(parsed) if 'preco' in df.columns else parsed
+    for column in ('nome', 'descricao'):
+        if column in df.columns:
+            df[column] = normalize_whitespace(df[column])
+    if 'categoria' in df.columns:
+        df['categoria_canonica'] = canonical_categories(df['categoria'])
+    return df
+
+
+def normalize_products(products: List) -> List:
+    """
+    Etapa de normalização em lote sobre os produtos coletados
+
+    Preenche 'preco' (a partir de 'preco_original') nos produtos que ainda
+    não têm o valor numérico e define 'categoria_canonica' em todos. Os
+    produtos são atualizados no lugar.
+
+    Args:
+        products: Produtos (Product ou dict)
+
+    Returns:
+        A mesma lista
+    """
+    if not products:
+        return products
+    missing_mask = np.array([product.get('preco') is None for product in products], dtype=bool)
+    missing = np.flatnonzero(missing_mask).tolist()
+    if missing:
+        raw_prices = pd.Series([products[i].get('preco_original') for i in missing], dtype=object)
+        for i, price in zip(missing, parse_brl_prices(raw_prices).tolist()):
+            products[i]['preco'] = price
+    categories = canonical_categories(pd.Series([product.get('categoria') for product in products], dtype=object))
+    for product, category in zip(products, categories.tolist()):
+        product['categoria_canonica'] = category
+    return products
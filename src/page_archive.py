@@ -0,0 +1,185 @@
+"""
+Arquivo compactado das páginas baixadas (registros no estilo WARC)
+"""
+import gzip
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+from loguru import logger
+
+from config import ARCHIVE_DIR, ARCHIVE_COMPRESSION
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; gzip sempre disponível
+    zstandard = None
+
+SEGMENT_EXTENSIONS = {'gzip': '.warc.gz', 'zstd': '.warc.zst'}
+
+# Registro do índice: (url, data da coleta, segmento, offset, tamanho compactado)
+ArchiveRecord = Tuple[str, str, str, int, int]
+
+
+def compress_record(data: bytes, compression: str) -> bytes:
+    """Compacta um registro como membro/frame independente (permite acesso aleatório)"""
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress_record(data: bytes, compression: str) -> bytes:
+    """Descompacta um registro"""
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def parse_record(raw: bytes) -> Tuple[dict, bytes]:
+    """Separa cabeçalhos e corpo de um registro WARC"""
+    head, _, body = raw.partition(b'\r\n\r\n')
+    headers = {}
+    for line in head.decode('utf-8').split('\r\n')[1:]:
+        key, _, value = line.partition(':')
+        headers[key.strip()] = value.strip()
+    length = int(headers.get('Content-Length', len(body)))
+    return headers, body[:length]
+
+
+def read_record(segment_path: Union[str, Path], offset: int, length: int) -> Tuple[dict, bytes]:
+    """
+    Lê um registro do arquivo de segmento
+
+    Args:
+        segment_path: Caminho do segmento (.warc.gz ou .warc.zst)
+        offset: Posição do registro no arquivo
+        length: Tamanho compactado do registro
+
+    Returns:
+        Tupla (cabeçalhos, corpo HTML em bytes)
+    """
+    segment_path = Path(segment_path)
+    compression = 'zstd' if segment_path.suffix == '.zst' else 'gzip'
+    with open(segment_path, 'rb') as f:
+        f.seek(offset)
+        raw = decompress_record(f.read(length), compression)
+    return parse_record(raw)
+
+
+class PageArchive:
+    """
+    Armazena cada página baixada em segmentos diários compactados
+
+    Cada registro é compactado isoladamente, então o índice SQLite (URL, data,
+    segmento, offset, tamanho) permite ler qualquer página sem descompactar o
+    segmento inteiro.
+    """
+
+    def __init__(self, archive_dir: Path = ARCHIVE_DIR, compression: str = ARCHIVE_COMPRESSION):
+        """
+        Args:
+            archive_dir: Pasta do arquivo
+            compression: 'gzip' ou 'zstd' (requer o pacote zstandard)
+        """
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("Pacote zstandard não instalado. Usando gzip no arquivo de páginas.")
+            compression = 'gzip'
+        if compression not in SEGMENT_EXTENSIONS:
+            raise ValueError(f"Compressão inválida: {compression}. Use 'gzip' ou 'zstd'")
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.archive_dir / "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT NOT NULL, fetched_at TEXT NOT NULL, segment TEXT NOT NULL, "
+            "offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_url ON pages (url, fetched_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_fetched_at ON pages (fetched_at)")
+        self.conn.commit()
+
+    def store(self, url: str, content: Union[str, bytes], fetched_at: Optional[datetime] = None):
+        """
+        Grava uma página no arquivo
+
+        Args:
+            url: URL da página
+            content: HTML da página
+            fetched_at: Data da coleta (padrão: agora)
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        fetched_at = (fetched_at or datetime.now()).isoformat(timespec='seconds')
+        header = (
+            f"WARC/1.0\r\n"
+            f"WARC-Type: response\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"WARC-Date: {fetched_at}\r\n"
+            f"Content-Type: text/html; charset=utf-8\r\n"
+            f"Content-Length: {len(content)}\r\n\r\n"
+        ).encode('utf-8')
+        record = compress_record(header + content + b"\r\n\r\n", self.compression)
+        segment = f"pages-{fetched_at[:10].replace('-', '')}{SEGMENT_EXTENSIONS[self.compression]}"
+
+        with self._lock:
+            with open(self.archive_dir / segment, 'ab') as f:
+                offset = f.tell()
+                f.write(record)
+            self.conn.execute(
+                "INSERT INTO pages (url, fetched_at, segment, offset, length) VALUES (?, ?, ?, ?, ?)",
+                (url, fetched_at, segment, offset, len(record))
+            )
+            self.conn.commit()
+
+    def records(self, since: Optional[str] = None, until: Optional[str] = None,
+                url: Optional[str] = None) -> List[ArchiveRecord]:
+        """
+        Lista os registros do índice
+
+        Args:
+            since: Data inicial (inclusive), formato ISO (ex.: '2024-05-01')
+            until: Data final (inclusive), formato ISO
+            url: Filtra por URL exata
+
+        Returns:
+            Lista de (url, data da coleta, caminho do segmento, offset, tamanho)
+        """
+        query = "SELECT url, fetched_at, segment, offset, length FROM pages WHERE 1=1"
+        params = []
+        if since:
+            query += " AND fetched_at >= ?"
+            params.append(since)
+        if until:
+            query += " AND fetched_at <= ?"
+            params.append(until if 'T' in until else f"{until}T23:59:59")
+        if url:
+            query += " AND url = ?"
+            params.append(url)
+        query += " ORDER BY segment, offset"
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [(u, f, str(self.archive_dir / seg), off, length) for u, f, seg, off, length in rows]
+
+    def latest(self, url: str) -> Optional[bytes]:
+        """Retorna o HTML mais recente arquivado para a URL"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT segment, offset, length FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+                (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return read_record(self.archive_dir / row[0], row[1], row[2])[1]
+
+    def iter_pages(self, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Tuple[str, str, bytes]]:
+        """Itera (url, data da coleta, HTML) dos registros arquivados"""
+        for url, fetched_at, segment, offset, length in self.records(since, until):
+            yield url, fetched_at, read_record(segment, offset, length)[1]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,115 @@
+"""
+Pool de processos para o parse de HTML, com entrega das páginas por memória compartilhada
+"""
+import atexit
+import importlib
+import os
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+from loguru import logger
+
+from config import PARSE_WORKERS
+
+# Tipos de página e a função que extrai os dados de cada um: (módulo, função)
+PARSERS = {
+    'listing': ('src.scraper', 'extract_products_from_html'),
+    'detail': ('src.detail_scraper', 'extract_details_from_html'),
+}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Abre um bloco de memória compartilhada criado pelo processo principal"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Os processos do pool usam o mesmo resource_tracker do processo principal,
+    # então o registro repetido não tem efeito e o bloco é removido só em submit
+    return shared_memory.SharedMemory(name=name)
+
+
+def _parse_shared(kind: str, name: str, size: int, base_url: str, selectors: Optional[Dict] = None):
+    """Lê a página da memória compartilhada e extrai os dados (executado no processo filho)"""
+    shm = _attach(name)
+    try:
+        html_content = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    module_name, function_name = PARSERS[kind]
+    parser = getattr(importlib.import_module(module_name), function_name)
+    return parser(html_content, base_url, selectors)
+
+
+class ParsePool:
+    """
+    Processos dedicados ao parse das páginas (BeautifulSoup/lxml)
+
+    As threads de download entregam os bytes da página em um bloco de
+    memória compartilhada e recebem de volta só os dados extraídos (produtos
+    ou detalhes), sem serializar o HTML; o parse roda fora do GIL enquanto
+    as threads continuam baixando.
+    """
+
+    def __init__(self, workers: Optional[int] = PARSE_WORKERS):
+        """
+        Args:
+            workers: Número de processos (padrão: número de CPUs)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def submit(self, kind: str, content, base_url: str, selectors: Optional[Dict] = None) -> Future:
+        """
+        Envia uma página para parse
+
+        Args:
+            kind: Tipo de página ('listing' ou 'detail')
+            content: HTML da página (str ou bytes)
+            base_url: URL base para construir URLs absolutas
+            selectors: Seletores CSS do site (padrão: os do config.py para o tipo)
+
+        Returns:
+            Future com o resultado do parser do tipo (ver PARSERS)
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(content)))
+        shm.buf[:len(content)] = content
+        try:
+            future = self.executor.submit(_parse_shared, kind, shm.name, len(content), base_url, selectors)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+        def release(_):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(release)
+        return future
+
+    def parse(self, kind: str, content, base_url: str, selectors: Optional[Dict] = None):
+        """Faz o parse em um processo do pool e espera o resultado"""
+        return self.submit(kind, content, base_url, selectors).result()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> Optional[ParsePool]:
+    """Retorna o pool de parse global (None se PARSE_WORKERS = 0)"""
+    global _pool
+    if PARSE_WORKERS == 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool()
+            atexit.register(_pool.close)
+            logger.debug(f"Pool de parse iniciado com {_pool.workers} processo(s)")
+        return _pool
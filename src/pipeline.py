@@ -0,0 +1,111 @@
+"""
+Etapas de uma coleta completa: listagem, detalhes, imagens e exportação
+"""
+from typing import Dict, List
+from loguru import logger
+
+from config import SCRAPE_DETAIL_PAGES, DETAIL_CACHE_FILE
+from src.detail_scraper import ProductDetailScraper
+from src.run_budget import get_run_budget
+from src.log_utils import flush_sampled, log_context
+
+
+def run_crawl(scraper, image_downloader, data_exporter, category_urls: List[str],
+              max_pages_per_category: int, run_id: str) -> Dict:
+    """
+    Executa uma coleta com componentes já inicializados
+
+    Os componentes (navegador, sessões HTTP, caches) não são fechados aqui,
+    para que possam ser reaproveitados por coletas seguintes (ver
+    src.crawl_service).
+
+    Args:
+        scraper: WebScraper
+        image_downloader: ImageDownloader
+        data_exporter: DataExporter
+        category_urls: URLs das categorias
+        max_pages_per_category: Número máximo de páginas por categoria
+        run_id: Identificador da coleta (usado nos nomes dos arquivos e no banco)
+
+    Returns:
+        Resumo com produtos, arquivos gerados, imagens, detalhes, cobertura e
+        ocorrências por tipo de aviso
+    """
+    # Os registros desta thread levam o run_id e o site (campos do log JSON); os
+    # avisos amostrados são contados à parte das outras coletas
+    with log_context(run_id, scraper.site.name):
+        summary = {'run_id': run_id, 'produtos': 0, 'arquivos': None, 'parcial': False, 'ocorrencias': {}}
+        try:
+            return _run_stages(scraper, image_downloader, data_exporter, category_urls,
+                               max_pages_per_category, run_id, summary)
+        finally:
+            _count_occurrences(summary)
+
+
+def _count_occurrences(summary: Dict):
+    """Emite os contadores de avisos amostrados e os soma ao resumo"""
+    for key, count in flush_sampled().items():
+        summary['ocorrencias'][key] = summary['ocorrencias'].get(key, 0) + count
+
+
+def _run_stages(scraper, image_downloader, data_exporter, category_urls: List[str],
+                max_pages_per_category: int, run_id: str, summary: Dict) -> Dict:
+    budget = get_run_budget()
+
+    logger.info(f"Iniciando scraping de {len(category_urls)} categoria(s)...")
+    products = scraper.scrape_categories(category_urls, max_pages_per_category)
+    summary['cobertura'] = dict(scraper.completeness)
+    _count_occurrences(summary)
+    if not products:
+        logger.warning("Nenhum produto foi encontrado!")
+        summary['parcial'] = bool(budget.reason)
+        return summary
+
+    logger.info(f"Total de produtos coletados: {len(products)}")
+
+    # Etapa opcional: páginas de detalhe (descrição, SKU, estoque, galeria, variações)
+    if SCRAPE_DETAIL_PAGES:
+        logger.info("Coletando páginas de detalhe dos produtos...")
+        site = scraper.site
+        # Cada site tem seu próprio cache de detalhes (sites coletados em paralelo não disputam o arquivo)
+        cache_file = DETAIL_CACHE_FILE
+        if cache_file and site.name != 'padrao':
+            cache_file = cache_file.with_name(f"{cache_file.stem}_{site.name}{cache_file.suffix}")
+        detail_scraper = ProductDetailScraper(scraper.base_url, cache_file=cache_file,
+                                              selectors=site.detail_selectors)
+        products = list(data_exporter.stream_csv(
+            detail_scraper.iter_enriched(products), f"detalhes_{run_id}"
+        ))
+        summary['detalhes'] = {
+            'buscados': detail_scraper.fetched_count, 'cache': detail_scraper.cached_count,
+            'falhas': detail_scraper.failed_count, 'pulados': detail_scraper.skipped_count,
+        }
+        _count_occurrences(summary)
+
+    # Faz download das imagens (contadores do downloader são acumulados entre coletas)
+    logger.info("Iniciando download de imagens...")
+    before = image_downloader.get_stats()
+    image_paths = image_downloader.download_product_images(products, scraper.base_url)
+    after = image_downloader.get_stats()
+    summary['imagens'] = {key: after[key] - before[key] for key in after}
+    _count_occurrences(summary)
+
+    # Adiciona caminhos das imagens aos produtos
+    products = data_exporter.add_image_paths(products, image_paths)
+
+    # Exporta para planilhas
+    logger.info("Exportando dados para planilhas...")
+    # Coleta encerrada pelo orçamento (ou Ctrl+C): o nome do arquivo indica que é parcial
+    summary['parcial'] = bool(budget.reason)
+    base_filename = f"produtos_{run_id}_parcial" if budget.reason else f"produtos_{run_id}"
+    if data_exporter.store:
+        # Planilhas geradas a partir do banco local (visão desta coleta)
+        data_exporter.save_to_store(products, run_id=run_id)
+        files = data_exporter.export_view(base_filename, run_id=run_id)
+    else:
+        files = data_exporter.export_both(products, base_filename)
+
+    summary['produtos'] = len(products)
+    summary['arquivos'] = {kind: str(path) for kind, path in files.items()}
+    summary['requisicoes'] = budget.stats()
+    return summary
@@ -0,0 +1,154 @@
+"""
+Registro compacto de produto (__slots__) e conversão em colunas
+"""
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Campos conhecidos, na ordem das planilhas. Campos fora desta lista vão para um
+# dicionário extra criado só quando necessário.
+FIELDS = (
+    'id', 'nome', 'categoria', 'categoria_canonica', 'preco', 'preco_original',
+    'descricao', 'sku', 'estoque', 'imagem_url', 'imagens_galeria',
+    'variacoes', 'link', 'data_coleta', 'imagem_local',
+)
+_FIELD_SET = frozenset(FIELDS)
+
+
+class Product(MutableMapping):
+    """
+    Produto com um slot por campo conhecido, em vez de um dict por produto
+
+    Mantém a interface de dicionário (product['nome'], product.get('link'),
+    product.update(detalhes)), então o restante do código não muda. Campos
+    não preenchidos não ocupam entrada alguma e não aparecem em keys(); a
+    categoria é internada, de modo que produtos da mesma categoria
+    compartilham a string.
+    """
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, data: Optional[Dict] = None, **fields):
+        self._extra = None
+        if data:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in _FIELD_SET:
+            if key == 'categoria' and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __repr__(self) -> str:
+        return f"Product({dict(self)!r})"
+
+    def __getstate__(self):
+        return dict(self)
+
+    def __setstate__(self, state: Dict):
+        self._extra = None
+        self.update(state)
+
+    def copy(self) -> 'Product':
+        return Product(self)
+
+    def to_dict(self) -> Dict:
+        return dict(self)
+
+
+def to_columns(products: Iterable) -> Dict[str, List]:
+    """
+    Converte produtos (Product ou dict) em colunas, sem dicionários intermediários
+
+    Campos ausentes em um produto ficam None na coluna. A ordem das colunas
+    segue FIELDS, com os campos extras no fim.
+
+    Args:
+        products: Produtos
+
+    Returns:
+        Dicionário campo -> lista de valores (todas com o mesmo tamanho)
+    """
+    columns: Dict[str, List] = {key: [] for key in FIELDS}
+    extra: Dict[str, List] = {}
+    count = 0
+    for product in products:
+        if type(product) is Product:
+            # Leitura direta dos slots, sem passar pela interface de mapeamento
+            for key in FIELDS:
+                columns[key].append(getattr(product, key, None))
+            others = product._extra or ()
+        else:
+            for key in FIELDS:
+                columns[key].append(product.get(key))
+            others = [key for key in product if key not in _FIELD_SET]
+        for key in others:
+            column = extra.get(key)
+            if column is None:
+                column = extra[key] = [None] * count
+            column.append(product[key])
+        count += 1
+        for column in extra.values():
+            if len(column) < count:
+                column.append(None)
+    # Campos conhecidos que nenhum produto preencheu não viram colunas
+    columns = {key: values for key, values in columns.items() if any(v is not None for v in values)}
+    columns.update(extra)
+    return columns
+
+
+def to_frame(products: Iterable):
+    """Converte produtos em pandas.DataFrame a partir das colunas"""
+    import pandas as pd
+    return pd.DataFrame(to_columns(products))
+
+
+def to_arrow(products: Iterable):
+    """Converte produtos em pyarrow.Table (requer pyarrow)"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow não instalado. Execute: pip install pyarrow") from None
+    return pa.Table.from_pydict(to_columns(products))
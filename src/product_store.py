@@ -0,0 +1,200 @@
+"""
+Banco local de produtos (SQLite) com histórico de preços
+"""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from loguru import logger
+
+from config import PRODUCT_DB_FILE
+
+# Campos descritivos guardados na tabela de produtos (valor mais recente)
+PRODUCT_FIELDS = ('nome', 'categoria', 'descricao', 'sku', 'estoque', 'imagem_url',
+                  'imagens_galeria', 'variacoes', 'imagem_local', 'link')
+
+# Colunas retornadas pelas consultas (mesma ordem das planilhas)
+VIEW_COLUMNS = ('id', 'nome', 'categoria', 'preco', 'preco_original', 'descricao', 'sku',
+                'estoque', 'imagem_url', 'imagens_galeria', 'variacoes', 'link',
+                'data_coleta', 'imagem_local')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    nome TEXT, categoria TEXT, descricao TEXT, sku TEXT, estoque TEXT,
+    imagem_url TEXT, imagens_galeria TEXT, variacoes TEXT, imagem_local TEXT, link TEXT,
+    first_seen TEXT, last_seen TEXT
+);
+CREATE TABLE IF NOT EXISTS observations (
+    product_id TEXT NOT NULL,
+    data_coleta TEXT NOT NULL,
+    preco REAL,
+    preco_original TEXT,
+    categoria TEXT,
+    run_id TEXT,
+    PRIMARY KEY (product_id, data_coleta)
+);
+CREATE INDEX IF NOT EXISTS idx_products_categoria ON products (categoria);
+CREATE INDEX IF NOT EXISTS idx_observations_data ON observations (data_coleta);
+CREATE INDEX IF NOT EXISTS idx_observations_categoria ON observations (categoria, data_coleta);
+CREATE INDEX IF NOT EXISTS idx_observations_run ON observations (run_id);
+"""
+
+
+class ProductStore:
+    """Classe para guardar e consultar produtos coletados"""
+
+    def __init__(self, db_path: Path = PRODUCT_DB_FILE, batch_size: int = 5000):
+        """
+        Args:
+            db_path: Arquivo do banco SQLite
+            batch_size: Número de linhas por transação nas gravações
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def upsert_products(self, products: Iterable[Dict], run_id: Optional[str] = None) -> int:
+        """
+        Grava produtos e observações de preço em lotes (uma transação por lote)
+
+        Campos descritivos vazios não sobrescrevem valores já conhecidos.
+
+        Args:
+            products: Produtos no formato de extract_product_info
+            run_id: Identificador da execução (ex.: timestamp)
+
+        Returns:
+            Número de produtos gravados
+        """
+        product_sql = (
+            f"INSERT INTO products (id, {', '.join(PRODUCT_FIELDS)}, first_seen, last_seen) "
+            f"VALUES ({', '.join('?' * (len(PRODUCT_FIELDS) + 3))}) "
+            f"ON CONFLICT(id) DO UPDATE SET "
+            + ', '.join(f"{field} = COALESCE(NULLIF(excluded.{field}, ''), {field})" for field in PRODUCT_FIELDS)
+            + ", first_seen = MIN(first_seen, excluded.first_seen), last_seen = MAX(last_seen, excluded.last_seen)"
+        )
+        observation_sql = (
+            "INSERT INTO observations (product_id, data_coleta, preco, preco_original, categoria, run_id) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(product_id, data_coleta) DO UPDATE SET "
+            "preco = excluded.preco, preco_original = excluded.preco_original, "
+            "categoria = excluded.categoria, run_id = excluded.run_id"
+        )
+
+        total = 0
+        product_rows, observation_rows = [], []
+        for product in products:
+            product_id = product.get('id')
+            if not product_id:
+                continue
+            collected_at = product.get('data_coleta', '')
+            product_rows.append(
+                (product_id,) + tuple(str(product.get(field) or '') for field in PRODUCT_FIELDS)
+                + (collected_at, collected_at)
+            )
+            observation_rows.append((
+                product_id, collected_at, product.get('preco'), product.get('preco_original', ''),
+                product.get('categoria', ''), run_id
+            ))
+            if len(product_rows) >= self.batch_size:
+                total += self._write_batch(product_sql, product_rows, observation_sql, observation_rows)
+                product_rows, observation_rows = [], []
+
+        if product_rows:
+            total += self._write_batch(product_sql, product_rows, observation_sql, observation_rows)
+
+        logger.info(f"Banco de produtos atualizado: {total} produtos ({self.db_path})")
+        return total
+
+    def _write_batch(self, product_sql: str, product_rows: list, observation_sql: str, observation_rows: list) -> int:
+        """Grava um lote em uma única transação"""
+        with self._lock, self.conn:
+            self.conn.executemany(product_sql, product_rows)
+            self.conn.executemany(observation_sql, observation_rows)
+        return len(product_rows)
+
+    def _select(self, where: str = "", params: tuple = (), order: str = "o.data_coleta DESC",
+                limit: Optional[int] = None) -> List[Dict]:
+        """Consulta observações com os dados descritivos do produto"""
+        columns = ', '.join(
+            f"o.{col}" if col in ('preco', 'preco_original', 'data_coleta', 'categoria')
+            else ("p.id" if col == 'id' else f"p.{col}")
+            for col in VIEW_COLUMNS
+        )
+        sql = f"SELECT {columns} FROM observations o JOIN products p ON p.id = o.product_id"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def query(self, categoria: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, search: Optional[str] = None,
+              run_id: Optional[str] = None, latest_only: bool = False,
+              limit: Optional[int] = None) -> List[Dict]:
+        """
+        Consulta produtos coletados
+
+        Args:
+            categoria: Filtra pela categoria
+            since: Data inicial da coleta (AAAA-MM-DD, inclusive)
+            until: Data final da coleta (AAAA-MM-DD, inclusive)
+            search: Trecho do nome do produto
+            run_id: Filtra por uma execução
+            latest_only: Apenas a observação mais recente de cada produto
+            limit: Número máximo de linhas
+
+        Returns:
+            Lista de dicionários com as colunas das planilhas
+        """
+        conditions, params = [], []
+        if categoria:
+            conditions.append("o.categoria = ?")
+            params.append(categoria)
+        if since:
+            conditions.append("o.data_coleta >= ?")
+            params.append(since)
+        if until:
+            conditions.append("o.data_coleta <= ?")
+            params.append(until if len(until) > 10 else f"{until} 23:59:59")
+        if search:
+            conditions.append("p.nome LIKE ?")
+            params.append(f"%{search}%")
+        if run_id:
+            conditions.append("o.run_id = ?")
+            params.append(run_id)
+        if latest_only:
+            conditions.append(
+                "o.data_coleta = (SELECT MAX(o2.data_coleta) FROM observations o2 WHERE o2.product_id = o.product_id)"
+            )
+        return self._select(' AND '.join(conditions), tuple(params), limit=limit)
+
+    def price_history(self, product_id: str) -> List[Dict]:
+        """Histórico de preços de um produto, do mais antigo ao mais recente"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT data_coleta, preco, preco_original, categoria FROM observations "
+                "WHERE product_id = ? ORDER BY data_coleta",
+                (product_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def price_at(self, product_id: str, date: str) -> Optional[Dict]:
+        """Última observação de preço do produto até a data informada (AAAA-MM-DD)"""
+        date = date if len(date) > 10 else f"{date} 23:59:59"
+        rows = self._select("p.id = ? AND o.data_coleta <= ?", (product_id, date), limit=1)
+        return rows[0] if rows else None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,110 @@
+"""
+Orçamento da execução (tempo e número de requisições) e interrupção graciosa
+"""
+import threading
+import time
+from typing import Dict, Optional
+from loguru import logger
+
+
+class RunBudget:
+    """
+    Limites da execução compartilhados por todas as etapas
+
+    Cada requisição de rede pede licença com try_request(); quando o prazo
+    ou o número de requisições acaba (ou cancel() é chamado, ex.: Ctrl+C), as
+    novas requisições são recusadas, as etapas param de agendar trabalho e o
+    que já foi coletado segue para a exportação.
+    """
+
+    def __init__(self, time_budget: Optional[float] = None, max_requests: Optional[int] = None):
+        """
+        Args:
+            time_budget: Duração máxima da execução em segundos (None = sem limite)
+            max_requests: Número máximo de requisições de rede (None = sem limite)
+        """
+        self.time_budget = time_budget
+        self.max_requests = max_requests
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self.refused = 0
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self) -> bool:
+        return self.time_budget is not None or self.max_requests is not None
+
+    def remaining_time(self) -> Optional[float]:
+        """Segundos restantes do prazo (None se não houver prazo)"""
+        if self.time_budget is None:
+            return None
+        return max(0.0, self.time_budget - (time.monotonic() - self.started_at))
+
+    @property
+    def exhausted(self) -> bool:
+        """Indica se a execução deve encerrar (prazo, requisições ou cancelamento)"""
+        if self.reason:
+            return True
+        if self.time_budget is not None and self.remaining_time() <= 0:
+            self._stop(f"prazo de {self.time_budget:.0f}s esgotado")
+        elif self.max_requests is not None and self.requests >= self.max_requests:
+            self._stop(f"limite de {self.max_requests} requisições atingido")
+        return self.reason is not None
+
+    def try_request(self) -> bool:
+        """
+        Reserva uma requisição do orçamento
+
+        Returns:
+            True se a requisição pode ser feita
+        """
+        if self.exhausted:
+            with self._lock:
+                self.refused += 1
+            return False
+        with self._lock:
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                self.refused += 1
+                stop = True
+            else:
+                self.requests += 1
+                stop = False
+        if stop:
+            self._stop(f"limite de {self.max_requests} requisições atingido")
+            return False
+        return True
+
+    def cancel(self, reason: str = "interrompido pelo usuário"):
+        """Encerra a execução graciosamente: nada novo é iniciado"""
+        self._stop(reason)
+
+    def _stop(self, reason: str):
+        with self._lock:
+            if self.reason:
+                return
+            self.reason = reason
+        logger.warning(f"Encerrando a coleta ({reason}); exportando o que já foi coletado")
+
+    def stats(self) -> Dict:
+        """Requisições feitas/recusadas, tempo decorrido e motivo da parada"""
+        return {
+            'requisicoes': self.requests,
+            'recusadas': self.refused,
+            'segundos': round(time.monotonic() - self.started_at, 1),
+            'motivo': self.reason,
+        }
+
+
+_budget = RunBudget()
+
+
+def get_run_budget() -> RunBudget:
+    """Retorna o orçamento da execução atual (sem limites por padrão)"""
+    return _budget
+
+
+def set_run_budget(budget: RunBudget):
+    """Define o orçamento da execução (ex.: a partir de --time-budget/--max-requests)"""
+    global _budget
+    _budget = budget
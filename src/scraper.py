@@ -2,36 +2,290 @@
 Módulo principal de Web Scraping
 """
 import time
-from typing import List, Dict, Optional
+from urllib.parse import urlparse
+from typing import List, Dict, Optional, Tuple
 from bs4 import BeautifulSoup
 from loguru import logger
-from tqdm import tqdm
 
 from config import (
-    BASE_URL, DELAY_BETWEEN_REQUESTS, SELECTORS, 
-    USE_SELENIUM, USE_UNDETECTED_CHROMEDRIVER, SELENIUM_HEADLESS, SELENIUM_WAIT_TIME, SELENIUM_DRIVER
+    SELECTORS, USE_UNDETECTED_CHROMEDRIVER, SELENIUM_HEADLESS, SELENIUM_WAIT_TIME, SELENIUM_DRIVER,
+    ARCHIVE_PAGES, SELENIUM_ARCHIVE_PAGES, BLOCK_SCAN_BYTES, BATCH_NORMALIZATION,
+    SELENIUM_CAPTURE_XHR, SELENIUM_PERSISTENT_PROFILES, BROWSER_WARMUP_URLS, BROWSER_WARMUP_MAX_AGE_HOURS
 )
 from src.utils import (
-    safe_request, build_absolute_url, clean_text, 
+    fetch, build_absolute_url, clean_text, 
     extract_price, sanitize_category, get_random_user_agent
 )
+from src.dedup import Deduplicator
+from src.block_detection import detect_block, circuit_breakers
+from src.proxy_pool import get_proxy_pool
+from src.parse_pool import get_parse_pool
+from src.product_record import Product
+from src.normalize import normalize_products
+from src.run_budget import get_run_budget
+from src.log_utils import log_sampled
+from src.site_profile import SiteProfile
+
+
+def build_product_info(name: str, price_text: str, image_url: str, link: str,
+                       category_text: str, base_url: str) -> Product:
+    """
+    Monta o registro do produto a partir dos textos e atributos brutos
+    
+    Args:
+        name: Texto do nome
+        price_text: Texto do preço
+        image_url: src da imagem (pode ser relativo)
+        link: href do produto (pode ser relativo)
+        category_text: Texto da categoria ("" se não encontrada)
+        base_url: URL base para construir URLs absolutas
+        
+    Returns:
+        Product com informações do produto
+    """
+    name = clean_text(name)
+    price_text = clean_text(price_text)
+    category = clean_text(category_text) if category_text else "Sem_Categoria"
+    category = sanitize_category(category)
+    
+    # Gera ID único (pode ser melhorado)
+    product_id = f"{category}_{name}" if name else f"produto_{time.time()}"
+    product_id = product_id.replace(' ', '_')[:100]
+    
+    return Product(
+        id=product_id,
+        nome=name,
+        categoria=category,
+        # Com BATCH_NORMALIZATION o preço é convertido em lote (normalize_products),
+        # ao fim de cada método público do WebScraper
+        preco=None if BATCH_NORMALIZATION else extract_price(price_text),
+        preco_original=price_text,  # Mantém formato original
+        imagem_url=build_absolute_url(base_url, image_url),
+        link=build_absolute_url(base_url, link),
+        data_coleta=time.strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+
+def parse_product_element(product_element, base_url: str, selectors: Dict = None) -> Product:
+    """
+    Extrai informações de um produto de um elemento HTML
+    
+    Args:
+        product_element: Elemento BeautifulSoup do produto
+        base_url: URL base para construir URLs absolutas
+        selectors: Seletores CSS (padrão: SELECTORS do config.py)
+        
+    Returns:
+        Product com informações do produto (vazio em caso de erro)
+    """
+    selectors = selectors or SELECTORS
+    
+    try:
+        # Nome do produto
+        name_elem = product_element.select_one(selectors['product_name']) if selectors.get('product_name') else None
+        
+        # Preço
+        price_elem = product_element.select_one(selectors['product_price']) if selectors.get('product_price') else None
+        
+        # Imagem
+        image_elem = product_element.select_one(selectors['product_image']) if selectors.get('product_image') else None
+        image_url = ""
+        if image_elem:
+            image_url = image_elem.get('src') or image_elem.get('data-src') or image_elem.get('data-lazy-src') or ""
+        
+        # Link do produto
+        link_elem = product_element.select_one(selectors['product_link']) if selectors.get('product_link') else None
+        link = link_elem.get('href') or "" if link_elem else ""
+        
+        # Categoria
+        category_elem = product_element.select_one(selectors['product_category']) if selectors.get('product_category') else None
+        
+        return build_product_info(
+            name_elem.get_text() if name_elem else "",
+            price_elem.get_text() if price_elem else "",
+            image_url,
+            link,
+            category_elem.get_text() if category_elem else "",
+            base_url
+        )
+        
+    except Exception as e:
+        log_sampled("Erro ao extrair produto", 'ERROR', f"Erro ao extrair informações do produto: {e}")
+        return Product()
+
+
+def extract_products_from_soup(soup: BeautifulSoup, base_url: str,
+                               selectors: Dict = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Extrai todos os produtos e o link da próxima página de uma página parseada
+    
+    Args:
+        soup: Página de categoria parseada
+        base_url: URL base para construir URLs absolutas
+        selectors: Seletores CSS (padrão: SELECTORS do config.py)
+        
+    Returns:
+        Tupla (produtos com nome, URL absoluta da próxima página ou None)
+    """
+    selectors = selectors or SELECTORS
+    container_selector = selectors.get('product_container', '')
+    if not container_selector:
+        logger.warning("Seletor de container de produtos não configurado!")
+        return [], None
+    
+    products = []
+    for container in soup.select(container_selector):
+        product_info = parse_product_element(container, base_url, selectors)
+        if product_info and product_info.get('nome'):  # Só adiciona se tiver nome
+            products.append(product_info)
+    
+    next_url = None
+    next_selector = selectors.get('next_page', '')
+    if next_selector:
+        next_link = soup.select_one(next_selector)
+        if next_link and next_link.get('href'):
+            next_url = build_absolute_url(base_url, next_link['href'])
+    
+    return products, next_url
+
+
+# Executado no navegador com os SELECTORS: devolve só os campos brutos de cada
+# produto (mesmos textos/atributos lidos por parse_product_element) e o link
+# da próxima página. Sem produtos, devolve o início do documento para a
+# detecção de bloqueio.
+IN_BROWSER_EXTRACTION_SCRIPT = """
+const selectors = arguments[0];
+const headBytes = arguments[1];
+const includeHtml = arguments[2];
+const pick = (root, key) => {
+    if (!selectors[key]) return null;
+    try { return root.querySelector(selectors[key]); } catch (e) { return null; }
+};
+const text = (el) => el ? el.textContent : '';
+const products = [];
+if (selectors.product_container) {
+    for (const el of document.querySelectorAll(selectors.product_container)) {
+        const img = pick(el, 'product_image');
+        const link = pick(el, 'product_link');
+        products.push({
+            name: text(pick(el, 'product_name')),
+            price: text(pick(el, 'product_price')),
+            image: img ? (img.getAttribute('src') || img.getAttribute('data-src') || img.getAttribute('data-lazy-src') || '') : '',
+            link: link ? (link.getAttribute('href') || '') : '',
+            category: text(pick(el, 'product_category'))
+        });
+    }
+}
+const next = pick(document, 'next_page');
+const html = (includeHtml || !products.length) ? document.documentElement.outerHTML : '';
+return {
+    products: products,
+    next: next ? next.getAttribute('href') : null,
+    head: products.length ? '' : html.slice(0, headBytes),
+    html: includeHtml ? '<!DOCTYPE html>' + html : null
+};
+"""
+
+
+def products_from_browser_result(result: Dict, base_url: str) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Converte o resultado de IN_BROWSER_EXTRACTION_SCRIPT nos mesmos dicionários
+    de extract_products_from_soup
+    
+    Args:
+        result: Objeto devolvido por execute_script
+        base_url: URL base para construir URLs absolutas
+        
+    Returns:
+        Tupla (produtos com nome, URL absoluta da próxima página ou None)
+    """
+    products = []
+    for raw in result.get('products') or []:
+        product_info = build_product_info(
+            raw.get('name') or "", raw.get('price') or "", raw.get('image') or "",
+            raw.get('link') or "", raw.get('category') or "", base_url
+        )
+        if product_info.get('nome'):  # Só adiciona se tiver nome
+            products.append(product_info)
+    next_href = result.get('next')
+    next_url = build_absolute_url(base_url, next_href) if next_href else None
+    return products, next_url
+
+
+def extract_products_from_html(html_content, base_url: str,
+                               selectors: Dict = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Faz parse do HTML e extrai produtos e o link da próxima página
+    
+    Args:
+        html_content: HTML da página (str ou bytes)
+        base_url: URL base para construir URLs absolutas
+        selectors: Seletores CSS (padrão: SELECTORS do config.py)
+        
+    Returns:
+        Tupla (produtos com nome, URL absoluta da próxima página ou None)
+    """
+    soup = BeautifulSoup(html_content, 'lxml')
+    return extract_products_from_soup(soup, base_url, selectors)
 
 
 class WebScraper:
     """Classe principal para fazer scraping de produtos"""
     
-    def __init__(self, base_url: str = None):
-        self.base_url = base_url or BASE_URL
+    def __init__(self, base_url: str = None, api_source=None, site: 'SiteProfile' = None):
+        """
+        Args:
+            base_url: URL base do site (padrão: a do perfil)
+            api_source: Fonte de produtos via API (padrão: WooCommerceSource se o perfil usa a Store API)
+            site: Perfil do site (seletores, estratégia e ritmo; padrão: config.py)
+        """
+        self.site = site or SiteProfile.from_config()
+        self.base_url = base_url or self.site.base_url
+        self.selectors = self.site.selectors
         self.session = None
         self.products = []
         self.driver = None
+        self.proxy = None  # Proxy fixo do navegador (sessão presa a um único IP de saída)
+        self.profile = None  # Perfil persistente do navegador (vaga travada)
+        self.api_source = api_source
+        self.archive = None
+        self.network_capture = None
+        self.completeness = {}  # Cobertura da última coleta (ver scrape_categories)
+        if ARCHIVE_PAGES:
+            from src.page_archive import PageArchive
+            self.archive = PageArchive()
+        if self.api_source is None and self.site.use_store_api:
+            from src.woocommerce_api import WooCommerceSource
+            self.api_source = WooCommerceSource(self.base_url)
         
         # Inicializa Selenium se necessário
-        if USE_SELENIUM:
+        if self.site.use_selenium:
             self._init_selenium()
+            if SELENIUM_CAPTURE_XHR and self.driver and SELENIUM_DRIVER.lower() == "chrome":
+                from src.network_capture import NetworkCapture
+                self.network_capture = NetworkCapture(self.base_url, woocommerce_source=self.api_source,
+                                                      selectors=self.selectors)
+            if self.archive and self.driver and self.site.in_browser_extraction and not SELENIUM_ARCHIVE_PAGES:
+                logger.warning(
+                    f"ARCHIVE_PAGES ativo, mas as listagens de {self.site.name} são extraídas no navegador "
+                    "sem SELENIUM_ARCHIVE_PAGES: essas páginas não serão arquivadas nem entrarão no --reextract"
+                )
     
     def _init_selenium(self):
         """Inicializa driver do Selenium"""
+        # O Chrome não aceita usuário/senha em --proxy-server: só proxies abertos/por IP
+        pool = get_proxy_pool()
+        self.proxy = pool.acquire(exclude=self.proxy, without_credentials=True) if pool else None
+        if pool and not self.proxy:
+            logger.warning("Nenhum proxy sem credenciais disponível para o navegador. Usando conexão direta.")
+        elif self.proxy:
+            logger.info(f"Navegador usando o proxy {self.proxy.server}")
+        
+        # Perfil persistente: cookies, cache e service workers sobrevivem entre execuções
+        if SELENIUM_PERSISTENT_PROFILES and self.profile is None:
+            from src.browser_profiles import ProfileManager
+            self.profile = ProfileManager().acquire()
+        
         try:
             # Tenta usar undetected-chromedriver primeiro (mais eficaz contra anti-bot)
             if USE_UNDETECTED_CHROMEDRIVER and SELENIUM_DRIVER.lower() == "chrome":
@@ -45,6 +299,12 @@ class WebScraper:
                     options.add_argument('--no-sandbox')
                     options.add_argument('--disable-dev-shm-usage')
                     options.add_argument('--window-size=1920,1080')
+                    if self.proxy:
+                        options.add_argument(f'--proxy-server={self.proxy.server}')
+                    if SELENIUM_CAPTURE_XHR:
+                        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+                    if self.profile:
+                        options.add_argument(f'--user-data-dir={self.profile.path}')
                     
                     # Tenta inicializar com diferentes métodos
                     try:
@@ -93,6 +353,8 @@ class WebScraper:
                 options.add_experimental_option("excludeSwitches", ["enable-automation"])
                 options.add_experimental_option('useAutomationExtension', False)
                 options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+                if self.proxy:
+                    options.add_argument(f'--proxy-server={self.proxy.server}')
                 
                 # Prefs para parecer mais com navegador real
                 prefs = {
@@ -100,6 +362,11 @@ class WebScraper:
                     "profile.password_manager_enabled": False
                 }
                 options.add_experimental_option("prefs", prefs)
+                if SELENIUM_CAPTURE_XHR:
+                    # Registra os eventos de rede para a captura de respostas JSON
+                    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+                if self.profile:
+                    options.add_argument(f'--user-data-dir={self.profile.path}')
                 
                 try:
                     if USE_WEBDRIVER_MANAGER:
@@ -117,6 +384,19 @@ class WebScraper:
                 options = FirefoxOptions()
                 if SELENIUM_HEADLESS:
                     options.add_argument('--headless')
+                if self.profile:
+                    options.add_argument('-profile')
+                    options.add_argument(str(self.profile.path))
+                if self.proxy:
+                    parsed = urlparse(self.proxy.url)
+                    if parsed.scheme.startswith('socks'):
+                        options.set_preference('network.proxy.socks', parsed.hostname)
+                        options.set_preference('network.proxy.socks_port', parsed.port)
+                    else:
+                        for scheme in ('http', 'ssl'):
+                            options.set_preference(f'network.proxy.{scheme}', parsed.hostname)
+                            options.set_preference(f'network.proxy.{scheme}_port', parsed.port)
+                    options.set_preference('network.proxy.type', 1)
                 
                 try:
                     if USE_WEBDRIVER_MANAGER:
@@ -143,13 +423,36 @@ class WebScraper:
         except Exception as e:
             logger.error(f"Erro ao inicializar Selenium: {e}")
     
-    def _get_page_selenium(self, url: str) -> Optional[str]:
-        """Obtém HTML usando Selenium"""
+    def _open_page_selenium(self, url: str) -> Optional[float]:
+        """
+        Abre a URL no navegador e aguarda o carregamento
+        
+        Returns:
+            Tempo de carregamento em segundos ou None se a página não foi aberta
+        """
         if not self.driver:
             logger.error("Driver Selenium não inicializado")
             return None
         
+        # Proxy do navegador em quarentena: reinicia o navegador com outro proxy
+        if self.proxy and not self.proxy.available:
+            self._restart_selenium()
+            if not self.driver:
+                return None
+        scope = self._proxy_scope()
+        
+        # Orçamento antes do circuit breaker (como em safe_request): a vaga de teste
+        # do circuito semiaberto só é concedida a uma requisição que vai sair
+        if not get_run_budget().try_request():
+            logger.debug(f"Orçamento da execução esgotado, pulando {url}")
+            return None
+        # Host bloqueado: falha imediatamente em vez de abrir a página
+        if not circuit_breakers.allow(url, scope):
+            logger.debug(f"Circuito aberto, pulando {url}")
+            return None
+        
         try:
+            started = time.monotonic()
             # Executa script para remover indicadores de automação
             self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
                 'source': '''
@@ -166,6 +469,7 @@ class WebScraper:
             })
             
             self.driver.get(url)
+            load_time = time.monotonic() - started
             
             # Aguarda o carregamento completo da página
             time.sleep(5)  # Aguarda JavaScript carregar
@@ -183,67 +487,163 @@ class WebScraper:
             except:
                 pass  # Se não conseguir esperar, continua mesmo assim
             
-            # Verifica se a página carregou corretamente (não é página de erro)
+            return load_time
+        except Exception as e:
+            self._selenium_failed(url, e)
+            return None
+    
+    def _proxy_scope(self) -> Optional[str]:
+        """Escopo do circuit breaker do navegador (o proxy em uso)"""
+        return self.proxy.server if self.proxy else None
+    
+    def _selenium_failed(self, url: str, error: Exception):
+        """Registra um erro de navegação que não indica bloqueio"""
+        circuit_breakers.get(url, self._proxy_scope()).release_probe()
+        self._report_proxy(ok=False)
+        logger.error(f"Erro ao acessar {url} com Selenium: {error}")
+    
+    def _check_block_selenium(self, url: str, content, load_time: float) -> bool:
+        """
+        Verifica se a página aberta é de bloqueio e registra o resultado
+        
+        Returns:
+            True se a página foi bloqueada
+        """
+        block_reason = detect_block(content)
+        if block_reason:
+            # Bloqueio não se resolve esperando: registra e segue para a próxima URL
+            circuit_breakers.record_block(url, block_reason, self._proxy_scope())
+            self._report_proxy(load_time, blocked=True)
+            logger.error(f"❌ Acesso bloqueado ({block_reason}) para {url}")
+            return True
+        circuit_breakers.record_success(url, self._proxy_scope())
+        self._report_proxy(load_time)
+        return False
+    
+    def _get_page_selenium(self, url: str) -> Optional[str]:
+        """Obtém HTML usando Selenium"""
+        load_time = self._open_page_selenium(url)
+        if load_time is None:
+            return None
+        try:
+            # Verifica se a página carregou corretamente (não é página de bloqueio)
             page_source = self.driver.page_source
-            
-            # Se ainda retornar 403, tenta mais uma vez com delay maior
-            if "403" in page_source and "Forbidden" in page_source:
-                logger.warning("Página ainda retorna 403. Tentando aguardar mais tempo...")
-                time.sleep(15)  # Aguarda mais tempo
-                
-                # Tenta recarregar a página
-                try:
-                    self.driver.refresh()
-                    time.sleep(10)
-                    page_source = self.driver.page_source
-                except:
-                    pass
-                
-                # Se ainda estiver bloqueado, retorna None para pular esta URL
-                if "403" in page_source and "Forbidden" in page_source:
-                    logger.error(f"❌ Acesso bloqueado (403) para {url}")
-                    logger.info("💡 O site está bloqueando acesso automatizado. Possíveis soluções:")
-                    logger.info("   1. Use navegador manual e salve o HTML")
-                    logger.info("   2. Aguarde alguns minutos e tente novamente")
-                    logger.info("   3. Verifique se precisa fazer login no site")
-                    return None  # Retorna None para pular esta URL
-            
-            return page_source
         except Exception as e:
-            logger.error(f"Erro ao acessar {url} com Selenium: {e}")
+            self._selenium_failed(url, e)
+            return None
+        if self._check_block_selenium(url, page_source, load_time):
             return None
+        return page_source
+    
+    def _extract_page_selenium(self, url: str) -> Optional[Tuple[List[Dict], Optional[str]]]:
+        """
+        Abre a página e extrai os produtos dentro do navegador
         
-    def get_page(self, url: str) -> Optional[BeautifulSoup]:
+        Só os campos de cada produto e o link da próxima página atravessam o
+        WebDriver. Com SELENIUM_ARCHIVE_PAGES, o HTML para o arquivo de páginas
+        volta na mesma chamada de execute_script (sem o page_source).
+        
+        Returns:
+            Tupla (produtos, URL da próxima página) ou None se a página falhou
         """
-        Obtém e faz parse de uma página HTML
+        load_time = self._open_page_selenium(url)
+        if load_time is None:
+            return None
+        try:
+            archive = self.archive if SELENIUM_ARCHIVE_PAGES else None
+            result = self.driver.execute_script(IN_BROWSER_EXTRACTION_SCRIPT, self.selectors, BLOCK_SCAN_BYTES,
+                                                archive is not None)
+        except Exception as e:
+            self._selenium_failed(url, e)
+            return None
+        
+        # Página sem produtos: verifica o início do documento em busca de bloqueio
+        if not result.get('products') and self._check_block_selenium(url, result.get('head', ''), load_time):
+            return None
+        if result.get('products'):
+            circuit_breakers.record_success(url, self._proxy_scope())
+            self._report_proxy(load_time)
+        
+        if archive and result.get('html'):
+            try:
+                archive.store(url, result['html'])
+            except Exception as e:
+                logger.warning(f"Erro ao arquivar página {url}: {e}")
+        
+        return products_from_browser_result(result, self.base_url)
+    
+    def _report_proxy(self, latency: Optional[float] = None, ok: bool = True, blocked: bool = False):
+        """Registra o resultado da navegação no pool de proxies"""
+        pool = get_proxy_pool()
+        if self.proxy and pool:
+            pool.report(self.proxy, latency, ok=ok, blocked=blocked)
+    
+    def _restart_selenium(self):
+        """Fecha o navegador e abre outro com um novo proxy"""
+        logger.info(f"Proxy {self.proxy.server} indisponível, reiniciando navegador")
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+        self._init_selenium()
+    
+    def get_page_content(self, url: str) -> Optional[bytes]:
+        """
+        Obtém o HTML de uma página (sem parse) e arquiva
         
         Args:
             url: URL da página
             
         Returns:
-            BeautifulSoup object ou None
+            HTML da página ou None
         """
         url = build_absolute_url(self.base_url, url)
         
         html_content = None
         
-        if USE_SELENIUM and self.driver:
+        if self.site.use_selenium and self.driver:
             # Usa Selenium
             html_content = self._get_page_selenium(url)
         else:
-            # Usa requisição HTTP normal
-            response = safe_request(url)
+            # Usa requisição HTTP normal (URLs iguais em andamento compartilham a requisição;
+            # páginas de bloqueio já são descartadas e registradas por fetch)
+            response = fetch(url)
             if response:
                 html_content = response.content
             else:
                 # Se falhar e Selenium não estiver habilitado, sugere usar Selenium
-                if not USE_SELENIUM:
+                if not self.site.use_selenium and not get_run_budget().exhausted:
                     logger.warning(f"Falha ao acessar {url}. O site pode requerer JavaScript.")
                     logger.info("Considere habilitar Selenium em config.py: USE_SELENIUM = True")
         
         if not html_content:
             return None
         
+        # Arquiva a página para permitir reextração offline
+        if self.archive:
+            try:
+                self.archive.store(url, html_content)
+            except Exception as e:
+                logger.warning(f"Erro ao arquivar página {url}: {e}")
+        
+        return html_content
+    
+    def get_page(self, url: str) -> Optional[BeautifulSoup]:
+        """
+        Obtém e faz parse de uma página HTML
+        
+        Args:
+            url: URL da página
+            
+        Returns:
+            BeautifulSoup object ou None
+        """
+        html_content = self.get_page_content(url)
+        if not html_content:
+            return None
+        
         try:
             soup = BeautifulSoup(html_content, 'lxml')
             return soup
@@ -251,15 +651,67 @@ class WebScraper:
             logger.error(f"Erro ao fazer parse da página {url}: {e}")
             return None
     
-    def __del__(self):
-        """Fecha driver do Selenium ao destruir objeto"""
+    def warm_up(self, urls: List[str] = None) -> bool:
+        """
+        Aquece o navegador antes da coleta
+        
+        Visita as páginas de BROWSER_WARMUP_URLS e rola cada uma, para que os
+        cookies anti-bot, o cache HTTP e os scripts compilados já existam no
+        perfil quando as páginas de categoria forem abertas. Perfis aquecidos
+        para este site há menos de BROWSER_WARMUP_MAX_AGE_HOURS pulam esta etapa.
+        
+        Returns:
+            True se o navegador está aquecido
+        """
+        if not self.driver:
+            return False
+        if self.profile and self.profile.is_warm(self.base_url, BROWSER_WARMUP_MAX_AGE_HOURS * 3600):
+            logger.info("Perfil do navegador já aquecido, pulando aquecimento")
+            return True
+        
+        warmed = True
+        for url in urls or BROWSER_WARMUP_URLS:
+            url = build_absolute_url(self.base_url, url)
+            logger.info(f"Aquecendo navegador: {url}")
+            load_time = self._open_page_selenium(url)
+            if load_time is None:
+                warmed = False
+                continue
+            try:
+                for fraction in (0.3, 0.6, 1.0):
+                    self.driver.execute_script(f"window.scrollTo(0, document.body.scrollHeight * {fraction});")
+                    time.sleep(1)
+                head = self.driver.execute_script(
+                    "return document.documentElement.outerHTML.slice(0, arguments[0]);", BLOCK_SCAN_BYTES
+                )
+            except Exception as e:
+                self._selenium_failed(url, e)
+                warmed = False
+                continue
+            if self._check_block_selenium(url, head, load_time):
+                warmed = False
+        
+        if warmed and self.profile:
+            self.profile.mark_warm(self.base_url)
+        return warmed
+    
+    def close(self):
+        """Fecha o navegador e libera o perfil persistente"""
         if self.driver:
             try:
                 self.driver.quit()
             except:
                 pass
+            self.driver = None
+        if self.profile:
+            self.profile.release()
+            self.profile = None
+    
+    def __del__(self):
+        """Fecha driver do Selenium ao destruir objeto"""
+        self.close()
     
-    def extract_product_info(self, product_element, base_url: str = "") -> Dict:
+    def extract_product_info(self, product_element, base_url: str = "") -> Product:
         """
         Extrai informações de um produto de um elemento HTML
         
@@ -268,62 +720,11 @@ class WebScraper:
             base_url: URL base para construir URLs absolutas
             
         Returns:
-            Dicionário com informações do produto
+            Product com informações do produto
         """
-        base_url = base_url or self.base_url
-        
-        # Extrai informações usando seletores
-        selectors = SELECTORS
-        
-        try:
-            # Nome do produto
-            name_elem = product_element.select_one(selectors.get('product_name', '')) if selectors.get('product_name') else None
-            name = clean_text(name_elem.get_text()) if name_elem else ""
-            
-            # Preço
-            price_elem = product_element.select_one(selectors.get('product_price', '')) if selectors.get('product_price') else None
-            price_text = clean_text(price_elem.get_text()) if price_elem else ""
-            price = extract_price(price_text)
-            
-            # Imagem
-            image_elem = product_element.select_one(selectors.get('product_image', '')) if selectors.get('product_image') else None
-            image_url = ""
-            if image_elem:
-                image_url = image_elem.get('src') or image_elem.get('data-src') or image_elem.get('data-lazy-src') or ""
-            image_url = build_absolute_url(base_url, image_url)
-            
-            # Link do produto
-            link_elem = product_element.select_one(selectors.get('product_link', '')) if selectors.get('product_link') else None
-            link = ""
-            if link_elem:
-                link = link_elem.get('href') or ""
-            link = build_absolute_url(base_url, link)
-            
-            # Categoria
-            category_elem = product_element.select_one(selectors.get('product_category', '')) if selectors.get('product_category') else None
-            category = clean_text(category_elem.get_text()) if category_elem else "Sem_Categoria"
-            category = sanitize_category(category)
-            
-            # Gera ID único (pode ser melhorado)
-            product_id = f"{category}_{name}" if name else f"produto_{time.time()}"
-            product_id = product_id.replace(' ', '_')[:100]
-            
-            product_info = {
-                'id': product_id,
-                'nome': name,
-                'categoria': category,
-                'preco': price,
-                'preco_original': price_text,  # Mantém formato original
-                'imagem_url': image_url,
-                'link': link,
-                'data_coleta': time.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            return product_info
-            
-        except Exception as e:
-            logger.error(f"Erro ao extrair informações do produto: {e}")
-            return {}
+        product = parse_product_element(product_element, base_url or self.base_url, self.selectors)
+        normalize_products([product])
+        return product
     
     def scrape_category_page(self, category_url: str) -> List[Dict]:
         """
@@ -335,37 +736,51 @@ class WebScraper:
         Returns:
             Lista de produtos encontrados
         """
-        logger.info(f"Scraping página: {category_url}")
-        
-        soup = self.get_page(category_url)
-        if not soup:
-            return []
+        products, _ = self._scrape_page(category_url)
+        return normalize_products(products)
+    
+    def _scrape_page(self, category_url: str) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Faz scraping de uma página de categoria (uma única requisição)
         
-        products = []
+        Returns:
+            Tupla (produtos encontrados, URL da próxima página ou None)
+        """
+        logger.info(f"Scraping página: {category_url}")
         
-        # Encontra containers de produtos
-        container_selector = SELECTORS.get('product_container', '')
-        if not container_selector:
+        if not self.selectors.get('product_container', ''):
             logger.warning("Seletor de container de produtos não configurado!")
-            return []
+            return [], None
         
-        product_containers = soup.select(container_selector)
-        logger.info(f"Encontrados {len(product_containers)} produtos")
-        
-        for container in tqdm(product_containers, desc="Extraindo produtos"):
+        if self.site.use_selenium and self.driver and self.site.in_browser_extraction:
+            # Extrai no navegador: evita transferir e reprocessar o HTML inteiro
+            result = self._extract_page_selenium(build_absolute_url(self.base_url, category_url))
+            if result is None:
+                return [], None
+            products, next_url = result
+        else:
+            html_content = self.get_page_content(category_url)
+            if not html_content:
+                return [], None
             try:
-                product_info = self.extract_product_info(container, self.base_url)
-                if product_info and product_info.get('nome'):  # Só adiciona se tiver nome
-                    products.append(product_info)
+                parse_pool = get_parse_pool()
+                if parse_pool:
+                    # Parse em outro processo, fora do GIL das threads de download
+                    products, next_url = parse_pool.parse('listing', html_content, self.base_url, self.selectors)
+                else:
+                    products, next_url = extract_products_from_html(html_content, self.base_url, self.selectors)
             except Exception as e:
-                logger.error(f"Erro ao processar produto: {e}")
-                continue
+                logger.error(f"Erro ao fazer parse da página {category_url}: {e}")
+                return [], None
+        self.site.prefix_ids(products)
+        logger.info(f"Encontrados {len(products)} produtos")
+        self.completeness['paginas'] = self.completeness.get('paginas', 0) + 1
         
         # Delay entre requisições
-        if DELAY_BETWEEN_REQUESTS > 0:
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+        if self.site.delay_between_requests > 0:
+            time.sleep(self.site.delay_between_requests)
         
-        return products
+        return products, next_url
     
     def scrape_multiple_pages(self, category_url: str, max_pages: int = 1) -> List[Dict]:
         """
@@ -381,37 +796,47 @@ class WebScraper:
         all_products = []
         current_url = category_url
         page = 1
+        budget = get_run_budget()
         
-        while page <= max_pages:
+        while page <= max_pages and not budget.exhausted:
             logger.info(f"Processando página {page}/{max_pages}")
             
-            products = self.scrape_category_page(current_url)
+            capture = self.network_capture if page == 1 and max_pages > 1 else None
+            if capture:
+                capture.flush(self.driver)
+            
+            # A mesma página fornece os produtos e o link para a próxima
+            products, next_url = self._scrape_page(current_url)
             all_products.extend(products)
             
-            # Tenta encontrar link para próxima página
-            if page < max_pages:
-                soup = self.get_page(current_url)
-                if soup:
-                    next_selector = SELECTORS.get('next_page', '')
-                    if next_selector:
-                        next_link = soup.select_one(next_selector)
-                        if next_link:
-                            next_href = next_link.get('href')
-                            if next_href:
-                                current_url = build_absolute_url(self.base_url, next_href)
-                                page += 1
-                                continue
+            # Endpoint JSON da própria página: busca o restante da categoria direto nele
+            if capture and products:
+                replayed = capture.replay_category(self.driver, capture.collect(self.driver), max_pages - 1,
+                                                   products)
+                # Sem endpoint utilizável (ou se ele falhou), segue pela paginação do HTML
+                if replayed is not None:
+                    all_products.extend(self.site.prefix_ids(replayed))
+                    break
             
             # Se não encontrou próxima página, para
-            break
+            if page >= max_pages or not next_url:
+                break
+            
+            current_url = next_url
+            page += 1
         
         logger.info(f"Total de produtos coletados: {len(all_products)}")
-        return all_products
+        return normalize_products(all_products)
     
     def scrape_categories(self, category_urls: List[str], max_pages_per_category: int = 1) -> List[Dict]:
         """
         Faz scraping de múltiplas categorias
         
+        Com orçamento da execução limitado (--time-budget/--max-requests), a
+        primeira página de todas as categorias vem antes das páginas seguintes,
+        que são percorridas em rodízio; assim uma execução que para no meio
+        ainda cobre todas as categorias. A cobertura fica em self.completeness.
+        
         Args:
             category_urls: Lista de URLs de categorias
             max_pages_per_category: Número máximo de páginas por categoria
@@ -420,25 +845,72 @@ class WebScraper:
             Lista de todos os produtos encontrados
         """
         all_products = []
+        dedup = Deduplicator()
+        budget = get_run_budget()
+        self.completeness = {'categorias': len(category_urls), 'categorias_completas': 0, 'paginas': 0}
+        # Categorias com páginas ainda por buscar: (URL da próxima página, número da página)
+        frontier = []
         
-        for category_url in category_urls:
-            logger.info(f"Processando categoria: {category_url}")
-            products = self.scrape_multiple_pages(category_url, max_pages_per_category)
-            all_products.extend(products)
+        try:
+            for category_url in category_urls:
+                if budget.exhausted:
+                    break
+                logger.info(f"Processando categoria: {category_url}")
+                
+                # Tenta a API do WooCommerce primeiro; se não atender, usa o HTML
+                products = None
+                next_url = None
+                if self.api_source:
+                    products = self.api_source.scrape_category(category_url, max_pages_per_category)
+                    if products is not None:
+                        self.site.prefix_ids(products)
+                if products is None and budget.limited:
+                    products, next_url = self._scrape_page(category_url)
+                elif products is None:
+                    products = self.scrape_multiple_pages(category_url, max_pages_per_category)
+                
+                if next_url and max_pages_per_category > 1:
+                    frontier.append((next_url, 2))
+                elif not budget.exhausted:
+                    self.completeness['categorias_completas'] += 1
+                
+                # Remove duplicatas à medida que as categorias chegam (ID e URL canônica)
+                all_products.extend(self._unique_products(products, dedup))
+                
+                # Delay entre categorias
+                if self.site.delay_between_requests > 0:
+                    time.sleep(self.site.delay_between_requests * 2)
             
-            # Delay entre categorias
-            if DELAY_BETWEEN_REQUESTS > 0:
-                time.sleep(DELAY_BETWEEN_REQUESTS * 2)
+            # Páginas seguintes em rodízio entre as categorias
+            while frontier and not budget.exhausted:
+                page_url, page = frontier.pop(0)
+                logger.info(f"Processando página {page}/{max_pages_per_category}")
+                products, next_url = self._scrape_page(page_url)
+                all_products.extend(self._unique_products(products, dedup))
+                if next_url and page < max_pages_per_category:
+                    frontier.append((next_url, page + 1))
+                elif not budget.exhausted:
+                    self.completeness['categorias_completas'] += 1
+        finally:
+            dedup.close()
         
-        # Remove duplicatas baseado no ID
+        # Preços e categorias normalizados de uma vez para todo o lote
+        normalize_products(all_products)
+        
+        self.completeness['produtos'] = len(all_products)
+        logger.info(f"Total de produtos únicos coletados: {len(all_products)}")
+        return all_products
+    
+    def _unique_products(self, products: List[Dict], dedup: Deduplicator) -> List[Dict]:
+        """Filtra produtos já vistos pelo ID ou pela URL canônica do produto"""
         unique_products = []
-        seen_ids = set()
-        for product in all_products:
+        for product in products:
             product_id = product.get('id')
-            if product_id and product_id not in seen_ids:
-                seen_ids.add(product_id)
+            if not product_id:
+                continue
+            new_id = dedup.is_new(product_id, 'id')
+            new_link = dedup.is_new(product['link'], 'url') if product.get('link') else True
+            if new_id and new_link:
                 unique_products.append(product)
-        
-        logger.info(f"Total de produtos únicos coletados: {len(unique_products)}")
         return unique_products
 
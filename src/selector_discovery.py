@@ -0,0 +1,433 @@
+"""
+Descoberta de seletores em lote: avalia seletores candidatos sobre muitas
+páginas salvas (arquivo de páginas, page_inspection.html) em paralelo
+"""
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup
+from loguru import logger
+from lxml import html as lxml_html
+
+from src.page_archive import read_record
+
+# Fonte de uma página: caminho de arquivo HTML ou registro do arquivo de páginas
+# (url, data da coleta, segmento, offset, tamanho)
+PageSource = Union[str, Tuple[str, str, str, int, int]]
+
+FIELDS = ('product_name', 'product_price', 'product_image', 'product_link', 'product_category')
+MIN_REPEAT = 2  # Ocorrências mínimas por página para um container candidato
+FIELD_CONTAINERS = 3  # Containers candidatos de cada lote com campos avaliados
+
+CLASS_PATTERN = re.compile(r'^-?[A-Za-z_][\w-]*$')  # Classes usáveis sem escape em CSS
+CURRENCY_PATTERN = re.compile(r'(R\$|US\$|\$|€|£)\s*\d')
+PRICE_PATTERN = re.compile(r'(?:R\$|US\$|\$|€|£)\s*\d[\d.,]*')
+BARE_TAGS = {'li', 'article'}  # Tags aceitas sem classe como container
+BARE_FIELD_TAGS = {'h1', 'h2', 'h3', 'h4', 'img', 'a'}  # Tags aceitas sem classe como campo
+NEXT_TEXTS = {'›', '»', '>', 'próxima', 'próximo', 'proxima', 'proximo', 'next'}
+
+
+def _load_page(source: PageSource) -> bytes:
+    if isinstance(source, (tuple, list)):
+        _, _, segment, offset, length = source
+        return read_record(segment, offset, length)[1]
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def _keys(element, bare_tags) -> List[str]:
+    """Seletores simples (tag.classe) que casam com o elemento"""
+    tag = element.tag
+    keys = [f"{tag}.{cls}" for cls in (element.get('class') or '').split() if CLASS_PATTERN.match(cls)]
+    if tag in bare_tags:
+        keys.append(tag)
+    return keys
+
+
+def _text(element) -> str:
+    return ' '.join(element.text_content().split())
+
+
+def _field_checks(element) -> Dict[str, Optional[str]]:
+    """
+    Campos que o elemento pode representar e o valor extraído de cada um
+
+    O valor é usado para medir consistência (nomes e links repetidos entre
+    produtos indicam um seletor de botão, não do produto).
+    """
+    checks = {}
+    tag = element.tag
+    if tag == 'img':
+        src = element.get('src') or element.get('data-src') or element.get('data-lazy-src')
+        if src:
+            checks['product_image'] = src
+        return checks
+    text = _text(element)
+    if tag == 'a':
+        href = element.get('href') or ''
+        if href and not href.startswith(('#', 'javascript:')):
+            # Links que envolvem a imagem ou o título são os do produto (não botões)
+            rich = element.find('.//img') is not None or any(
+                element.find(f'.//{heading}') is not None for heading in ('h2', 'h3', 'h4')
+            )
+            checks['product_link'] = f"{'+' if rich else '-'}{href}"
+    prices = PRICE_PATTERN.findall(text)
+    if len(prices) == 1 and len(text) <= 40:
+        checks['product_price'] = text
+    elif not prices and 3 <= len(text) <= 200 and any(ch.isalpha() for ch in text):
+        checks['product_name'] = text
+        classes = (element.get('class') or '').lower()
+        if len(text) <= 80 and any(word in classes for word in ('cat', 'breadcrumb', 'tag')):
+            checks['product_category'] = text
+    return checks
+
+
+def _analyze_pages(sources: List[PageSource]) -> Dict:
+    """
+    Avalia os candidatos de um lote de páginas (executado em processo separado)
+
+    Cada página é percorrida uma única vez para agrupar os elementos por
+    seletor candidato; os campos são avaliados dentro dos melhores
+    containers do lote.
+    """
+    result = {
+        'pages': 0, 'errors': 0,
+        'containers': defaultdict(lambda: defaultdict(int)),
+        'fields': {},
+        'next_page': defaultdict(int),
+    }
+    pages = []
+    for source in sources:
+        try:
+            root = lxml_html.fromstring(_load_page(source))
+        except Exception:
+            result['errors'] += 1
+            continue
+        result['pages'] += 1
+        groups = defaultdict(list)
+        next_keys = set()
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue  # Comentários e instruções de processamento
+            for key in _keys(element, BARE_TAGS):
+                groups[key].append(element)
+            if element.tag == 'a' and element.get('href'):
+                classes = (element.get('class') or '').lower()
+                if element.get('rel') == 'next':
+                    next_keys.add('a[rel="next"]')
+                if 'next' in classes or 'proxim' in classes or _text(element).lower() in NEXT_TEXTS:
+                    next_keys.update(key for key in _keys(element, ()) if 'next' in key or 'proxim' in key)
+        for key in next_keys:
+            result['next_page'][key] += 1
+
+        page_groups = {}
+        for key, elements in groups.items():
+            if len(elements) < MIN_REPEAT:
+                continue
+            stats = result['containers'][key]
+            stats['pages'] += 1
+            for element in elements:
+                text = _text(element)
+                prices = len(PRICE_PATTERN.findall(text))
+                has_link = element.find('.//a[@href]') is not None or (element.tag == 'a' and element.get('href'))
+                has_name = any(ch.isalpha() for ch in CURRENCY_PATTERN.sub('', text))
+                stats['count'] += 1
+                stats['full'] += bool(prices and has_link and has_name)
+                stats['single'] += prices <= 3
+                stats['image'] += element.find('.//img') is not None
+                stats['size'] += sum(1 for _ in element.iter())
+            page_groups[key] = elements
+        pages.append(page_groups)
+
+    # Campos dentro dos melhores containers deste lote
+    ranked = sorted(result['containers'].items(), key=lambda item: _container_order(*item, result['pages']))
+    for key, _ in ranked[:FIELD_CONTAINERS]:
+        fields = {'total': 0, 'candidates': defaultdict(lambda: defaultdict(list)), 'size': defaultdict(lambda: [0, 0]),
+                  'unique': defaultdict(lambda: defaultdict(int))}
+        for page_groups in pages:
+            # Valores distintos contados por página: cópias da mesma página no arquivo
+            # não fazem os valores parecerem repetidos
+            page_values = defaultdict(set)
+            for container in page_groups.get(key, ()):
+                fields['total'] += 1
+                first = {}
+                for element in container.iterdescendants():
+                    if not isinstance(element.tag, str):
+                        continue
+                    for field_key in _keys(element, BARE_FIELD_TAGS):
+                        first.setdefault(field_key, element)
+                for field_key, element in first.items():
+                    checks = _field_checks(element)
+                    if checks:
+                        # Descendentes do elemento: no empate, o mais interno (mais específico) vence
+                        size = fields['size'][field_key]
+                        size[0] += sum(1 for _ in element.iter())
+                        size[1] += 1
+                    for field, value in checks.items():
+                        fields['candidates'][field][field_key].append(value)
+                        page_values[field, field_key].add(value)
+            for (field, field_key), values in page_values.items():
+                fields['unique'][field][field_key] += len(values)
+        result['fields'][key] = {
+            'total': fields['total'],
+            'candidates': {field: dict(keys) for field, keys in fields['candidates'].items()},
+            'size': dict(fields['size']),
+            'unique': {field: dict(keys) for field, keys in fields['unique'].items()},
+        }
+
+    result['containers'] = {key: dict(stats) for key, stats in result['containers'].items()}
+    result['next_page'] = dict(result['next_page'])
+    return result
+
+
+def _container_order(key: str, stats: Dict, pages: int) -> Tuple[float, float, bool, int]:
+    """
+    Chave de ordenação dos containers: maior nota e, no empate, o elemento mais
+    externo (mais descendentes), seletor com classe antes da tag sozinha e o
+    seletor mais curto
+    """
+    return -round(_container_score(stats, pages), 3), -stats['size'] / stats['count'], '.' not in key, len(key)
+
+
+def _container_score(stats: Dict, pages: int) -> float:
+    """Cobertura (produto completo) x pureza (um produto por elemento) x consistência entre páginas"""
+    if not stats['count'] or not pages:
+        return 0.0
+    coverage = stats['full'] / stats['count']
+    purity = stats['single'] / stats['count']
+    images = stats['image'] / stats['count']
+    consistency = stats['pages'] / pages
+    return coverage * purity * (0.8 + 0.2 * images) * consistency
+
+
+def _merge(results: Iterable[Dict]) -> Dict:
+    merged = {'pages': 0, 'errors': 0, 'containers': {}, 'fields': {}, 'next_page': defaultdict(int)}
+    for result in results:
+        merged['pages'] += result['pages']
+        merged['errors'] += result['errors']
+        for key, stats in result['containers'].items():
+            target = merged['containers'].setdefault(key, defaultdict(int))
+            for name, value in stats.items():
+                target[name] += value
+        for key, fields in result['fields'].items():
+            target = merged['fields'].setdefault(key, {'total': 0, 'candidates': {}, 'size': {}, 'unique': {}})
+            target['total'] += fields['total']
+            for field_key, (size, count) in fields['size'].items():
+                total = target['size'].setdefault(field_key, [0, 0])
+                total[0] += size
+                total[1] += count
+            for field, counts in fields['unique'].items():
+                for field_key, count in counts.items():
+                    unique = target['unique'].setdefault(field, {})
+                    unique[field_key] = unique.get(field_key, 0) + count
+            for field, candidates in fields['candidates'].items():
+                for field_key, values in candidates.items():
+                    target['candidates'].setdefault(field, {}).setdefault(field_key, []).extend(values)
+        for key, count in result['next_page'].items():
+            merged['next_page'][key] += count
+    return merged
+
+
+def _field_score(field: str, values: List[str], total: int, unique: int) -> Tuple[float, float, float]:
+    """
+    Pontua um seletor de campo
+
+    Args:
+        field: Chave do campo (product_name, ...)
+        values: Valores extraídos em todas as páginas
+        total: Containers avaliados
+        unique: Soma, por página, dos valores distintos
+
+    Returns:
+        Tupla (nota, cobertura, consistência)
+    """
+    coverage = len(values) / total if total else 0.0
+    if field in ('product_name', 'product_link', 'product_image'):
+        # Valores do produto variam entre produtos da página; textos de botão se repetem
+        consistency = unique / len(values) if values else 0.0
+    else:
+        consistency = 1.0
+    score = coverage * consistency
+    if field == 'product_link' and values:
+        # Link que envolve imagem/título é o do produto (botões de compra não)
+        score *= 0.5 + 0.5 * sum(value.startswith('+') for value in values) / len(values)
+    return score, coverage, consistency
+
+
+def discover_selectors(sources: List[PageSource], workers: Optional[int] = None,
+                       chunk_size: int = 16) -> Dict:
+    """
+    Avalia os seletores candidatos em todas as páginas, em paralelo
+
+    Args:
+        sources: Páginas (caminhos de arquivo ou registros do arquivo de páginas)
+        workers: Número de processos (padrão: número de CPUs)
+        chunk_size: Páginas por tarefa enviada aos processos
+
+    Returns:
+        Dicionário com 'pages', 'errors', 'containers' (ranking), 'fields'
+        (ranking por campo para o melhor container), 'next_page' (ranking) e
+        'selectors' (melhor seletor de cada chave de SELECTORS)
+    """
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(chunks)))
+    logger.info(f"Avaliando seletores em {len(sources)} página(s) com {workers} processo(s)...")
+    if workers == 1:
+        merged = _merge(map(_analyze_pages, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            merged = _merge(executor.map(_analyze_pages, chunks))
+
+    pages = merged['pages']
+    containers = sorted(
+        ((key, _container_score(stats, pages), stats) for key, stats in merged['containers'].items()),
+        key=lambda item: _container_order(item[0], item[2], pages),
+    )
+    containers = [
+        {'selector': key, 'score': score, 'per_page': stats['count'] / max(1, stats['pages']),
+         'coverage': stats['full'] / stats['count'], 'consistency': stats['pages'] / pages if pages else 0.0}
+        for key, score, stats in containers if score > 0
+    ]
+
+    selectors = {}
+    fields = {}
+    if containers:
+        best = containers[0]['selector']
+        selectors['product_container'] = best
+        field_stats = merged['fields'].get(best, {'total': 0, 'candidates': {}, 'size': {}, 'unique': {}})
+        for field in FIELDS:
+            ranking = []
+            for key, values in field_stats['candidates'].get(field, {}).items():
+                unique = field_stats['unique'].get(field, {}).get(key, 0)
+                score, coverage, consistency = _field_score(field, values, field_stats['total'], unique)
+                size, count = field_stats['size'].get(key, (0, 0))
+                ranking.append({'selector': key, 'score': score, 'coverage': coverage, 'consistency': consistency,
+                                'size': size / count if count else 0.0})
+            # Empate: o elemento mais interno (menos descendentes; ex.: o valor do preço, não o
+            # link que o envolve), depois seletor com classe antes da tag sozinha e, no mesmo
+            # elemento, a classe mais descritiva (mais longa)
+            ranking.sort(key=lambda item: (-round(item['score'], 3), item['size'], '.' not in item['selector'],
+                                           -len(item['selector']), item['selector']))
+            fields[field] = ranking
+            if ranking and ranking[0]['score'] >= 0.5:
+                selectors[field] = ranking[0]['selector']
+
+    next_page = sorted(
+        ({'selector': key, 'pages': count} for key, count in merged['next_page'].items()),
+        key=lambda item: (-item['pages'], item['selector']),
+    )
+    if next_page:
+        selectors['next_page'] = next_page[0]['selector']
+
+    return {
+        'pages': pages, 'errors': merged['errors'], 'containers': containers,
+        'fields': fields, 'next_page': next_page, 'selectors': selectors,
+    }
+
+
+def _time_selectors(args: Tuple[List[PageSource], Dict]) -> Tuple[Dict[str, float], int, int]:
+    """
+    Mede o tempo de cada seletor como o scraper usa (executado em processo separado)
+
+    Returns:
+        Tupla (segundos por chave de seletor, páginas, produtos encontrados)
+    """
+    sources, selectors = args
+    elapsed = defaultdict(float)
+    pages = products = 0
+    for source in sources:
+        try:
+            soup = BeautifulSoup(_load_page(source), 'lxml')
+        except Exception:
+            continue
+        pages += 1
+        start = time.perf_counter()
+        containers = soup.select(selectors['product_container'])
+        elapsed['product_container'] += time.perf_counter() - start
+        products += len(containers)
+        for field in FIELDS:
+            selector = selectors.get(field)
+            if not selector:
+                continue
+            start = time.perf_counter()
+            for container in containers:
+                container.select_one(selector)
+            elapsed[field] += time.perf_counter() - start
+        if selectors.get('next_page'):
+            start = time.perf_counter()
+            soup.select_one(selectors['next_page'])
+            elapsed['next_page'] += time.perf_counter() - start
+    return dict(elapsed), pages, products
+
+
+def time_selectors(sources: List[PageSource], selectors: Dict, workers: Optional[int] = None,
+                   chunk_size: int = 16) -> Dict:
+    """
+    Mede a velocidade de extração de cada seletor (BeautifulSoup, como no scraper)
+
+    Returns:
+        Dicionário com 'per_page_us' (microssegundos por página de cada chave),
+        'products_per_page' e 'pages'
+    """
+    if not selectors.get('product_container'):
+        return {'per_page_us': {}, 'products_per_page': 0.0, 'pages': 0}
+    chunks = [(sources[i:i + chunk_size], selectors) for i in range(0, len(sources), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(chunks)))
+    if workers == 1:
+        results = list(map(_time_selectors, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_time_selectors, chunks))
+    elapsed = defaultdict(float)
+    pages = products = 0
+    for chunk_elapsed, chunk_pages, chunk_products in results:
+        pages += chunk_pages
+        products += chunk_products
+        for key, seconds in chunk_elapsed.items():
+            elapsed[key] += seconds
+    return {
+        'per_page_us': {key: seconds / pages * 1e6 for key, seconds in elapsed.items()} if pages else {},
+        'products_per_page': products / pages if pages else 0.0,
+        'pages': pages,
+    }
+
+
+def archive_sources(since: Optional[str] = None, until: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[PageSource]:
+    """Registros do arquivo de páginas (os mais recentes primeiro se houver limite)"""
+    from src.page_archive import PageArchive
+
+    archive = PageArchive()
+    try:
+        records = archive.records(since, until)
+    finally:
+        archive.close()
+    if limit:
+        records = sorted(records, key=lambda record: record[1], reverse=True)[:limit]
+    return records
+
+
+def format_selectors(selectors: Dict, timing: Dict, fields: Dict, containers: List[Dict]) -> str:
+    """Bloco SELECTORS pronto para colar no config.py, com cobertura e tempo de cada seletor"""
+    per_page = timing.get('per_page_us', {})
+    notes = {}
+    if containers:
+        notes['product_container'] = (f"{containers[0]['per_page']:.0f} por página, "
+                                      f"cobertura {containers[0]['coverage']:.0%}")
+    for field, ranking in fields.items():
+        if ranking and selectors.get(field) == ranking[0]['selector']:
+            notes[field] = f"cobertura {ranking[0]['coverage']:.0%}"
+    lines = ["SELECTORS = {"]
+    for key in ('product_container',) + FIELDS + ('next_page',):
+        value = selectors.get(key, '')
+        note = notes.get(key, 'não encontrado' if not value else '')
+        if key in per_page:
+            note = f"{note}, {per_page[key]:.0f} µs/página" if note else f"{per_page[key]:.0f} µs/página"
+        line = f"    '{key}': {value!r},"
+        lines.append(f"{line}  # {note}" if note else line)
+    lines.append("}")
+    return '\n'.join(lines)
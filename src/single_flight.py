@@ -0,0 +1,76 @@
+"""
+Coalescência de requisições simultâneas para a mesma chave (single-flight)
+"""
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class _Call:
+    """Uma execução em andamento e seu resultado"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Garante uma única execução por chave entre threads concorrentes
+
+    A primeira thread que pede uma chave executa a função; as que chegam
+    enquanto ela está em andamento esperam e recebem o mesmo resultado (ou a
+    mesma exceção). Quando a execução termina a chave é liberada: uma chamada
+    posterior executa de novo (não é um cache).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Executa func uma única vez para as chamadas simultâneas com a mesma chave
+
+        Args:
+            key: Chave da operação (ex.: URL normalizada)
+            func: Função sem argumentos que faz o trabalho
+
+        Returns:
+            Tupla (resultado, True se o resultado veio de outra thread)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Execuções reais e chamadas atendidas por outra thread"""
+        with self._lock:
+            return {'executadas': self.executed, 'coalescidas': self.coalesced}
@@ -0,0 +1,124 @@
+"""
+Perfis de site: seletores, estratégia de coleta, ritmo e categorias de cada loja
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+from loguru import logger
+
+from config import (
+    BASE_URL, SELECTORS, DETAIL_SELECTORS, USE_SELENIUM, USE_STORE_API,
+    SELENIUM_IN_BROWSER_EXTRACTION, DELAY_BETWEEN_REQUESTS, SITES_DIR
+)
+
+
+class SiteProfile:
+    """
+    Configuração de um site, equivalente às constantes globais do config.py
+
+    Os perfis ficam em arquivos JSON em SITES_DIR (um por site). Campos
+    ausentes usam o valor do config.py:
+
+        {
+            "name": "loja",
+            "base_url": "https://www.loja.com.br",
+            "categories": ["https://www.loja.com.br/categoria/x/"],
+            "max_pages": 2,
+            "selectors": {"product_container": "li.product", ...},
+            "detail_selectors": {...},
+            "use_selenium": false,
+            "use_store_api": true,
+            "in_browser_extraction": true,
+            "delay_between_requests": 2
+        }
+    """
+
+    def __init__(self, name: str, base_url: str, categories: List[str] = None, max_pages: int = 1,
+                 selectors: Dict = None, detail_selectors: Dict = None, use_selenium: bool = USE_SELENIUM,
+                 use_store_api: bool = USE_STORE_API, in_browser_extraction: bool = SELENIUM_IN_BROWSER_EXTRACTION,
+                 delay_between_requests: float = DELAY_BETWEEN_REQUESTS):
+        self.name = name
+        self.base_url = base_url
+        self.categories = categories or []
+        self.max_pages = max(1, max_pages)
+        # Seletores parciais completam os do config.py
+        self.selectors = {**SELECTORS, **(selectors or {})}
+        self.detail_selectors = {**DETAIL_SELECTORS, **(detail_selectors or {})}
+        self.use_selenium = use_selenium
+        self.use_store_api = use_store_api
+        self.in_browser_extraction = in_browser_extraction
+        self.delay_between_requests = delay_between_requests
+
+    @classmethod
+    def from_config(cls, categories: List[str] = None, max_pages: int = 1) -> 'SiteProfile':
+        """Perfil equivalente ao config.py (execução de um único site)"""
+        return cls('padrao', BASE_URL, categories, max_pages)
+
+    @classmethod
+    def from_dict(cls, data: Dict, default_name: str = '') -> 'SiteProfile':
+        """
+        Cria o perfil a partir do conteúdo de um arquivo
+
+        Raises:
+            ValueError: Se base_url estiver ausente ou houver campos desconhecidos
+        """
+        data = dict(data)
+        name = data.pop('name', default_name)
+        base_url = data.pop('base_url', '')
+        if not base_url:
+            raise ValueError(f"Perfil '{name}' sem base_url")
+        try:
+            return cls(name, base_url, **data)
+        except TypeError as e:
+            raise ValueError(f"Perfil '{name}' inválido: {e}") from None
+
+    @property
+    def id_prefix(self) -> str:
+        """
+        Prefixo dos IDs de produto: o nome do site, para que produtos de lojas
+        diferentes não se misturem no banco local e nas imagens (o perfil
+        padrão do config.py mantém os IDs sem prefixo)
+        """
+        return '' if self.name == 'padrao' else f"{self.name}_"
+
+    def prefix_ids(self, products: List) -> List:
+        """Aplica id_prefix aos IDs dos produtos extraídos com este perfil (no lugar)"""
+        if self.id_prefix:
+            for product in products:
+                if product.get('id'):
+                    product['id'] = self.id_prefix + product['id']
+        return products
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+def load_site_profiles(directory: Path = SITES_DIR, names: Optional[List[str]] = None) -> List[SiteProfile]:
+    """
+    Lê os perfis de site (*.json) da pasta
+
+    Args:
+        directory: Pasta dos perfis
+        names: Nomes dos perfis desejados (padrão: todos)
+
+    Returns:
+        Perfis válidos, em ordem alfabética de arquivo
+
+    Raises:
+        ValueError: Se algum nome pedido não existir
+    """
+    profiles = []
+    for path in sorted(Path(directory).glob('*.json')):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                profile = SiteProfile.from_dict(json.load(f), default_name=path.stem)
+        except (OSError, ValueError) as e:
+            logger.error(f"Perfil de site ignorado ({path.name}): {e}")
+            continue
+        if not names or profile.name in names:
+            profiles.append(profile)
+
+    missing = set(names or []) - {profile.name for profile in profiles}
+    if missing:
+        raise ValueError(f"Perfis de site não encontrados em {directory}: {', '.join(sorted(missing))}")
+    return profiles
@@ -3,14 +3,30 @@ Funções utilitárias para o projeto de Web Scraping
 """
 import re
 import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
 import validators
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
-from typing import Optional
+from urllib.parse import urljoin, urlparse, urlencode
+from typing import Optional, Dict, Tuple
 from fake_useragent import UserAgent
 from loguru import logger
 import requests
-from config import HEADERS, TIMEOUT, MAX_RETRIES
+import urllib3
+from requests.adapters import HTTPAdapter
+from config import (
+    HEADERS, TIMEOUT, CONNECT_TIMEOUT, READ_TIMEOUT, HOST_TIMEOUTS, MAX_RETRIES, HTTP_POOL_SIZE,
+    HEDGE_REQUESTS, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY, HEDGE_MAX_RATIO, HEDGE_MAX_WORKERS
+)
+from src.block_detection import circuit_breakers, detect_block, BLOCK_STATUS_CODES
+from src.proxy_pool import get_proxy_pool
+from src.run_budget import get_run_budget
+from src.log_utils import log_sampled
+from src.single_flight import SingleFlight
+from src.dedup import canonical_url
+
+_thread_local = threading.local()
 
 
 def get_random_user_agent() -> str:
@@ -39,26 +55,50 @@ def clean_text(text: str) -> str:
     if not text:
         return ""
     # Remove espaços extras e quebras de linha
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    return ' '.join(text.split())
+
+
+# Valor precedido do símbolo da moeda; vale o último ("De R$ 20,00 por R$ 15,00" -> 15,00,
+# "2x de R$ 50,00" -> 50,00). Sem símbolo, vale o primeiro número do texto
+CURRENCY_PRICE_PATTERN = re.compile(r'R\$\s*(\d[\d.,]*)')
+PRICE_TOKEN_PATTERN = re.compile(r'\d[\d.,]*')
+
+
+def parse_price_token(token: str) -> float:
+    """
+    Converte um número no padrão brasileiro ("1.234,56") em float
+    
+    Mesmas regras de src.normalize.parse_brl_prices: o último separador é o
+    decimal quando há vírgula e ponto; só vírgula é decimal (exceto se
+    repetida); só ponto é milhar quando repetido ou seguido de três dígitos.
+    """
+    token = token.rstrip('.,')
+    last_comma = token.rfind(',')
+    last_dot = token.rfind('.')
+    if last_comma >= 0 and last_dot >= 0:
+        thousands, decimal = ('.', ',') if last_comma > last_dot else (',', '.')
+        token = token.replace(thousands, '').replace(decimal, '.')
+    elif last_comma >= 0:
+        token = token.replace(',', '.') if token.count(',') == 1 else token.replace(',', '')
+    elif last_dot >= 0 and (token.count('.') > 1 or len(token) - last_dot - 1 == 3):
+        token = token.replace('.', '')
+    try:
+        return float(token)
+    except ValueError:
+        return 0.0
 
 
 def extract_price(price_text: str) -> float:
-    """Extrai valor numérico do preço"""
+    """Extrai valor numérico do preço (ex.: "R$ 1.234,56" -> 1234.56)"""
     if not price_text:
         return 0.0
-    # Remove tudo exceto números, vírgulas e pontos
-    price_str = re.sub(r'[^\d.,]', '', price_text)
-    # Substitui vírgula por ponto
-    price_str = price_str.replace(',', '.')
-    try:
-        # Tenta extrair o valor
-        price_match = re.search(r'\d+\.?\d*', price_str)
-        if price_match:
-            return float(price_match.group())
-    except (ValueError, AttributeError):
-        pass
-    return 0.0
+    amounts = CURRENCY_PRICE_PATTERN.findall(price_text)
+    if amounts:
+        return parse_price_token(amounts[-1])
+    price_match = PRICE_TOKEN_PATTERN.search(price_text)
+    if not price_match:
+        return 0.0
+    return parse_price_token(price_match.group())
 
 
 def build_absolute_url(base_url: str, relative_url: str) -> str:
@@ -81,14 +121,213 @@ def get_file_extension(url: str) -> str:
     return ext
 
 
-def safe_request(url: str, headers: Optional[dict] = None, retries: int = MAX_RETRIES) -> Optional[requests.Response]:
+def get_session() -> requests.Session:
+    """
+    Retorna uma sessão HTTP reutilizável da thread atual
+    
+    Cada thread mantém sua própria sessão (requests.Session não é thread-safe),
+    reaproveitando conexões keep-alive entre requisições ao mesmo host.
+    """
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _thread_local.session = session
+    return session
+
+
+class HostRateLimiter:
+    """Limita a taxa de requisições por host, compartilhado entre threads"""
+    
+    def __init__(self, requests_per_second: float):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def wait(self, url: str):
+        """Bloqueia até que uma nova requisição ao host da URL seja permitida"""
+        if self.min_interval <= 0:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_timeouts(url: str) -> Tuple[float, float, float]:
+    """
+    Prazos da requisição para o host da URL
+    
+    Returns:
+        Tupla (conexão, leitura sem receber bytes, total) em segundos
+    """
+    host_timeouts = HOST_TIMEOUTS.get(urlparse(url).netloc, {})
+    return (
+        host_timeouts.get('connect', CONNECT_TIMEOUT),
+        host_timeouts.get('read', READ_TIMEOUT),
+        host_timeouts.get('total', TIMEOUT),
+    )
+
+
+class HostLatencyTracker:
+    """
+    Latências recentes (até os cabeçalhos) por host e orçamento de requisições hedged
+    
+    O atraso da segunda requisição é o percentil configurado das últimas
+    latências do host; no máximo `max_ratio` das requisições do host são
+    duplicadas, para não multiplicar a carga quando o host inteiro fica lento.
+    """
+    
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES,
+                 min_delay: float = HEDGE_MIN_DELAY, max_ratio: float = HEDGE_MAX_RATIO, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._requests: Dict[str, int] = {}
+        self._hedges: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, url: str, latency: float):
+        """Registra a latência de uma resposta"""
+        host = urlparse(url).netloc
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = self._samples[host] = deque(maxlen=self.window)
+            samples.append(latency)
+    
+    def hedge_delay(self, url: str) -> Optional[float]:
+        """Espera antes da segunda requisição, ou None se ainda não há medições suficientes"""
+        host = urlparse(url).netloc
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+            samples = sorted(self._samples.get(host, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[index])
+    
+    def allow_hedge(self, url: str) -> bool:
+        """Consome o orçamento de requisições duplicadas do host"""
+        host = urlparse(url).netloc
+        with self._lock:
+            hedges = self._hedges.get(host, 0)
+            if hedges + 1 > self.max_ratio * self._requests.get(host, 0) + 1:
+                return False
+            self._hedges[host] = hedges + 1
+            return True
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Requisições, duplicações e percentis por host"""
+        with self._lock:
+            result = {}
+            for host, samples in self._samples.items():
+                ordered = sorted(samples)
+                result[host] = {
+                    'requisicoes': self._requests.get(host, 0),
+                    'hedged': self._hedges.get(host, 0),
+                    'p50_ms': round(ordered[len(ordered) // 2] * 1000),
+                    'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000),
+                }
+            return result
+
+
+latency_tracker = HostLatencyTracker()
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+
+
+def _fetch_once(url: str, headers: dict, timeout: Tuple[float, float], session: Optional[requests.Session],
+                proxy=None) -> requests.Response:
+    """Uma tentativa de requisição (só os cabeçalhos; o corpo é lido pelo chamador)"""
+    current_session = session or (proxy.session() if proxy else get_session())
+    started = time.monotonic()
+    response = current_session.get(url, headers=headers, timeout=timeout, stream=True)
+    response.proxy = proxy
+    latency_tracker.record(url, time.monotonic() - started)
+    return response
+
+
+def _discard(future):
+    """Fecha a resposta de uma requisição hedged que perdeu a corrida"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _hedged_fetch(url: str, headers: dict, timeout: Tuple[float, float], proxy, pool) -> requests.Response:
+    """
+    Faz a requisição e, se ela passar do percentil de latência do host, dispara
+    uma segunda (por outro proxy, se houver) e devolve a primeira que responder
+    """
+    delay = latency_tracker.hedge_delay(url)
+    if delay is None:
+        return _fetch_once(url, headers, timeout, None, proxy)
+    
+    primary = _hedge_executor.submit(_fetch_once, url, headers, timeout, None, proxy)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeout:
+        pass
+    hedge_proxy = pool.acquire(exclude=proxy) if pool and proxy else proxy
+    if proxy and hedge_proxy is None:
+        # Nenhum proxy disponível: a segunda tentativa não pode sair pela conexão direta
+        return primary.result()
+    if not latency_tracker.allow_hedge(url) or not get_run_budget().try_request():
+        return primary.result()
+    
+    logger.debug(f"Requisição lenta (>{delay:.2f}s), disparando segunda tentativa: {url}")
+    pending = {primary, _hedge_executor.submit(_fetch_once, url, headers, timeout, None, hedge_proxy)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.add_done_callback(_discard)
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def safe_request(url: str, headers: Optional[dict] = None, retries: int = MAX_RETRIES,
+                 session: Optional[requests.Session] = None,
+                 record_success: bool = True) -> Optional[requests.Response]:
     """
     Faz uma requisição HTTP segura com retry automático
     
+    Conexão e leitura têm prazos próprios (CONNECT_TIMEOUT, READ_TIMEOUT) e
+    todas as tentativas dividem o prazo total (TIMEOUT), ajustáveis por host em
+    HOST_TIMEOUTS. O instante limite fica em response.deadline para quem lê o
+    corpo em streaming. Com HEDGE_REQUESTS, respostas lentas ganham uma
+    segunda requisição em paralelo (ver HostLatencyTracker).
+    
+    Com o pool de proxies ativo (PROXIES em config.py), cada tentativa sai por um
+    proxy escolhido pelo pool, usando a sessão fixa daquele proxy; uma nova
+    tentativa evita o proxy que acabou de falhar. O proxy usado fica em
+    response.proxy.
+    
+    Uma resposta 2xx ainda pode ser uma página de desafio (ex.: Cloudflare com
+    status 200). Quem vai verificar o conteúdo passa record_success=False e
+    depois chama report_success, report_block ou release_probe.
+    
+    Cada tentativa consome uma requisição do orçamento da execução (RunBudget);
+    esgotado o orçamento, nenhuma tentativa nova é feita e o prazo total nunca
+    ultrapassa o tempo restante da execução.
+    
     Args:
         url: URL para fazer requisição
         headers: Headers customizados
         retries: Número de tentativas
+        session: Sessão HTTP a usar (padrão: sessão da thread atual ou do proxy)
+        record_success: Registra o sucesso no circuit breaker e no pool ao receber 2xx
         
     Returns:
         Response object ou None em caso de falha
@@ -96,23 +335,241 @@ def safe_request(url: str, headers: Optional[dict] = None, retries: int = MAX_RE
     if headers is None:
         headers = HEADERS.copy()
         headers['User-Agent'] = get_random_user_agent()
+    pool = get_proxy_pool() if session is None else None
+    proxy = None
+    budget = get_run_budget()
+    connect_timeout, read_timeout, total_timeout = get_timeouts(url)
+    if budget.remaining_time() is not None:
+        total_timeout = min(total_timeout, budget.remaining_time())
+    deadline = time.monotonic() + total_timeout
     
     for attempt in range(retries):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.error(f"Prazo total de {total_timeout}s esgotado para {url}")
+            return None
+        if not budget.try_request():
+            logger.debug(f"Orçamento da execução esgotado, pulando {url}")
+            return None
+        if pool:
+            proxy = pool.acquire(exclude=proxy)
+            if proxy is None:
+                logger.error(f"Nenhum proxy disponível para {url}")
+                return None
+        scope = proxy.server if proxy else None
+        
+        # Host bloqueado: falha imediatamente em vez de esperar retries
+        if not circuit_breakers.allow(url, scope):
+            if proxy:
+                continue  # Outro proxy pode estar liberado
+            logger.debug(f"Circuito aberto, pulando {url}")
+            return None
         try:
-            response = requests.get(url, headers=headers, timeout=TIMEOUT, stream=True)
+            timeout = (min(connect_timeout, remaining), min(read_timeout, remaining))
+            if HEDGE_REQUESTS and session is None:
+                response = _hedged_fetch(url, headers, timeout, proxy, pool)
+            else:
+                response = _fetch_once(url, headers, timeout, session, proxy)
+            response.deadline = deadline
+            # A resposta hedged pode ter saído por outro proxy
+            proxy = response.proxy
+            scope = proxy.server if proxy else None
+            if response.status_code in BLOCK_STATUS_CODES:
+                # Bloqueio não é falha transitória: não adianta repetir pelo mesmo caminho
+                report_block(response, url, f"HTTP {response.status_code}")
+                log_sampled("Acesso bloqueado", 'WARNING',
+                            f"Acesso bloqueado (HTTP {response.status_code}) para {url}",
+                            url=url, status=response.status_code)
+                response.close()
+                if proxy:
+                    continue
+                return None
             response.raise_for_status()
+            if record_success:
+                report_success(response, url)
             return response
         except requests.exceptions.RequestException as e:
-            logger.warning(f"Tentativa {attempt + 1}/{retries} falhou para {url}: {e}")
-            if attempt < retries - 1:
-                time.sleep(2 ** attempt)  # Backoff exponencial
+            circuit_breakers.get(url, scope).release_probe()
+            if proxy:
+                pool.report(proxy, ok=False)
+            log_sampled("Tentativa falhou", 'WARNING', f"Tentativa {attempt + 1}/{retries} falhou para {url}: {e}",
+                        url=url, tentativa=attempt + 1)
+            backoff = 2 ** attempt
+            if attempt < retries - 1 and deadline - time.monotonic() > backoff:
+                time.sleep(backoff)  # Backoff exponencial
             else:
-                logger.error(f"Falha ao acessar {url} após {retries} tentativas")
+                log_sampled("Falha ao acessar", 'ERROR', f"Falha ao acessar {url} após {attempt + 1} tentativa(s)",
+                            url=url)
                 return None
     
     return None
 
 
+_page_flights = SingleFlight()
+
+BODY_CHUNK_SIZE = 64 * 1024  # Bytes lidos por vez do corpo de páginas e JSON
+
+
+def _read_body(response: requests.Response, url: str) -> Optional[bytes]:
+    """
+    Lê o corpo da resposta respeitando o prazo total (response.deadline)
+    
+    read1 devolve o que já chegou em vez de esperar o bloco inteiro, então um
+    corpo que chega aos poucos é interrompido no prazo (com atraso máximo de
+    um READ_TIMEOUT). Depois da leitura, .content e .json() funcionam normalmente.
+    
+    Returns:
+        Corpo da resposta, ou None se o prazo esgotou
+    """
+    raw = response.raw
+    if hasattr(raw, 'read1'):
+        chunks = iter(lambda: raw.read1(BODY_CHUNK_SIZE, decode_content=True), b'')
+    else:
+        chunks = response.iter_content(chunk_size=BODY_CHUNK_SIZE)
+    deadline = getattr(response, 'deadline', None)
+    body = bytearray()
+    for chunk in chunks:
+        if deadline and time.monotonic() > deadline:
+            log_sampled("Prazo esgotado na leitura", 'WARNING',
+                        f"Prazo total esgotado durante a leitura do corpo: {url}", url=url)
+            response.close()
+            return None
+        body += chunk
+    # Mesmo estado que requests deixa após ler .content
+    response._content = bytes(body)
+    response._content_consumed = True
+    response.close()
+    return response._content
+
+
+def fetch(url: str, headers: Optional[dict] = None, retries: int = MAX_RETRIES,
+          params: Optional[dict] = None) -> Optional[requests.Response]:
+    """
+    Busca a URL com o corpo já lido, coalescendo requisições simultâneas
+    
+    Threads que pedem a mesma URL (normalizada) ao mesmo tempo esperam uma única
+    requisição e recebem o mesmo objeto Response, com .content, .json() e
+    .headers já disponíveis. Use safe_request quando o corpo precisar ser lido
+    em streaming.
+    
+    O corpo é verificado por detect_block antes de o sucesso ser registrado:
+    uma página de desafio com status 200 conta como bloqueio no circuit
+    breaker e no pool de proxies, e fetch retorna None.
+    
+    Args:
+        url: URL para fazer requisição
+        headers: Headers customizados (o Accept entra na chave de coalescência)
+        retries: Número de tentativas
+        params: Parâmetros da query string (codificados e acrescentados à URL)
+        
+    Returns:
+        Response com o corpo carregado ou None em caso de falha
+    """
+    if params:
+        url = f"{url}{'&' if '?' in url else '?'}{urlencode(params)}"
+    key = f"{canonical_url(url)}\x1f{(headers or {}).get('Accept', '')}"
+    
+    def load():
+        response = safe_request(url, headers=headers, retries=retries, record_success=False)
+        if response is None:
+            return None
+        try:
+            content = _read_body(response, url)  # Lê o corpo uma vez; quem esperava reaproveita
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+            release_probe(response, url)
+            logger.warning(f"Erro ao ler resposta de {url}: {e}")
+            return None
+        if content is None:
+            release_probe(response, url)
+            return None
+        block_reason = detect_block(content)
+        if block_reason:
+            report_block(response, url, block_reason)
+            log_sampled("Acesso bloqueado", 'WARNING', f"Acesso bloqueado ({block_reason}) para {url}",
+                        url=url, motivo=block_reason)
+            return None
+        report_success(response, url)
+        return response
+    
+    response, shared = _page_flights.do(key, load)
+    if shared:
+        logger.debug(f"Requisição coalescida com outra em andamento: {url}")
+    return response
+
+
+def _response_scope(response) -> Optional[str]:
+    """Escopo do circuit breaker da resposta (o proxy usado, se houver)"""
+    proxy = getattr(response, 'proxy', None)
+    return proxy.server if proxy else None
+
+
+def report_success(response, url: str):
+    """
+    Registra uma resposta normal no circuit breaker e no proxy usado
+    
+    Args:
+        response: Resposta já verificada (status e conteúdo)
+        url: URL requisitada
+    """
+    circuit_breakers.record_success(url, _response_scope(response))
+    proxy = getattr(response, 'proxy', None)
+    if proxy:
+        pool = get_proxy_pool()
+        if pool:
+            pool.report(proxy, response.elapsed.total_seconds(), ok=True)
+
+
+def release_probe(response, url: str):
+    """Libera a requisição de teste do circuito quando a resposta foi descartada sem indicar bloqueio"""
+    circuit_breakers.get(url, _response_scope(response)).release_probe()
+
+
+def report_block(response: Optional[requests.Response], url: str, reason: str):
+    """
+    Registra um bloqueio no circuit breaker e no proxy usado na resposta
+    
+    Args:
+        response: Resposta bloqueada (pode ter vindo de um proxy)
+        url: URL requisitada
+        reason: Motivo do bloqueio (assinatura ou status)
+    """
+    proxy = getattr(response, 'proxy', None)
+    circuit_breakers.record_block(url, reason, _response_scope(response))
+    if proxy:
+        pool = get_proxy_pool()
+        if pool:
+            pool.report(proxy, response.elapsed.total_seconds(), blocked=True)
+
+
+# Assinaturas (magic bytes) dos formatos de imagem aceitos
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """
+    Identifica o formato da imagem pelos primeiros bytes
+    
+    Args:
+        head: Primeiros bytes do arquivo (ao menos 12)
+        
+    Returns:
+        'jpeg', 'png', 'gif', 'webp', 'avif' ou None se não for uma imagem conhecida
+    """
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    return None
+
+
 def create_category_folder(base_path: Path, category: str) -> Path:
     """Cria pasta para categoria se não existir"""
     category_folder = base_path / clean_filename(category)
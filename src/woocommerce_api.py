@@ -0,0 +1,201 @@
+"""
+Fonte de produtos via Store API do WooCommerce (sem renderizar HTML)
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from loguru import logger
+
+from config import (
+    BASE_URL, HEADERS, STORE_API_PATH, STORE_API_PER_PAGE, STORE_API_MAX_WORKERS,
+    STORE_API_REQUESTS_PER_SECOND, STORE_API_ALL_PRODUCTS_PATHS
+)
+from src.utils import (
+    fetch, build_absolute_url, clean_text, format_currency,
+    sanitize_category, get_random_user_agent, HostRateLimiter
+)
+from src.product_record import Product
+
+CATEGORY_PATH_PATTERN = re.compile(r'/categoria/(?:[^/]+/)*?([^/]+)/?$')
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+class WooCommerceSource:
+    """Enumera produtos pela Store API do WooCommerce (/wp-json/wc/store)"""
+
+    def __init__(self, base_url: str = None, max_workers: int = STORE_API_MAX_WORKERS,
+                 per_page: int = STORE_API_PER_PAGE, rate_limiter: Optional[HostRateLimiter] = None):
+        """
+        Args:
+            base_url: URL base da loja
+            max_workers: Número de páginas da API buscadas em paralelo
+            per_page: Produtos por página da API (máximo 100 no WooCommerce)
+            rate_limiter: Limitador de taxa por host compartilhado
+        """
+        self.base_url = (base_url or BASE_URL).rstrip('/')
+        self.max_workers = max(1, max_workers)
+        self.per_page = min(max(1, per_page), 100)
+        self.rate_limiter = rate_limiter or HostRateLimiter(STORE_API_REQUESTS_PER_SECOND)
+        self.available: Optional[bool] = None  # None = ainda não testado
+
+    def _headers(self) -> dict:
+        """Headers para requisições JSON"""
+        headers = HEADERS.copy()
+        headers['User-Agent'] = get_random_user_agent()
+        headers['Accept'] = 'application/json'
+        return headers
+
+    def _get(self, url: str, params: Optional[dict] = None, retries: int = 2):
+        """Faz uma requisição respeitando o limite de taxa do host"""
+        self.rate_limiter.wait(url)
+        return fetch(url, headers=self._headers(), retries=retries, params=params)
+
+    def category_slug(self, category_url: str) -> Optional[str]:
+        """
+        Converte URL de categoria no parâmetro de categoria da Store API
+
+        Args:
+            category_url: URL da página de categoria
+
+        Returns:
+            Slug da categoria, "" para a listagem de todos os produtos,
+            ou None se a URL não puder ser mapeada (usar HTML)
+        """
+        path = urlparse(category_url).path or '/'
+        if not path.endswith('/'):
+            path += '/'
+        if path in STORE_API_ALL_PRODUCTS_PATHS:
+            return ""
+        match = CATEGORY_PATH_PATTERN.search(path)
+        if match:
+            return match.group(1)
+        return None
+
+    def _fetch_api_page(self, slug: str, page: int) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Busca uma página da Store API
+
+        Returns:
+            Tupla (lista de produtos JSON, total de páginas informado pelo servidor);
+            o total é None se a requisição falhar ou não retornar JSON
+        """
+        params = {'per_page': self.per_page, 'page': page}
+        if slug:
+            params['category'] = slug
+        response = self._get(f"{self.base_url}{STORE_API_PATH}", params)
+        if not response:
+            return [], None
+        try:
+            data = response.json()
+        except ValueError:
+            logger.warning(f"Store API retornou conteúdo não-JSON (página {page})")
+            return [], None
+        if not isinstance(data, list):
+            return [], None
+        try:
+            total_pages = int(response.headers.get('X-WP-TotalPages') or 1)
+        except ValueError:
+            logger.debug(f"X-WP-TotalPages inválido: {response.headers.get('X-WP-TotalPages')!r}")
+            total_pages = 1
+        return data, total_pages
+
+    def map_product(self, item: Dict) -> Product:
+        """
+        Converte um produto da Store API no mesmo formato de extract_product_info
+
+        Args:
+            item: Produto retornado pela Store API
+
+        Returns:
+            Product com informações do produto
+        """
+        name = clean_text(item.get('name', ''))
+
+        # Preços vêm em unidades menores (centavos) como string
+        prices = item.get('prices') or {}
+        try:
+            minor_unit = int(prices.get('currency_minor_unit', 2) or 0)
+            price = int(prices.get('price') or 0) / (10 ** minor_unit)
+        except (TypeError, ValueError):
+            price = 0.0
+        symbol = prices.get('currency_symbol') or 'R$'
+        price_text = format_currency(price, symbol) if prices.get('price') else ""
+
+        images = item.get('images') or []
+        image_url = ""
+        if images:
+            image_url = images[0].get('thumbnail') or images[0].get('src') or ""
+
+        categories = item.get('categories') or []
+        category = clean_text(categories[0].get('name', '')) if categories else "Sem_Categoria"
+        category = sanitize_category(category)
+
+        product_id = f"{category}_{name}" if name else f"produto_{item.get('id', time.time())}"
+        product_id = product_id.replace(' ', '_')[:100]
+
+        product_info = Product(
+            id=product_id,
+            nome=name,
+            categoria=category,
+            preco=price,
+            preco_original=price_text,
+            imagem_url=build_absolute_url(self.base_url, image_url),
+            link=item.get('permalink', ''),
+            data_coleta=time.strftime("%Y-%m-%d %H:%M:%S")
+        )
+
+        # Campos que no HTML só existem na página de detalhe
+        description = item.get('short_description') or item.get('description') or ""
+        if description:
+            product_info['descricao'] = clean_text(HTML_TAG_PATTERN.sub(' ', description))
+        if item.get('sku'):
+            product_info['sku'] = item['sku']
+
+        return product_info
+
+    def scrape_category(self, category_url: str, max_pages: int = 1) -> Optional[List[Dict]]:
+        """
+        Coleta os produtos de uma categoria pela Store API
+
+        A primeira página informa o total de páginas; as demais (até max_pages)
+        são buscadas em paralelo. Se alguma delas falhar, a categoria inteira
+        fica para o HTML (uma categoria pela metade não é dada como completa).
+
+        Args:
+            category_url: URL da página de categoria
+            max_pages: Número máximo de páginas da API (per_page produtos cada)
+
+        Returns:
+            Lista de produtos, ou None se a API não puder atender esta categoria
+            (ou alguma página falhar)
+        """
+        if self.available is False:
+            return None
+
+        slug = self.category_slug(category_url)
+        if slug is None:
+            return None
+
+        items, total_pages = self._fetch_api_page(slug, 1)
+        if total_pages is None:
+            if self.available is None:
+                logger.warning("Store API do WooCommerce indisponível. Usando scraping de HTML.")
+                self.available = False
+            return None
+        self.available = True
+
+        last_page = min(total_pages, max_pages)
+        if last_page > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="store-api") as executor:
+                pages = executor.map(lambda page: self._fetch_api_page(slug, page), range(2, last_page + 1))
+                for page, (page_items, page_total) in enumerate(pages, start=2):
+                    if page_total is None:
+                        logger.warning(f"Store API: página {page} de {category_url} falhou. Usando scraping de HTML.")
+                        return None
+                    items.extend(page_items)
+
+        products = [self.map_product(item) for item in items]
+        logger.info(f"Store API: {len(products)} produtos em {last_page} página(s) de {category_url}")
+        return [product for product in products if product.get('nome')]